@@ -1,7 +1,17 @@
-from flask import Flask
+from flask import Flask, g, request, url_for
 from flask_cors import CORS
-from config.config import MAX_CONTENT_LENGTH, UPLOAD_FOLDER
+from config.config import (
+    MAX_CONTENT_LENGTH,
+    UPLOAD_FOLDER,
+    MODEL_WARMUP,
+    TRACING_ENABLED,
+    TRACE_RESPONSE_TIMINGS,
+    TRACE_EXPORT_PATH,
+    PROFILING_ADMIN_TOKEN,
+)
+import json
 import os
+import time
 from app.utils.init_utils import initialize_nltk, initialize_ml_dependencies
 import logging
 
@@ -9,13 +19,117 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _instrument_requests(app):
+    """Count requests, requests in flight and latency per endpoint"""
+    from app.utils.metrics import HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT
+
+    @app.before_request
+    def _start_request():
+        g.metrics_endpoint = request.endpoint or 'unmatched'
+        g.metrics_start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc(g.metrics_endpoint)
+
+    @app.after_request
+    def _count_request(response):
+        HTTP_REQUESTS.inc(g.get('metrics_endpoint', 'unmatched'), request.method, response.status_code)
+        return response
+
+    @app.teardown_request
+    def _finish_request(error=None):
+        # Runs after streamed responses are closed, so latency covers the whole stream
+        endpoint = g.pop('metrics_endpoint', None)
+        if endpoint is not None:
+            HTTP_IN_FLIGHT.dec(endpoint)
+            HTTP_LATENCY.observe(time.perf_counter() - g.metrics_start, endpoint)
+
+def _trace_requests(app):
+    """Trace each request's stages into a Server-Timing header, optional 'timings' field and JSONL export"""
+    from app.utils.tracing import start_trace, end_trace, span, TraceExporter
+
+    exporter = TraceExporter(TRACE_EXPORT_PATH) if TRACE_EXPORT_PATH else None
+
+    # Time response serialization (Flask 2.2+ routes jsonify through app.json)
+    json_provider = getattr(app, 'json', None)
+    if json_provider is not None and hasattr(json_provider, 'dumps'):
+        dumps = json_provider.dumps
+
+        def traced_dumps(obj, **kwargs):
+            with span('serialize'):
+                return dumps(obj, **kwargs)
+        json_provider.dumps = traced_dumps
+
+    @app.before_request
+    def _start_trace():
+        g.trace, g.trace_token = start_trace(request.endpoint or request.path)
+
+    @app.after_request
+    def _add_server_timing(response):
+        trace = g.get('trace')
+        if trace is None:
+            return response
+        if TRACE_RESPONSE_TIMINGS and response.is_json and not response.is_streamed:
+            data = response.get_json(silent=True)
+            if isinstance(data, dict):
+                data['timings'] = trace.timings()
+                response.set_data(json.dumps(data))
+        # Streamed responses only list the stages finished before the first chunk
+        response.headers['Server-Timing'] = trace.server_timing()
+        g.trace_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _finish_trace(error=None):
+        token = g.pop('trace_token', None)
+        if token is None:
+            return
+        trace = end_trace(token)
+        if exporter is not None and trace is not None:
+            exporter.export(trace, method=request.method, path=request.path,
+                            status=g.get('trace_status', 500))
+
+def _profile_requests(app):
+    """Run requests carrying X-Profile and a valid X-Admin-Token under a profiler"""
+    from app.utils.profiling import requested_mode, start_profile, stop_profile
+
+    @app.before_request
+    def _start_profile():
+        mode = requested_mode(request.headers)
+        if mode is not None:
+            g.profile_session, g.profile_state = start_profile(mode, request.endpoint or request.path)
+
+    def _stop_profile():
+        session = g.pop('profile_session', None)
+        if session is None:
+            return None
+        return stop_profile(session, g.pop('profile_state'))
+
+    @app.after_request
+    def _attach_profile(response):
+        # Streamed responses are profiled up to the point the view returns
+        info = _stop_profile()
+        if info is not None:
+            response.headers['X-Profile-Id'] = info['profile_id']
+            response.headers['X-Profile-Mode'] = info['mode']
+            if info['path']:
+                response.headers['X-Profile-Url'] = url_for('main.download_profile', profile_id=info['profile_id'])
+        return response
+
+    @app.teardown_request
+    def _release_profile(error=None):
+        # after_request is skipped when the response could not be built
+        _stop_profile()
+
 def create_app():
     """Create and configure the Flask application."""
     try:
+        start = time.perf_counter()
+        timings = {}
+
         # Initialize dependencies
         logger.info("Initializing dependencies...")
         initialize_ml_dependencies()
         initialize_nltk()
+        timings['dependencies'] = time.perf_counter() - start
         logger.info("Dependencies initialization complete")
 
         app = Flask(__name__, 
@@ -33,8 +147,38 @@ def create_app():
         app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
         
         # Register blueprints
+        phase_start = time.perf_counter()
         from app.routes.main_routes import main
         app.register_blueprint(main)
+        _instrument_requests(app)
+        if TRACING_ENABLED:
+            _trace_requests(app)
+        if PROFILING_ADMIN_TOKEN:
+            _profile_requests(app)
+        timings['routes'] = time.perf_counter() - phase_start
+
+        # Models load on first use unless listed in MODEL_WARMUP
+        from app.services.model_registry import model_registry
+        phase_start = time.perf_counter()
+        if MODEL_WARMUP:
+            logger.info(f"Warming up models: {', '.join(MODEL_WARMUP)}")
+            from app.services.image_service import image_processor
+            image_processor.warm_up(MODEL_WARMUP)
+        timings['model_warmup'] = time.perf_counter() - phase_start
+        timings['total'] = time.perf_counter() - start
+
+        app.config['STARTUP_REPORT'] = {
+            'timings': {phase: round(seconds, 3) for phase, seconds in timings.items()},
+            'models': model_registry.report()
+        }
+        logger.info(
+            "Startup complete in {:.2f}s ({})".format(
+                timings['total'],
+                ', '.join(f"{phase}={seconds:.2f}s" for phase, seconds in timings.items() if phase != 'total')
+            )
+        )
+        for name, info in app.config['STARTUP_REPORT']['models'].items():
+            logger.info(f"Model '{name}': {info['status']} ({info['load_seconds']}s)")
         
         return app
     except Exception as e:
@@ -0,0 +1,450 @@
+"""
+Async (ASGI) serving mode.
+
+The analysis POST endpoints are served by async handlers: Gemini steps are
+awaited concurrently on an I/O pool and BLIP/DETR/colour work is dispatched
+to a bounded CPU pool, so one process can keep many requests in flight.
+Every other route (pages, text-to-speech, GET requests) is delegated to the
+regular Flask app, and the JSON response shapes match main_routes.py.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import time
+import logging
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Mount
+from a2wsgi import WSGIMiddleware
+
+from app import create_app
+from app.utils.file_utils import allowed_file, validate_image, read_upload
+from app.utils.pipeline_utils import get_cpu_executor, get_io_executor
+from app.services.cache_service import lookup_result, store_result, cache_meta, track_degraded
+from app.services.pipeline_service import arun_pipeline
+from app.services.chart_service import CHART_FORMATS, with_color_charts
+from app.services.quality_service import QualityGateError
+from app.utils.metrics import HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT
+from app.utils.tracing import start_trace, end_trace, TraceExporter
+from app.utils.profiling import requested_mode, start_profile, stop_profile, attach as profile_attach
+from config.config import (
+    MAX_CONTENT_LENGTH,
+    CHART_DEFAULT_FORMAT,
+    TRACING_ENABLED,
+    TRACE_RESPONSE_TIMINGS,
+    TRACE_EXPORT_PATH,
+    PROFILING_ADMIN_TOKEN,
+)
+
+logger = logging.getLogger(__name__)
+
+INVALID_TYPE_MESSAGE = 'Invalid file type. Please upload a PNG, JPG, JPEG, or GIF'
+
+_trace_exporter = TraceExporter(TRACE_EXPORT_PATH) if TRACING_ENABLED and TRACE_EXPORT_PATH else None
+
+
+def _quality_rejection(error, style='code'):
+    return JSONResponse(error.response_body(style), status_code=422)
+
+
+def _with_trace(response, trace):
+    """Add the Server-Timing header, and the 'timings' field when enabled, to a handler's response"""
+    if TRACE_RESPONSE_TIMINGS and isinstance(response, JSONResponse):
+        data = json.loads(response.body)
+        if isinstance(data, dict):
+            data['timings'] = trace.timings()
+            response = JSONResponse(data, status_code=response.status_code)
+    response.headers['Server-Timing'] = trace.server_timing()
+    return response
+
+def _instrumented(handler):
+    """
+    Record request metrics (and a trace when TRACING_ENABLED) for an async handler;
+    Flask-served routes are instrumented by Flask
+    """
+    endpoint = f"asgi.{handler.__name__}"
+
+    @functools.wraps(handler)
+    async def wrapper(request):
+        start = time.perf_counter()
+        status = 500
+        trace, token = start_trace(endpoint) if TRACING_ENABLED else (None, None)
+        mode = requested_mode(request.headers) if PROFILING_ADMIN_TOKEN else None
+        # The event loop is shared with other requests, so only the worker threads are profiled
+        session, profile_state = start_profile(mode, endpoint, join=False) if mode else (None, None)
+        HTTP_IN_FLIGHT.inc(endpoint)
+        try:
+            response = await handler(request)
+            status = response.status_code
+            if trace is not None:
+                response = _with_trace(response, trace)
+            if session is not None:
+                info = stop_profile(session, profile_state)
+                session = None
+                response.headers['X-Profile-Id'] = info['profile_id']
+                response.headers['X-Profile-Mode'] = info['mode']
+                if info['path']:
+                    response.headers['X-Profile-Url'] = f"/admin/profiles/{info['profile_id']}"
+            return response
+        finally:
+            if session is not None:
+                stop_profile(session, profile_state)
+            HTTP_IN_FLIGHT.dec(endpoint)
+            HTTP_REQUESTS.inc(endpoint, request.method, status)
+            HTTP_LATENCY.observe(time.perf_counter() - start, endpoint)
+            if trace is not None:
+                end_trace(token)
+                if _trace_exporter is not None:
+                    _trace_exporter.export(trace, method=request.method, path=request.url.path, status=status)
+    return wrapper
+
+
+def _attached(fn, *args):
+    with profile_attach():
+        return fn(*args)
+
+async def _run_blocking(executor, fn, *args):
+    loop = asyncio.get_running_loop()
+    # Carry the request's context (its trace and profile) into the worker thread
+    return await loop.run_in_executor(executor, contextvars.copy_context().run, _attached, fn, *args)
+
+
+async def _get_upload(request, field):
+    """
+    Read an uploaded file from the multipart form into memory
+    Returns:
+        tuple: (UploadedImage, None) or (None, error key)
+    """
+    form = await request.form()
+    file = form.get(field)
+    if file is None or not hasattr(file, 'filename'):
+        return None, 'missing'
+    if file.filename == '':
+        return None, 'empty'
+    if not allowed_file(file.filename):
+        return None, 'invalid_type'
+    upload = await _run_blocking(get_io_executor(), read_upload, file.file, file.filename)
+    return upload, None
+
+
+async def _cached_run(pipeline, upload, cacheable=None, compute=None):
+    """Async counterpart of cache_service.cached_pipeline"""
+    io_executor = get_io_executor()
+    key, cached = await _run_blocking(io_executor, lookup_result, pipeline, upload.digest)
+    if cached is not None:
+        return cached, cache_meta(key, True)
+    with track_degraded() as degraded:
+        if compute is not None:
+            result = await compute()
+        else:
+            result = (await arun_pipeline(pipeline, upload=upload)).output
+    await _run_blocking(io_executor, store_result, key, result, cacheable, degraded)
+    return result, cache_meta(key, False)
+
+
+async def social_media(request):
+    try:
+        upload, error = await _get_upload(request, 'image')
+        if upload is None:
+            message = {
+                'missing': 'No image file provided',
+                'empty': 'No selected file',
+                'invalid_type': INVALID_TYPE_MESSAGE
+            }[error]
+            return JSONResponse({'success': False, 'error': message}, status_code=400)
+
+        try:
+            result, meta = await _cached_run('social_media', upload)
+        finally:
+            upload.close()
+        return JSONResponse({'success': True, 'data': result, 'meta': meta})
+    except QualityGateError as e:
+        return _quality_rejection(e, 'success')
+    except Exception as e:
+        logger.error(f"Error processing request: {str(e)}")
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+async def seo(request):
+    try:
+        upload, error = await _get_upload(request, 'image')
+        if upload is None:
+            message, code = {
+                'missing': ('No image file provided', 'NO_IMAGE'),
+                'empty': ('No selected file', 'EMPTY_FILE'),
+                'invalid_type': (INVALID_TYPE_MESSAGE, 'INVALID_TYPE')
+            }[error]
+            return JSONResponse({'success': False, 'error': message, 'code': code}, status_code=400)
+
+        if not validate_image(upload):
+            return JSONResponse({
+                'success': False,
+                'error': 'Invalid image file',
+                'code': 'INVALID_IMAGE'
+            }, status_code=400)
+
+        try:
+            result, meta = await _cached_run('seo', upload)
+            return JSONResponse({'success': True, 'data': result, 'meta': meta})
+        except QualityGateError as e:
+            return _quality_rejection(e)
+        except Exception as e:
+            logger.error(f"Error processing image: {str(e)}")
+            return JSONResponse({
+                'success': False,
+                'error': 'Error processing image. Please try again.',
+                'code': 'PROCESSING_ERROR'
+            }, status_code=500)
+        finally:
+            upload.close()
+    except Exception as e:
+        logger.error(f"Server error: {str(e)}")
+        return JSONResponse({
+            'success': False,
+            'error': 'An unexpected error occurred. Please try again.',
+            'code': 'SERVER_ERROR'
+        }, status_code=500)
+
+
+async def analyze_general(request):
+    try:
+        upload, error = await _get_upload(request, 'image')
+        if upload is None:
+            message = {
+                'missing': 'No image file provided',
+                'empty': 'No selected file',
+                'invalid_type': INVALID_TYPE_MESSAGE
+            }[error]
+            return JSONResponse({'error': message}, status_code=400)
+
+        if not validate_image(upload):
+            return JSONResponse({'error': 'Invalid image file'}, status_code=400)
+
+        try:
+            result, meta = await _cached_run('general', upload)
+            return JSONResponse(dict(result, meta=meta))
+        except QualityGateError as e:
+            return _quality_rejection(e, 'plain')
+        except Exception as e:
+            logger.error(f"Error processing image: {str(e)}", exc_info=True)
+            return JSONResponse({'error': f'Error processing image: {str(e)}'}, status_code=500)
+        finally:
+            upload.close()
+    except Exception as e:
+        logger.error(f"Server error in general analysis: {str(e)}", exc_info=True)
+        return JSONResponse({'error': f'An unexpected error occurred: {str(e)}'}, status_code=500)
+
+
+async def image_analyzer(request):
+    try:
+        upload, error = await _get_upload(request, 'image')
+        if upload is None:
+            message, code = {
+                'missing': ('No image file provided', 'NO_INPUT'),
+                'empty': ('No selected file', 'EMPTY_FILE'),
+                'invalid_type': (INVALID_TYPE_MESSAGE, 'INVALID_TYPE')
+            }[error]
+            return JSONResponse({'success': False, 'error': message, 'code': code}, status_code=400)
+
+        try:
+            result, meta = await _cached_run('image_analyzer', upload)
+            return JSONResponse({'success': True, 'data': result, 'meta': meta})
+        except QualityGateError as e:
+            return _quality_rejection(e)
+        except Exception as e:
+            logger.error(f"Error processing image: {str(e)}")
+            return JSONResponse({
+                'success': False,
+                'error': 'Error processing image. Please try again.',
+                'code': 'PROCESSING_ERROR'
+            }, status_code=500)
+        finally:
+            upload.close()
+    except Exception as e:
+        logger.error(f"Server error: {str(e)}")
+        return JSONResponse({
+            'success': False,
+            'error': 'An unexpected error occurred. Please try again.',
+            'code': 'SERVER_ERROR'
+        }, status_code=500)
+
+
+async def analyze_social_media(request):
+    try:
+        upload, error = await _get_upload(request, 'image')
+        if upload is None:
+            message, code = {
+                'missing': ('No image file provided', 'NO_FILE'),
+                'empty': ('No image selected', 'NO_FILE'),
+                'invalid_type': ('Invalid file type. Supported formats: PNG, JPEG, GIF', 'INVALID_FILE_TYPE')
+            }[error]
+            return JSONResponse({'success': False, 'error': message, 'error_code': code}, status_code=400)
+
+        try:
+            result, meta = await _cached_run('social_media_analyze', upload)
+        finally:
+            upload.close()
+        return JSONResponse({'success': True, 'data': result, 'meta': meta})
+    except QualityGateError as e:
+        return _quality_rejection(e, 'error_code')
+    except Exception as e:
+        logger.error(f"Error in social media analysis: {str(e)}")
+        return JSONResponse({
+            'success': False,
+            'error': str(e),
+            'error_code': 'PROCESSING_ERROR'
+        }, status_code=500)
+
+
+async def advanced_analysis(request):
+    try:
+        upload, error = await _get_upload(request, 'image')
+        if upload is None:
+            message = {
+                'missing': 'No image file provided',
+                'empty': 'No selected file',
+                'invalid_type': 'Invalid file type. Please upload a PNG, JPG, or JPEG'
+            }[error]
+            return JSONResponse({'success': False, 'error': message}, status_code=400)
+
+        form = await request.form()
+        chart_format = form.get('chart_format') or request.query_params.get('chart_format') or CHART_DEFAULT_FORMAT
+        if chart_format not in CHART_FORMATS:
+            upload.close()
+            return JSONResponse({
+                'success': False,
+                'error': f"Invalid chart format. Use one of: {', '.join(CHART_FORMATS)}"
+            }, status_code=400)
+
+        try:
+            result, meta = await _cached_run('advanced', upload)
+            result = await _run_blocking(get_cpu_executor(), with_color_charts, result, chart_format)
+            return JSONResponse({'success': True, 'data': result, 'meta': meta})
+        except QualityGateError as e:
+            return _quality_rejection(e, 'success')
+        except Exception as e:
+            logger.error(f"Error processing image: {str(e)}")
+            return JSONResponse({
+                'success': False,
+                'error': f'Error processing image: {str(e)}'
+            }, status_code=500)
+        finally:
+            upload.close()
+    except Exception as e:
+        logger.error(f"Error in advanced analysis: {str(e)}")
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+async def analyze_medical_image(request):
+    try:
+        upload, error = await _get_upload(request, 'file')
+        if upload is None:
+            message = {
+                'missing': 'No file uploaded',
+                'empty': 'No selected file',
+                'invalid_type': 'Invalid file type. Please upload a valid medical image file.'
+            }[error]
+            return JSONResponse({'success': False, 'error': message}, status_code=400)
+
+        from app.services.med_service import analyze_medical_upload
+
+        async def compute():
+            return await _run_blocking(get_io_executor(), analyze_medical_upload, upload)
+
+        try:
+            result, meta = await _cached_run(
+                'medical', upload,
+                cacheable=lambda result: result.get('success', False),
+                compute=compute
+            )
+            return JSONResponse(dict(result, meta=meta))
+        except Exception as e:
+            logger.error(f"Error processing medical image: {str(e)}")
+            return JSONResponse({
+                'success': False,
+                'error': f'Error processing image: {str(e)}'
+            }, status_code=500)
+        finally:
+            upload.close()
+    except Exception as e:
+        logger.error(f"Server error in medical analysis: {str(e)}")
+        return JSONResponse({'success': False, 'error': 'An unexpected error occurred'}, status_code=500)
+
+
+class ContentLengthLimit:
+    """
+    Reject request bodies over MAX_CONTENT_LENGTH, as Flask does for the WSGI routes.
+    A declared Content-Length is checked up front; chunked bodies and bodies
+    without the header are counted as they are received, and the request is
+    answered with 413 as soon as the total passes the limit.
+    """
+
+    def __init__(self, app, max_length):
+        self.app = app
+        self.max_length = max_length
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse({'success': False, 'error': 'File too large'}, status_code=413)
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        length = headers.get(b'content-length')
+        if length is not None and length.isdigit() and int(length) > self.max_length:
+            await self._reject(scope, receive, send)
+            return
+
+        state = {'received': 0, 'rejected': False, 'started': False}
+
+        async def limited_receive():
+            if state['rejected']:
+                return {'type': 'http.disconnect'}
+            message = await receive()
+            if message['type'] == 'http.request':
+                state['received'] += len(message.get('body', b''))
+                if state['received'] > self.max_length:
+                    state['rejected'] = True
+                    if not state['started']:
+                        await self._reject(scope, receive, send)
+                    # The app sees a disconnect and stops reading; whatever it answers is dropped
+                    return {'type': 'http.disconnect'}
+            return message
+
+        async def guarded_send(message):
+            if state['rejected']:
+                return
+            if message['type'] == 'http.response.start':
+                state['started'] = True
+            await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+
+def create_asgi_app(flask_app=None):
+    """
+    Create the ASGI application
+    Args:
+        flask_app (Flask, optional): App serving every non-analysis route
+    Returns:
+        ContentLengthLimit: ASGI application
+    """
+    flask_app = flask_app or create_app()
+
+    routes = [
+        Route('/social-media', _instrumented(social_media), methods=['POST']),
+        Route('/seo', _instrumented(seo), methods=['POST']),
+        Route('/api/analyze/general', _instrumented(analyze_general), methods=['POST']),
+        Route('/image-analyzer', _instrumented(image_analyzer), methods=['POST']),
+        Route('/api/social-media/analyze', _instrumented(analyze_social_media), methods=['POST']),
+        Route('/advanced-analysis', _instrumented(advanced_analysis), methods=['POST']),
+        Route('/api/analyze-medical-image', _instrumented(analyze_medical_image), methods=['POST']),
+        # GET pages and everything else are served by Flask
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ]
+    return ContentLengthLimit(Starlette(routes=routes), MAX_CONTENT_LENGTH)
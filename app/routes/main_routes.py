@@ -1,24 +1,28 @@
-from flask import Blueprint, request, jsonify, render_template, send_file, current_app
-from werkzeug.utils import secure_filename
+from flask import Blueprint, request, jsonify, render_template, send_file, Response, stream_with_context
+import json
 import os
 import tempfile
-from PIL import Image
 from gtts import gTTS
 from datetime import datetime
 import logging
 
-from app.utils.file_utils import allowed_file, validate_image
-from app.services.image_service import image_processor
-from app.services.text_service import (
-    generate_context,
-    enhance_context,
-    social_media_caption,
-    generate_hashtags,
-    enhance_alt_text,
+from app.utils.file_utils import allowed_file, validate_image, read_upload
+from app.services.cache_service import cached_pipeline
+from app.services.pipeline_service import run_pipeline
+from app.services.quality_service import QualityGateError
+from app.services.chart_service import CHART_FORMATS, with_color_charts
+from app.services.stream_service import STREAM_FORMATS, stream_pipeline, format_event
+from app.services.catalog_service import (
+    TASKS as CATALOG_TASKS,
+    create_batch,
+    start_batch,
+    batch_status,
+    results_path,
 )
-from app.services.advanced_image_service import AdvancedImageProcessor
-from app.services.seo_service import generate_seo_description
-from config.config import UPLOAD_FOLDER
+from app.services.job_service import JOB_PIPELINES, get_job_queue, job_view, job_events
+from app.utils.metrics import registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.utils.profiling import is_admin, profile_path, list_profiles
+from config.config import CHART_DEFAULT_FORMAT, METRICS_ENABLED
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +31,10 @@ ALLOWED_MEDICAL_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'tiff', 'dcm'}
 
 main = Blueprint('main', __name__)
 
+def quality_rejection(error, style='code'):
+    """422 response for an image the quality gate rejected, in the route's error shape"""
+    return jsonify(error.response_body(style)), 422
+
 @main.route('/')
 def landing():
     return render_template('landing.html')
@@ -55,57 +63,23 @@ def social_media():
                     'error': 'Invalid file type. Please upload a PNG, JPG, JPEG, or GIF'
                 }), 400
             
-            # Create temporary file
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            
+            # Decode the upload in memory; caption and hashtags run concurrently
+            upload = read_upload(file.stream, file.filename)
             try:
-                file.save(filepath)
-                
-                # Process the image
-                image = Image.open(filepath)
-                alt_text = image_processor.generate_alt_text(image)
-                
-                # Ensure alt text is at least 6 words long
-                alt_text_result = enhance_alt_text(alt_text)
-                if alt_text_result['success']:
-                    alt_text = alt_text_result['data']['enhanced_alt_text']
-                
-                # Generate context
-                context_result = generate_context(alt_text)
-                if not context_result['success']:
-                    raise ValueError(context_result['error'])
-                
-                # Generate caption
-                caption_result = social_media_caption(context_result['data']['context'])
-                if not caption_result['success']:
-                    raise ValueError(caption_result['error'])
-                
-                # Generate hashtags
-                hashtags_result = generate_hashtags(context_result['data']['context'])
-                if not hashtags_result['success']:
-                    logger.error(f"Hashtag generation failed: {hashtags_result.get('error')}")
-                    hashtags = []  # Fallback to empty list
-                else:
-                    hashtags = hashtags_result['data']['hashtags']
-                
-                return jsonify({
-                    'success': True,
-                    'data': {
-                        'alt_text': alt_text,
-                        'caption': caption_result['data']['caption'],
-                        'hashtags': hashtags
-                    }
-                })
-                
+                data, meta = cached_pipeline(
+                    'social_media', upload.digest,
+                    lambda: run_pipeline('social_media', upload=upload).output
+                )
             finally:
-                # Clean up temporary file
-                if os.path.exists(filepath):
-                    try:
-                        os.remove(filepath)
-                    except Exception as e:
-                        logger.error(f"Error removing temporary file: {str(e)}")
+                upload.close()
+            return jsonify({
+                'success': True,
+                'data': data,
+                'meta': meta
+            })
                         
+        except QualityGateError as e:
+            return quality_rejection(e, 'success')
         except Exception as e:
             logger.error(f"Error processing request: {str(e)}")
             return jsonify({
@@ -150,31 +124,21 @@ def seo():
                     'code': 'INVALID_IMAGE'
                 }), 400
                 
-            # Save and process image
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
-            
+            # Decode the upload in memory; SEO and social calls run concurrently
+            upload = read_upload(file.stream, file.filename)
             try:
-                # Process the image
-                image = Image.open(filepath)
-                alt_text = image_processor.generate_alt_text(image)
-                
-                # Generate initial context
-                context_result = generate_context(alt_text)
-                if not context_result['success']:
-                    raise ValueError(context_result['error'])
-                
-                # Generate SEO content
-                seo_result = generate_seo_description(context_result['data']['context'], alt_text)
-                if not seo_result['success']:
-                    raise ValueError(seo_result['error'])
-                
+                data, meta = cached_pipeline(
+                    'seo', upload.digest,
+                    lambda: run_pipeline('seo', upload=upload).output
+                )
                 return jsonify({
                     'success': True,
-                    'data': seo_result['data']
+                    'data': data,
+                    'meta': meta
                 })
                 
+            except QualityGateError as e:
+                return quality_rejection(e)
             except Exception as e:
                 logger.error(f"Error processing image: {str(e)}")
                 return jsonify({
@@ -184,12 +148,7 @@ def seo():
                 }), 500
             
             finally:
-                # Clean up uploaded file
-                try:
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
-                except Exception as e:
-                    logger.error(f"Error removing file: {str(e)}")
+                upload.close()
         
         except Exception as e:
             logger.error(f"Server error: {str(e)}")
@@ -201,6 +160,84 @@ def seo():
             
     return render_template('seo.html')
 
+@main.route('/seo/stream', methods=['POST'])
+def seo_stream():
+    """
+    Streaming variant of /seo
+    Emits alt text, context and each Gemini section as soon as it is ready,
+    as NDJSON by default or as Server-Sent Events when the client accepts
+    text/event-stream (or passes format=sse).
+    """
+    try:
+        if 'image' not in request.files:
+            return jsonify({
+                'success': False,
+                'error': 'No image file provided',
+                'code': 'NO_IMAGE'
+            }), 400
+        
+        file = request.files['image']
+        
+        if file.filename == '':
+            return jsonify({
+                'success': False,
+                'error': 'No selected file',
+                'code': 'EMPTY_FILE'
+            }), 400
+            
+        if not allowed_file(file.filename):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid file type. Please upload a PNG, JPG, JPEG, or GIF',
+                'code': 'INVALID_TYPE'
+            }), 400
+        
+        if not validate_image(file.stream):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid image file',
+                'code': 'INVALID_IMAGE'
+            }), 400
+        
+        stream_format = request.args.get('format') or request.form.get('format')
+        if not stream_format:
+            stream_format = 'sse' if 'text/event-stream' in request.headers.get('Accept', '') else 'ndjson'
+        if stream_format not in STREAM_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': f"Invalid stream format. Use one of: {', '.join(STREAM_FORMATS)}",
+                'code': 'INVALID_FORMAT'
+            }), 400
+        
+        # The streaming pipeline takes ownership of the upload and closes it when done
+        upload = read_upload(file.stream, file.filename)
+        events = stream_pipeline('seo_stream', upload, cache_as='seo')
+        
+        def generate():
+            for event in events:
+                if event['event'] == 'error':
+                    # Keep internal details in the logs, as the non-streaming route does
+                    event = {
+                        'event': 'error',
+                        'error': 'Error processing image. Please try again.',
+                        'code': 'PROCESSING_ERROR'
+                    }
+                yield format_event(event, stream_format)
+        
+        mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+        return Response(generate(), mimetype=mimetype, headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Stop proxies from buffering the stream
+        })
+    
+    except Exception as e:
+        logger.error(f"Server error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'An unexpected error occurred. Please try again.',
+            'code': 'SERVER_ERROR'
+        }), 500
+
 @main.route('/general', methods=['GET'])
 def general():
     return render_template('general.html')
@@ -231,43 +268,33 @@ def analyze_general():
             logger.error(f"Error validating image: {str(e)}")
             return jsonify({'error': f'Error validating image: {str(e)}'}), 400
             
-        # Save and process image
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
+        # Decode the upload in memory instead of saving it to disk
+        upload = read_upload(file.stream, file.filename)
         
-        try:
-            file.save(filepath)
-            logger.info(f"Saved file to {filepath}")
-            
+        def process_upload():
             # Process the image using the new general analysis method
-            image = Image.open(filepath)
+            image = upload.image
             logger.info(f"Opened image: {image.format} {image.size}")
             
-            result = image_processor.generate_alt_text_general(image)
+            result = run_pipeline('general', upload=upload).output
             logger.info("Generated alt text and analysis")
-            
-            # Return formatted response matching frontend expectations
-            response_data = {
-                'description': result.get('description', 'No description available'),
-                'objects': [obj['name'] for obj in result.get('objects', []) if isinstance(obj, dict) and 'name' in obj],
-                'colors': result.get('dominant_colors', [])
-            }
+            return result
+        
+        try:
+            response_data, meta = cached_pipeline('general', upload.digest, process_upload)
+            response_data = dict(response_data, meta=meta)
             
             logger.info(f"Returning response: {response_data}")
             return jsonify(response_data)
             
+        except QualityGateError as e:
+            return quality_rejection(e, 'plain')
         except Exception as e:
             logger.error(f"Error processing image: {str(e)}", exc_info=True)
             return jsonify({'error': f'Error processing image: {str(e)}'}), 500
         
         finally:
-            # Clean up uploaded file
-            try:
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                    logger.info(f"Removed temporary file: {filepath}")
-            except Exception as e:
-                logger.error(f"Error removing file: {str(e)}")
+            upload.close()
     
     except Exception as e:
         logger.error(f"Server error in general analysis: {str(e)}", exc_info=True)
@@ -324,18 +351,21 @@ def analyze_medical_image_route():
                 'error': 'Invalid file type. Please upload a valid medical image file.'
             }), 400
 
-        # Create temporary file
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        # Decode the upload in memory instead of saving it to disk
+        upload = read_upload(file.stream, file.filename)
         
-        try:
-            file.save(filepath)
-            
+        def process_upload():
             # Process the image using the medical service
-            from app.services.med_service import analyze_medical_image
-            result = analyze_medical_image(filepath)
+            from app.services.med_service import analyze_medical_upload
+            return analyze_medical_upload(upload)
+        
+        try:
+            result, meta = cached_pipeline(
+                'medical', upload.digest, process_upload,
+                cacheable=lambda result: result.get('success', False)
+            )
             
-            return jsonify(result)
+            return jsonify(dict(result, meta=meta))
             
         except Exception as e:
             logger.error(f"Error processing medical image: {str(e)}")
@@ -343,14 +373,9 @@ def analyze_medical_image_route():
                 'success': False,
                 'error': f'Error processing image: {str(e)}'
             }), 500
-            
+        
         finally:
-            # Clean up temporary file
-            if os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                except Exception as e:
-                    logger.error(f"Error removing temporary file: {str(e)}")
+            upload.close()
                     
     except Exception as e:
         logger.error(f"Server error in medical analysis: {str(e)}")
@@ -385,31 +410,21 @@ def image_analyzer():
                     'code': 'INVALID_TYPE'
                 }), 400
             
-            # Save and process image
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
-            
+            # Decode the upload in memory and process it using image_service
+            upload = read_upload(file.stream, file.filename)
             try:
-                # Process the image using image_service
-                image = Image.open(filepath)
-                alt_text = image_processor.generate_alt_text(image)
-                
-                # Generate enhanced context using text_service
-                enhanced_result = enhance_context(alt_text)
-                if not enhanced_result['success']:
-                    raise ValueError(enhanced_result['error'])
-                
-                enhanced_context = enhanced_result['data']['enhanced_context']
-                
+                data, meta = cached_pipeline(
+                    'image_analyzer', upload.digest,
+                    lambda: run_pipeline('image_analyzer', upload=upload).output
+                )
                 return jsonify({
                     'success': True,
-                    'data': {
-                        'alt_text': alt_text,
-                        'context': enhanced_context
-                    }
+                    'data': data,
+                    'meta': meta
                 })
                 
+            except QualityGateError as e:
+                return quality_rejection(e)
             except Exception as e:
                 logger.error(f"Error processing image: {str(e)}")
                 return jsonify({
@@ -419,12 +434,7 @@ def image_analyzer():
                 }), 500
             
             finally:
-                # Clean up uploaded file
-                try:
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
-                except Exception as e:
-                    logger.error(f"Error removing file: {str(e)}")
+                upload.close()
         
         except Exception as e:
             logger.error(f"Server error: {str(e)}")
@@ -465,45 +475,23 @@ def analyze_social_media():
                 'error_code': 'INVALID_FILE_TYPE'
             }), 400
 
-        # Create temporary file
-        temp_path = None
+        # Decode the upload in memory and process it using your existing services
+        upload = read_upload(file.stream, file.filename)
         try:
-            # Save uploaded file temporarily
-            temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(file.filename))
-            file.save(temp_path)
-
-            # Process the image using your existing services
-            processor = AdvancedImageProcessor()
-            processor.load_image(temp_path)
-
-            # Generate base description
-            alt_text = processor.generate_image_context()
-            
-            # Ensure alt text is at least 6 words long
-            alt_text_result = enhance_alt_text(alt_text)
-            if alt_text_result['success']:
-                alt_text = alt_text_result['data']['enhanced_alt_text']
-
-            # Generate enhanced description for social media
-            enhanced_text = processor.generate_enhanced_text(alt_text)
-
-            # Generate hashtags from the context
-            hashtags = generate_hashtags(enhanced_text)
-
-            return jsonify({
-                'success': True,
-                'data': {
-                    'alt_text': alt_text,
-                    'caption': enhanced_text,
-                    'hashtags': hashtags
-                }
-            })
-
+            data, meta = cached_pipeline(
+                'social_media_analyze', upload.digest,
+                lambda: run_pipeline('social_media_analyze', upload=upload).output
+            )
         finally:
-            # Clean up temporary file
-            if temp_path and os.path.exists(temp_path):
-                os.remove(temp_path)
+            upload.close()
+        return jsonify({
+            'success': True,
+            'data': data,
+            'meta': meta
+        })
 
+    except QualityGateError as e:
+        return quality_rejection(e, 'error_code')
     except Exception as e:
         logger.error(f"Error in social media analysis: {str(e)}")
         return jsonify({
@@ -536,68 +524,31 @@ def advanced_analysis():
                     'error': 'Invalid file type. Please upload a PNG, JPG, or JPEG'
                 }), 400
             
-            # Save and process image
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            chart_format = request.form.get('chart_format') or request.args.get('chart_format') or CHART_DEFAULT_FORMAT
+            if chart_format not in CHART_FORMATS:
+                return jsonify({
+                    'success': False,
+                    'error': f"Invalid chart format. Use one of: {', '.join(CHART_FORMATS)}"
+                }), 400
             
+            # Decode once in memory; the BLIP and colour stages share the same image
+            upload = read_upload(file.stream, file.filename)
             try:
-                # Initialize processors
-                image = Image.open(filepath)
-                processor = AdvancedImageProcessor()
-                processor.load_image(filepath)
-                
-                # Generate base description
-                alt_text = image_processor.generate_alt_text(image)
-                context_result = generate_context(alt_text)
-                
-                if not context_result['success']:
-                    raise Exception(context_result['error'])
-                
-                # Generate enhanced description
-                enhanced_result = processor.generate_enhanced_text(context_result['data']['context'])
-                
-                # Analyze colors
-                hist_fig, pie_fig, color_data = processor.analyze_colors()
-                
-                # Convert matplotlib figures to base64
-                import io
-                import base64
-                
-                def fig_to_base64(fig):
-                    buf = io.BytesIO()
-                    fig.savefig(buf, format='png', bbox_inches='tight')
-                    buf.seek(0)
-                    return base64.b64encode(buf.getvalue()).decode('utf-8')
-                
-                # Get sentiment analysis
-                try:
-                    sentiment_result = processor.sentiment_analysis(enhanced_result)
-                    sentiment_data = {
-                        'score': float(sentiment_result['Confidence'].values[0]),
-                        'label': sentiment_result['Sentiment'].values[0]
-                    }
-                except Exception as sentiment_err:
-                    logger.error(f"Error in sentiment analysis: {str(sentiment_err)}")
-                    sentiment_data = {
-                        'score': 0.5,
-                        'label': 'Neutral'
-                    }
-                
+                # Colour analysis runs alongside the Gemini calls
+                data, meta = cached_pipeline(
+                    'advanced', upload.digest,
+                    lambda: run_pipeline('advanced', upload=upload).output
+                )
+                # Rendered charts are cached separately, keyed on the colour data
+                data = with_color_charts(data, chart_format)
                 return jsonify({
                     'success': True,
-                    'data': {
-                        'description': enhanced_result,
-                        'color_analysis': {
-                            'histogram': fig_to_base64(hist_fig),
-                            'pie_chart': fig_to_base64(pie_fig),
-                            'dominant_colors': color_data['dominant_colors'],
-                            'color_percentages': color_data['percentages']
-                        },
-                        'sentiment': sentiment_data
-                    }
+                    'data': data,
+                    'meta': meta
                 })
                 
+            except QualityGateError as e:
+                return quality_rejection(e, 'success')
             except Exception as e:
                 logger.error(f"Error processing image: {str(e)}")
                 return jsonify({
@@ -606,12 +557,7 @@ def advanced_analysis():
                 }), 500
             
             finally:
-                # Clean up uploaded file
-                try:
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
-                except Exception as cleanup_err:
-                    logger.error(f"Error cleaning up file: {str(cleanup_err)}")
+                upload.close()
         
         return render_template('advanced_analysis.html')
         
@@ -621,3 +567,186 @@ def advanced_analysis():
             'success': False,
             'error': str(e)
         }), 500 
+
+@main.route('/api/batch', methods=['POST'])
+def create_catalog_batch():
+    """Start analyzing a catalogue uploaded as a ZIP archive or manifest"""
+    try:
+        file = request.files.get('archive') or request.files.get('manifest')
+        if file is None or file.filename == '':
+            return jsonify({
+                'success': False,
+                'error': 'Upload a ZIP archive as "archive" or a manifest as "manifest"'
+            }), 400
+        
+        output_format = request.form.get('format', 'jsonl')
+        tasks = [task.strip() for task in request.form.get('tasks', ','.join(CATALOG_TASKS)).split(',') if task.strip()]
+        
+        try:
+            batch_id = create_batch(file.stream, file.filename, output_format, tasks)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        start_batch(batch_id)
+        return jsonify({
+            'success': True,
+            'data': {
+                'batch_id': batch_id,
+                'status_url': f'/api/batch/{batch_id}',
+                'results_url': f'/api/batch/{batch_id}/results'
+            }
+        }), 202
+    
+    except Exception as e:
+        logger.error(f"Error creating batch: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@main.route('/api/batch/<batch_id>', methods=['GET'])
+def get_catalog_batch(batch_id):
+    try:
+        state = batch_status(batch_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if state is None:
+        return jsonify({'success': False, 'error': 'Batch not found'}), 404
+    return jsonify({'success': True, 'data': state})
+
+@main.route('/api/batch/<batch_id>/resume', methods=['POST'])
+def resume_catalog_batch(batch_id):
+    """Restart an interrupted batch; completed images are not processed again"""
+    try:
+        started = start_batch(batch_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    return jsonify({'success': True, 'data': {'batch_id': batch_id, 'started': started}}), 202
+
+@main.route('/api/batch/<batch_id>/results', methods=['GET'])
+def download_catalog_results(batch_id):
+    try:
+        path = results_path(batch_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if path is None or not os.path.exists(path):
+        return jsonify({'success': False, 'error': 'No results yet'}), 404
+    mimetype = 'text/csv' if path.endswith('.csv') else 'application/x-ndjson'
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=os.path.basename(path))
+
+@main.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue an analysis for the worker processes and return its job id"""
+    try:
+        if 'image' not in request.files:
+            return jsonify({
+                'success': False,
+                'error': 'No image file provided'
+            }), 400
+        
+        file = request.files['image']
+        
+        if file.filename == '':
+            return jsonify({
+                'success': False,
+                'error': 'No selected file'
+            }), 400
+        
+        if not allowed_file(file.filename):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid file type. Please upload a PNG, JPG, JPEG, or GIF'
+            }), 400
+        
+        pipeline = request.form.get('pipeline', 'advanced')
+        if pipeline not in JOB_PIPELINES:
+            return jsonify({
+                'success': False,
+                'error': f"Unknown pipeline. Use one of: {', '.join(JOB_PIPELINES)}"
+            }), 400
+        
+        upload = read_upload(file.stream, file.filename)
+        try:
+            job_id = get_job_queue().submit(pipeline, upload)
+        finally:
+            upload.close()
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': f'/api/jobs/{job_id}',
+                'events_url': f'/api/jobs/{job_id}/events'
+            }
+        }), 202
+    
+    except Exception as e:
+        logger.error(f"Error submitting job: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def _job_response(view):
+    # Advanced results store colour data only; charts are rendered when read
+    if view.get('data') and view['pipeline'] == 'advanced':
+        chart_format = request.args.get('chart_format', CHART_DEFAULT_FORMAT)
+        if chart_format in CHART_FORMATS:
+            view['data'] = with_color_charts(view['data'], chart_format)
+    return view
+
+@main.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'data': _job_response(job_view(job))})
+
+@main.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_status_events(job_id):
+    """Server-Sent Events stream of a job's status changes, ending when it finishes"""
+    if get_job_queue().get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    def generate():
+        for view in job_events(job_id):
+            if view is None:
+                yield ': keep-alive\n\n'
+                continue
+            yield f"event: status\ndata: {json.dumps(_job_response(view))}\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@main.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint for this process"""
+    if not METRICS_ENABLED:
+        return jsonify({'success': False, 'error': 'Metrics are disabled'}), 404
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+@main.route('/admin/profiles', methods=['GET'])
+def stored_profiles():
+    """List stored request profiles (requires X-Admin-Token)"""
+    if not is_admin(request.headers.get('X-Admin-Token')):
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    profiles = list_profiles()
+    for profile in profiles:
+        profile['url'] = f"/admin/profiles/{profile['profile_id']}"
+    return jsonify({'success': True, 'data': profiles})
+
+@main.route('/admin/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    """Download a stored profile: .pstats (cprofile) or speedscope JSON (sample)"""
+    if not is_admin(request.headers.get('X-Admin-Token')):
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    path = profile_path(profile_id)
+    if path is None:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    return send_file(path, as_attachment=True, download_name=os.path.basename(path))
@@ -1,17 +1,16 @@
 import numpy as np
 from PIL import Image
-import matplotlib
-matplotlib.use('Agg')  # Set non-interactive backend before importing pyplot
-import matplotlib.pyplot as plt
-import pandas as pd
-from sklearn.cluster import KMeans
 from app.services.text_service import generate_context, enhance_context, analyze_sentiment
 from app.services.image_service import image_processor
+from app.services.palette_service import extract_palette
+from app.services.image_context import ImageContext
 import logging
-from config.gemini_config import get_gemini_client, GEMINI_CONFIG
+from config.ai_config import GEMINI_CONFIG
+from config.config import PALETTE_MAX_SIDE
+from app.services.gemini_client import get_model
+from app.services.cache_service import mark_degraded
+from app.utils.tracing import traced
 import json
-import io
-import base64
 
 logger = logging.getLogger(__name__)
 
@@ -19,28 +18,43 @@ class AdvancedImageProcessor:
     def __init__(self):
         self.image = None
         self.image_array = None
+        self.context = None
         self.color_clusters = 5  # Number of dominant colors to detect
-        self.gemini = get_gemini_client()
 
-    def load_image(self, image_path):
-        """Load and prepare image for processing"""
+    @traced('load_image')
+    def load_image(self, image_source, image_array=None):
+        """
+        Load and prepare image for processing
+        Args:
+            image_source: File path, an already decoded PIL.Image or a shared ImageContext
+            image_array (np.ndarray, optional): Pre-computed RGB pixel array to reuse
+        """
         try:
-            self.image = Image.open(image_path)
+            if isinstance(image_source, ImageContext):
+                self.context = image_source
+                self.image = image_source.image
+                self.image_array = image_source.rgb_array
+                return self.image, self.image_array
+            if isinstance(image_source, Image.Image):
+                self.image = image_source
+            else:
+                self.image = Image.open(image_source)
             # Convert image to RGB mode if it isn't already
             if self.image.mode != 'RGB':
                 self.image = self.image.convert('RGB')
-            self.image_array = np.array(self.image)
+            self.image_array = image_array if image_array is not None else np.asarray(self.image)
             return self.image, self.image_array
         except Exception as e:
             raise ValueError(f"Error loading image: {str(e)}")
 
+    @traced('image_context')
     def generate_image_context(self):
         """Generate detailed image description using Gemini Vision"""
         try:
             if self.image is None:
                 raise ValueError("No image loaded")
             
-            model = self.gemini.GenerativeModel(GEMINI_CONFIG['vision_model'])
+            model = get_model(GEMINI_CONFIG['vision_model'])
             
             prompt = """Analyze this image in detail and provide:
             1. A comprehensive description
@@ -54,10 +68,11 @@ class AdvancedImageProcessor:
         except Exception as e:
             raise ValueError(f"Error generating image context: {str(e)}")
 
+    @traced('enhanced_text')
     def generate_enhanced_text(self, base_description):
         """Generate enhanced description using Gemini"""
         try:
-            model = self.gemini.GenerativeModel(GEMINI_CONFIG['text_model'])
+            model = get_model(GEMINI_CONFIG['text_model'])
             
             prompt = f"""Based on this image description, provide an enhanced, more detailed analysis:
             
@@ -74,79 +89,42 @@ class AdvancedImageProcessor:
         except Exception as e:
             raise ValueError(f"Error generating enhanced text: {str(e)}")
 
+    @traced('colors')
     def analyze_colors(self):
-        """Analyze color distribution and dominant colors"""
+        """
+        Analyze color distribution and dominant colors
+        Returns:
+            dict: Channel means ('bins', 'distribution') and the dominant colors
+                with their percentages; charts are drawn by chart_service
+        """
         try:
             if self.image_array is None:
                 raise ValueError("No image loaded")
 
-            # Reshape the image array for color analysis
-            pixels = self.image_array.reshape(-1, 3)
-            
-            # Create color histogram with improved visualization
-            plt.figure(figsize=(8, 4))
-            hist_data = np.mean(pixels, axis=0)
-            plt.plot(range(3), hist_data, marker='o', color='#23cca2')  # Primary green
-            plt.xticks(range(3), ['R', 'G', 'B'])
-            plt.title('Color Distribution', color='#2c3e50')  # Dark text color
-            plt.grid(True, alpha=0.3)
-            hist_fig = plt.gcf()
-            plt.close()
-
-            # Find dominant colors using K-means
-            kmeans = KMeans(n_clusters=self.color_clusters, random_state=42)
-            kmeans.fit(pixels)
-            colors = kmeans.cluster_centers_
-            
-            # Calculate color percentages
-            labels = kmeans.labels_
-            unique_labels, label_counts = np.unique(labels, return_counts=True)
-            percentages = (label_counts / len(labels)) * 100
-            
-            # Sort colors by percentage
-            sorted_indices = np.argsort(percentages)[::-1]
-            colors = colors[sorted_indices]
-            percentages = percentages[sorted_indices]
-            
-            # Create pie chart of dominant colors
-            plt.figure(figsize=(6, 6))
-            
-            # Convert colors to RGB format for plotting
-            rgb_colors = colors / 255.0
-            
-            # Create pie chart with percentage labels
-            patches, texts, autotexts = plt.pie(percentages, 
-                                              colors=rgb_colors, 
-                                              autopct='%1.1f%%',
-                                              labels=[f'Color {i+1}' for i in range(len(colors))])
-            
-            plt.title('Dominant Colors')
-            
-            # Format percentage texts
-            for autotext in autotexts:
-                autotext.set_color('white')
-                autotext.set_fontsize(8)
-            
-            pie_fig = plt.gcf()
-            plt.close()
+            # Dominant colors and channel means come from a downsampled thumbnail
+            if self.context is not None:
+                source = self.context.thumbnail(PALETTE_MAX_SIDE, processed=False)
+            else:
+                source = self.image
+            palette = extract_palette(source, n_colors=self.color_clusters)
 
-            # Convert color data for JSON response
-            color_data = {
+            return {
                 'bins': list(range(3)),  # R, G, B channels
-                'distribution': hist_data.tolist(),  # Color distribution data
-                'dominant_colors': colors.astype(int).tolist(),  # RGB values of dominant colors
-                'percentages': percentages.tolist()  # Percentage of each dominant color
+                'distribution': palette['mean_rgb'],  # Color distribution data
+                'dominant_colors': palette['colors'],  # RGB values of dominant colors
+                'percentages': palette['percentages']  # Percentage of each dominant color
             }
-
-            return hist_fig, pie_fig, color_data
         except Exception as e:
             logger.error(f"Color analysis error details: {str(e)}")
             raise ValueError(f"Error analyzing colors: {str(e)}")
 
+    @traced('sentiment')
     def sentiment_analysis(self, text):
         """Analyze sentiment using Gemini"""
+        import pandas as pd
+
         try:
-            model = self.gemini.GenerativeModel(GEMINI_CONFIG['text_model'])
+            model = get_model(GEMINI_CONFIG['text_model'])
             
             prompt = f"""Analyze the sentiment of this text and provide:
             1. Overall sentiment category (Positive, Negative, or Neutral)
@@ -202,6 +180,7 @@ class AdvancedImageProcessor:
             except json.JSONDecodeError as json_err:
                 # Fallback to a default sentiment analysis if JSON parsing fails
                 logger.error(f"JSON parsing error: {str(json_err)}. Response: {response_text}")
+                mark_degraded('sentiment response was not JSON')
                 return pd.DataFrame([{
                     'Sentiment': 'Neutral',
                     'Confidence': 0.5,
@@ -209,6 +188,7 @@ class AdvancedImageProcessor:
                 }])
         except Exception as e:
             logger.error(f"Sentiment analysis error: {str(e)}")
+            mark_degraded('sentiment analysis failed')
             # Return a default sentiment rather than raising an error
             return pd.DataFrame([{
                 'Sentiment': 'Neutral',
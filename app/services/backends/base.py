@@ -0,0 +1,168 @@
+"""
+Pluggable vision backends.
+
+A backend owns the captioning and detection models and exposes them as
+batch operations on ImageContexts (see app/services/image_context.py). ImageProcessor (and through it
+every route) only talks to this interface, so models or runtimes can be
+swapped with VISION_BACKEND without touching the routes.
+"""
+import importlib
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Backend name -> (module, class); modules are imported only when selected
+BACKENDS = {
+    'torch': ('app.services.backends.torch_backend', 'TorchBackend'),
+    'onnx': ('app.services.backends.onnx_backend', 'OnnxBackend'),
+}
+
+
+class VisionBackend:
+    """Interface every vision backend implements"""
+
+    name = 'base'
+
+    # Logical model name ('blip', 'detr') -> model registry key
+    registry_names = {}
+
+    def __init__(self, registry=None):
+        from app.services.model_registry import model_registry
+
+        self.registry = registry or model_registry
+
+    def _get(self, model):
+        """Return a loaded model bundle, or None if it is unavailable"""
+        from app.services.model_registry import ModelLoadError
+
+        try:
+            return self.registry.get(self.registry_names[model])
+        except ModelLoadError:
+            return None
+
+    @property
+    def device(self):
+        return 'cpu'
+
+    @property
+    def caption_available(self):
+        return self._get('blip') is not None
+
+    @property
+    def detection_available(self):
+        return self._get('detr') is not None
+
+    def warm_up(self, models):
+        """
+        Load models ahead of the first request
+        Args:
+            models (iterable): Logical model names such as 'blip' and 'detr'
+        """
+        names = []
+        for model in models:
+            if model in self.registry_names:
+                names.append(self.registry_names[model])
+            else:
+                logger.warning(f"Warm-up skipped for '{model}': not provided by the {self.name} backend")
+        self.registry.warm_up(names)
+
+    def caption_batch(self, images):
+        """
+        Caption several preprocessed images
+        Args:
+            images (list): ImageContext inputs
+        Returns:
+            list: One caption per image
+        """
+        raise NotImplementedError
+
+    def detect_batch(self, images):
+        """
+        Detect objects in several images
+        Args:
+            images (list): ImageContext inputs
+        Returns:
+            list: One list of {'name', 'confidence'} dicts per image, deduplicated by name
+        """
+        raise NotImplementedError
+
+    def describe(self, image):
+        """
+        Generate a longer description of one image
+        Args:
+            image (ImageContext): Input image
+        Returns:
+            str: Description
+        """
+        raise NotImplementedError
+
+
+def blip_pixel_values(processor, contexts):
+    """
+    Stack BLIP inputs, resizing and normalizing each image only once per context
+    Args:
+        processor (BlipProcessor): BLIP processor
+        contexts (list): ImageContext inputs
+    Returns:
+        np.ndarray: float32 pixel values, (batch, 3, size, size)
+    """
+    return np.stack([
+        context.model_input('blip', lambda image: processor.image_processor(
+            images=image, return_tensors="np")['pixel_values'][0].astype(np.float32))
+        for context in contexts
+    ])
+
+def detr_inputs(processor, contexts):
+    """
+    Pad per-image DETR inputs (each built once per context) to a common size
+    Args:
+        processor (DetrImageProcessor): DETR processor
+        contexts (list): ImageContext inputs
+    Returns:
+        tuple: (pixel_values float32 (batch, 3, H, W), pixel_mask int64 (batch, H, W))
+    """
+    arrays = [
+        context.model_input('detr', lambda image: processor(
+            images=image, return_tensors="np")['pixel_values'][0].astype(np.float32))
+        for context in contexts
+    ]
+    height = max(array.shape[1] for array in arrays)
+    width = max(array.shape[2] for array in arrays)
+    pixel_values = np.zeros((len(arrays), 3, height, width), dtype=np.float32)
+    pixel_mask = np.zeros((len(arrays), height, width), dtype=np.int64)
+    # Same bottom/right zero padding the processor applies to a batch
+    for index, array in enumerate(arrays):
+        pixel_values[index, :, :array.shape[1], :array.shape[2]] = array
+        pixel_mask[index, :array.shape[1], :array.shape[2]] = 1
+    return pixel_values, pixel_mask
+
+def unique_detections(scores, labels, id2label):
+    """Remove duplicate labels while keeping the highest confidence for each"""
+    unique_objects = {}
+    for score, label in zip(scores, labels):
+        name = id2label[label]
+        confidence = round(float(score) * 100, 2)
+        if name not in unique_objects or confidence > unique_objects[name]['confidence']:
+            unique_objects[name] = {
+                'name': name,
+                'confidence': confidence
+            }
+    return list(unique_objects.values())
+
+
+def create_backend(name, **kwargs):
+    """
+    Instantiate a backend by name
+    Args:
+        name (str): Key in BACKENDS
+        **kwargs: Passed to the backend constructor
+    Returns:
+        VisionBackend: The backend
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown vision backend '{name}'. Use one of: {', '.join(BACKENDS)}")
+    module_name, class_name = BACKENDS[name]
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    return backend_class(**kwargs)
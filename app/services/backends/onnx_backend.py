@@ -0,0 +1,275 @@
+"""
+ONNX Runtime backend for CPU inference.
+
+On first use BLIP's vision encoder and text decoder, and DETR, are exported
+to ONNX under ONNX_MODEL_DIR (this step needs torch); later starts load the
+exported graphs directly. Inference runs on ONNX Runtime's CPU provider and
+uses the Hugging Face processors with numpy tensors, so serving does not
+touch torch at all.
+"""
+import json
+import os
+import re
+import logging
+
+import numpy as np
+
+from app.services.backends.base import VisionBackend, blip_pixel_values, detr_inputs, unique_detections
+from app.services.model_registry import model_registry
+from config.config import (
+    BLIP_MODEL,
+    DETR_MODEL,
+    DETECTION_THRESHOLD,
+    ONNX_MODEL_DIR,
+    ONNX_NUM_THREADS,
+    ONNX_OPSET,
+)
+
+logger = logging.getLogger(__name__)
+
+# Decoding settings for describe(), matching the torch backend's lengths
+DESCRIBE_MIN_LENGTH = 30
+DESCRIBE_MAX_LENGTH = 100
+
+
+def _export_dir(model_name):
+    """Directory holding the exported graphs for a Hugging Face model id"""
+    return os.path.join(ONNX_MODEL_DIR, re.sub(r'[^A-Za-z0-9_.-]+', '--', model_name))
+
+def _session(path):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if ONNX_NUM_THREADS:
+        options.intra_op_num_threads = ONNX_NUM_THREADS
+    return ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+
+def _read_meta(directory):
+    path = os.path.join(directory, 'meta.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def _write_meta(directory, meta):
+    # meta.json is written last, so its presence marks a complete export
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def export_blip(directory):
+    """Export BLIP's vision encoder and text decoder (without KV cache) to ONNX"""
+    import torch
+    from transformers import BlipForConditionalGeneration
+
+    model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL).eval()
+    model.config.text_config.use_cache = False
+    image_size = model.config.vision_config.image_size
+
+    class VisionEncoder(torch.nn.Module):
+        def __init__(self, vision_model):
+            super().__init__()
+            self.vision_model = vision_model
+
+        def forward(self, pixel_values):
+            return self.vision_model(pixel_values=pixel_values, return_dict=True).last_hidden_state
+
+    class TextDecoder(torch.nn.Module):
+        def __init__(self, text_decoder):
+            super().__init__()
+            self.text_decoder = text_decoder
+
+        def forward(self, input_ids, attention_mask, encoder_hidden_states):
+            return self.text_decoder(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                encoder_hidden_states=encoder_hidden_states,
+                use_cache=False,
+                return_dict=True
+            ).logits
+
+    pixel_values = torch.zeros(1, 3, image_size, image_size)
+    with torch.inference_mode():
+        hidden_states = model.vision_model(pixel_values=pixel_values).last_hidden_state
+    input_ids = torch.ones(1, 4, dtype=torch.long)
+
+    torch.onnx.export(
+        VisionEncoder(model.vision_model), (pixel_values,),
+        os.path.join(directory, 'vision_encoder.onnx'),
+        input_names=['pixel_values'], output_names=['last_hidden_state'],
+        dynamic_axes={'pixel_values': {0: 'batch'}, 'last_hidden_state': {0: 'batch'}},
+        opset_version=ONNX_OPSET
+    )
+    torch.onnx.export(
+        TextDecoder(model.text_decoder), (input_ids, torch.ones_like(input_ids), hidden_states),
+        os.path.join(directory, 'text_decoder.onnx'),
+        input_names=['input_ids', 'attention_mask', 'encoder_hidden_states'], output_names=['logits'],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'encoder_hidden_states': {0: 'batch'},
+            'logits': {0: 'batch', 1: 'sequence'}
+        },
+        opset_version=ONNX_OPSET
+    )
+
+    text_config = model.config.text_config
+    return {
+        'bos_token_id': text_config.bos_token_id,
+        'sep_token_id': text_config.sep_token_id,
+        'pad_token_id': text_config.pad_token_id,
+        'max_length': model.generation_config.max_length
+    }
+
+def export_detr(directory):
+    """Export DETR (logits and boxes) to ONNX"""
+    import torch
+    from transformers import DetrForObjectDetection
+
+    model = DetrForObjectDetection.from_pretrained(DETR_MODEL).eval()
+
+    class Detector(torch.nn.Module):
+        def __init__(self, detr):
+            super().__init__()
+            self.detr = detr
+
+        def forward(self, pixel_values, pixel_mask):
+            outputs = self.detr(pixel_values=pixel_values, pixel_mask=pixel_mask, return_dict=True)
+            return outputs.logits, outputs.pred_boxes
+
+    pixel_values = torch.zeros(1, 3, 800, 800)
+    pixel_mask = torch.ones(1, 800, 800, dtype=torch.long)
+    torch.onnx.export(
+        Detector(model), (pixel_values, pixel_mask),
+        os.path.join(directory, 'detr.onnx'),
+        input_names=['pixel_values', 'pixel_mask'], output_names=['logits', 'pred_boxes'],
+        dynamic_axes={
+            'pixel_values': {0: 'batch', 2: 'height', 3: 'width'},
+            'pixel_mask': {0: 'batch', 1: 'height', 2: 'width'},
+            'logits': {0: 'batch'},
+            'pred_boxes': {0: 'batch'}
+        },
+        opset_version=ONNX_OPSET
+    )
+    return {'id2label': {str(k): v for k, v in model.config.id2label.items()}}
+
+def _ensure_exported(model_name, exporter):
+    """Export a model unless a complete export already exists; returns its directory and metadata"""
+    directory = _export_dir(model_name)
+    meta = _read_meta(directory)
+    if meta is None:
+        logger.info(f"Exporting {model_name} to ONNX in {directory}...")
+        os.makedirs(directory, exist_ok=True)
+        meta = exporter(directory)
+        _write_meta(directory, meta)
+    return directory, meta
+
+
+def _load_blip_onnx():
+    """Load the BLIP processor and ONNX Runtime sessions, exporting on first use"""
+    from transformers import BlipProcessor
+
+    directory, meta = _ensure_exported(BLIP_MODEL, export_blip)
+    processor = BlipProcessor.from_pretrained(BLIP_MODEL)
+    sessions = {
+        'vision_encoder': _session(os.path.join(directory, 'vision_encoder.onnx')),
+        'text_decoder': _session(os.path.join(directory, 'text_decoder.onnx'))
+    }
+    return processor, sessions, meta
+
+def _load_detr_onnx():
+    """Load the DETR processor and ONNX Runtime session, exporting on first use"""
+    from transformers import DetrImageProcessor
+
+    directory, meta = _ensure_exported(DETR_MODEL, export_detr)
+    processor = DetrImageProcessor.from_pretrained(DETR_MODEL)
+    session = _session(os.path.join(directory, 'detr.onnx'))
+    return processor, session, meta
+
+model_registry.register('blip_onnx', _load_blip_onnx)
+model_registry.register('detr_onnx', _load_detr_onnx)
+
+
+class OnnxBackend(VisionBackend):
+    """
+    BLIP and DETR on ONNX Runtime (CPU).
+
+    Captions and descriptions are decoded greedily; describe() therefore
+    differs slightly from the torch backend's beam search.
+    """
+
+    name = 'onnx'
+    registry_names = {'blip': 'blip_onnx', 'detr': 'detr_onnx'}
+
+    def _greedy_decode(self, bundle, pixel_values, max_length, min_length=0):
+        """
+        Greedy decoding with the exported text decoder
+        Args:
+            bundle (tuple): (processor, sessions, meta) from _load_blip_onnx
+            pixel_values (np.ndarray): Preprocessed images
+            max_length (int): Maximum sequence length, including the BOS token
+            min_length (int): The SEP token is suppressed until this length
+        Returns:
+            list: Decoded strings
+        """
+        processor, sessions, meta = bundle
+        hidden_states = sessions['vision_encoder'].run(None, {'pixel_values': pixel_values})[0]
+
+        batch = pixel_values.shape[0]
+        input_ids = np.full((batch, 1), meta['bos_token_id'], dtype=np.int64)
+        finished = np.zeros(batch, dtype=bool)
+        while input_ids.shape[1] < max_length and not finished.all():
+            logits = sessions['text_decoder'].run(None, {
+                'input_ids': input_ids,
+                'attention_mask': np.ones_like(input_ids),
+                'encoder_hidden_states': hidden_states
+            })[0][:, -1, :]
+            if input_ids.shape[1] < min_length:
+                logits[:, meta['sep_token_id']] = -np.inf
+            next_tokens = logits.argmax(axis=-1)
+            next_tokens[finished] = meta['pad_token_id']
+            finished |= next_tokens == meta['sep_token_id']
+            input_ids = np.concatenate([input_ids, next_tokens[:, None]], axis=1)
+
+        return processor.batch_decode(input_ids, skip_special_tokens=True)
+
+    def caption_batch(self, images):
+        bundle = self._get('blip')
+        if bundle is None:
+            raise RuntimeError("BLIP model not available for alt text generation")
+        processor, _, meta = bundle
+        return self._greedy_decode(bundle, blip_pixel_values(processor, images), meta['max_length'])
+
+    def describe(self, image):
+        bundle = self._get('blip')
+        if bundle is None:
+            raise RuntimeError("BLIP model not available for image description")
+        return self._greedy_decode(
+            bundle, blip_pixel_values(bundle[0], [image]), DESCRIBE_MAX_LENGTH, DESCRIBE_MIN_LENGTH
+        )[0]
+
+    def detect_batch(self, images):
+        bundle = self._get('detr')
+        if bundle is None:
+            raise RuntimeError("DETR model not available for object detection")
+        processor, session, meta = bundle
+
+        pixel_values, pixel_mask = detr_inputs(processor, images)
+        logits = session.run(['logits'], {'pixel_values': pixel_values, 'pixel_mask': pixel_mask})[0]
+
+        # Softmax over classes, dropping the trailing "no object" class
+        probabilities = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        probabilities /= probabilities.sum(axis=-1, keepdims=True)
+        probabilities = probabilities[..., :-1]
+        scores = probabilities.max(axis=-1)
+        labels = probabilities.argmax(axis=-1)
+
+        id2label = meta['id2label']
+        results = []
+        for image_scores, image_labels in zip(scores, labels):
+            keep = image_scores > DETECTION_THRESHOLD
+            results.append(unique_detections(
+                image_scores[keep].tolist(), [str(label) for label in image_labels[keep]], id2label
+            ))
+        return results
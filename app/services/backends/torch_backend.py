@@ -0,0 +1,141 @@
+"""
+Eager PyTorch backend (the default).
+
+BLIP and DETR are loaded through the model registry with the configured
+inference profile (see app/utils/inference_utils.py).
+"""
+import logging
+
+from app.services.backends.base import VisionBackend, blip_pixel_values, detr_inputs, unique_detections
+from app.services.model_registry import model_registry
+from app.utils.init_utils import initialize_torch
+from app.utils.inference_utils import get_profile, optimize_model, inference_context
+from config.config import (
+    BLIP_MODEL,
+    DETR_MODEL,
+    DETECTION_THRESHOLD,
+    BLIP_INFERENCE_PROFILE,
+    DETR_INFERENCE_PROFILE,
+)
+
+logger = logging.getLogger(__name__)
+
+MODEL_INFERENCE_PROFILES = {
+    'blip': BLIP_INFERENCE_PROFILE,
+    'detr': DETR_INFERENCE_PROFILE,
+}
+
+def _load_blip(profile_name=None):
+    """Load the BLIP processor and captioning model with its inference profile applied"""
+    initialize_torch()
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+
+    profile = get_profile(profile_name or MODEL_INFERENCE_PROFILES['blip'])
+    processor = BlipProcessor.from_pretrained(BLIP_MODEL)
+    model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL)
+    model = model.to(model_registry.device)
+    model.eval()
+    model = optimize_model(model, profile, model_registry.device,
+                           image_size=processor.image_processor.size['height'])
+    return processor, model
+
+def _load_detr(profile_name=None):
+    """Load the DETR processor and object detection model with its inference profile applied"""
+    initialize_torch()
+    from transformers import DetrImageProcessor, DetrForObjectDetection
+
+    profile = get_profile(profile_name or MODEL_INFERENCE_PROFILES['detr'])
+    processor = DetrImageProcessor.from_pretrained(DETR_MODEL)
+    model = DetrForObjectDetection.from_pretrained(DETR_MODEL)
+    model = model.to(model_registry.device)
+    model.eval()
+    model = optimize_model(model, profile, model_registry.device)
+    return processor, model
+
+model_registry.register('blip', _load_blip)
+model_registry.register('detr', _load_detr)
+
+
+class TorchBackend(VisionBackend):
+    """BLIP and DETR on PyTorch"""
+
+    name = 'torch'
+    registry_names = {'blip': 'blip', 'detr': 'detr'}
+
+    def __init__(self, registry=None, profiles=None):
+        """
+        Args:
+            registry (ModelRegistry, optional): Registry holding 'blip' and 'detr'
+            profiles (dict, optional): Inference profile name per model, defaults to config
+        """
+        super().__init__(registry)
+        self.profiles = dict(MODEL_INFERENCE_PROFILES, **(profiles or {}))
+
+    @property
+    def device(self):
+        return self.registry.device
+
+    def _inference(self, model):
+        return inference_context(get_profile(self.profiles[model]), self.device)
+
+    def caption_batch(self, images):
+        bundle = self._get('blip')
+        if bundle is None:
+            raise RuntimeError("BLIP model not available for alt text generation")
+        processor, model = bundle
+
+        import torch
+
+        pixel_values = torch.from_numpy(blip_pixel_values(processor, images)).to(self.device)
+        with self._inference('blip'):
+            out = model.generate(pixel_values=pixel_values)
+        return processor.batch_decode(out, skip_special_tokens=True)
+
+    def detect_batch(self, images):
+        bundle = self._get('detr')
+        if bundle is None:
+            raise RuntimeError("DETR model not available for object detection")
+        processor, model = bundle
+
+        import torch
+
+        pixel_values, pixel_mask = detr_inputs(processor, images)
+        inputs = {
+            'pixel_values': torch.from_numpy(pixel_values).to(self.device),
+            'pixel_mask': torch.from_numpy(pixel_mask).to(self.device)
+        }
+
+        with self._inference('detr'):
+            outputs = model(**inputs)
+
+            target_sizes = torch.tensor([context.size[::-1] for context in images], device=self.device)
+            postprocessed_outputs = processor.post_process_object_detection(
+                outputs,
+                target_sizes=target_sizes,
+                threshold=DETECTION_THRESHOLD
+            )
+
+        id2label = model.config.id2label
+        return [
+            unique_detections(detections['scores'].tolist(), detections['labels'].tolist(), id2label)
+            for detections in postprocessed_outputs
+        ]
+
+    def describe(self, image):
+        bundle = self._get('blip')
+        if bundle is None:
+            raise RuntimeError("BLIP model not available for image description")
+        processor, model = bundle
+
+        import torch
+
+        pixel_values = torch.from_numpy(blip_pixel_values(processor, [image])).to(self.device)
+        with self._inference('blip'):
+            out = model.generate(
+                pixel_values=pixel_values,
+                max_length=100,
+                num_beams=5,
+                min_length=30,
+                temperature=0.7
+            )
+        return processor.decode(out[0], skip_special_tokens=True)
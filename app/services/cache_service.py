@@ -0,0 +1,349 @@
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config.config import (
+    BLIP_MODEL,
+    DETR_MODEL,
+    BLIP_INFERENCE_PROFILE,
+    DETR_INFERENCE_PROFILE,
+    VISION_BACKEND,
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_TTL,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_MAX_BYTES,
+)
+from config.ai_config import GEMINI_CONFIG
+from app.utils.metrics import registry as metrics_registry, RESULT_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# Bump when a pipeline's output format changes so stale entries are ignored
+CACHE_SCHEMA_VERSION = 3
+
+# Models whose output feeds cached results, with the settings that change that output
+# (an int8 or bf16 profile, or the ONNX backend's greedy decoding, captions differently from fp32)
+MODEL_VERSIONS = {
+    'vision_backend': VISION_BACKEND,
+    'blip': BLIP_MODEL,
+    'detr': DETR_MODEL,
+    'blip_profile': BLIP_INFERENCE_PROFILE,
+    'detr_profile': DETR_INFERENCE_PROFILE,
+    'text_model': GEMINI_CONFIG['text_model'],
+    'vision_model': GEMINI_CONFIG['vision_model'],
+}
+
+_MISSING = object()
+
+# Reasons the result being computed in this context fell back to a degraded answer
+_degraded = contextvars.ContextVar('degraded_result', default=None)
+
+
+class MemoryLRUCache:
+    """Thread-safe in-memory LRU cache with optional per-entry TTL"""
+
+    def __init__(self, max_entries=256, ttl=None):
+        """
+        Args:
+            max_entries (int): Maximum number of entries kept
+            ttl (float): Seconds an entry stays valid, or None for no expiry
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return entry count and hit/miss counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+class SQLiteCache:
+    """
+    On-disk cache tier backed by SQLite.
+
+    Values are stored as JSON. Entries older than the TTL are ignored and
+    removed, and the least recently used entries are evicted once the stored
+    values exceed max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl=None):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key, default=None):
+        now = time.time()
+        try:
+            with self._lock, self._connect() as conn:
+                row = conn.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return default
+                value, created = row
+                if self.ttl and created + self.ttl < now:
+                    conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                    return default
+                conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                return json.loads(value)
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Error reading disk cache: {str(e)}")
+            return default
+
+    def set(self, key, value):
+        now = time.time()
+        try:
+            payload = json.dumps(value)
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, len(payload), now, now)
+                )
+                self._evict(conn, now)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.error(f"Error writing disk cache: {str(e)}")
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then the least recently used until under max_bytes"""
+        if self.ttl:
+            conn.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY accessed ASC"):
+            stale_keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM results WHERE key = ?", stale_keys)
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM results")
+
+
+class ResultCache:
+    """Two-tier result cache: in-memory LRU in front of an optional disk tier"""
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                # Promote so the next lookup stays in memory
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+# In-memory caches exported on /metrics, by name
+_metered_caches = {}
+
+def register_cache_metrics(name, cache):
+    """Export a MemoryLRUCache's hit, miss and entry counts on /metrics"""
+    _metered_caches[name] = cache
+
+def _cache_stat(field):
+    return lambda: {(name,): cache.stats()[field] for name, cache in list(_metered_caches.items())}
+
+metrics_registry.register_collector('cache_hits', 'counter', 'In-memory cache hits', ('cache',), _cache_stat('hits'))
+metrics_registry.register_collector('cache_misses', 'counter', 'In-memory cache misses', ('cache',),
+                                    _cache_stat('misses'))
+metrics_registry.register_collector('cache_entries', 'gauge', 'Entries held in memory', ('cache',),
+                                    _cache_stat('entries'))
+
+
+def make_cache_key(image_digest, pipeline, extra=None):
+    """
+    Build a content-addressed key for a pipeline result
+    Args:
+        image_digest (str): sha256 hex digest of the uploaded image bytes
+        pipeline (str): Pipeline or mode name, e.g. 'seo'
+        extra (dict, optional): Additional request parameters that affect the output
+    Returns:
+        str: Hex digest identifying this image, pipeline and model set
+    """
+    digest = hashlib.sha256()
+    digest.update(image_digest.encode('utf-8'))
+    digest.update(json.dumps({
+        'pipeline': pipeline,
+        'models': MODEL_VERSIONS,
+        'schema': CACHE_SCHEMA_VERSION,
+        'extra': extra or {}
+    }, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _build_result_cache():
+    memory = MemoryLRUCache(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL)
+    disk = None
+    if RESULT_CACHE_DIR:
+        try:
+            disk = SQLiteCache(
+                os.path.join(RESULT_CACHE_DIR, 'results.sqlite3'),
+                max_bytes=RESULT_CACHE_MAX_BYTES,
+                ttl=RESULT_CACHE_TTL
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Disk result cache disabled: {str(e)}")
+    return ResultCache(memory, disk)
+
+result_cache = _build_result_cache()
+register_cache_metrics('result', result_cache.memory)
+
+
+def lookup_result(pipeline, image_digest, extra=None):
+    """
+    Look up a cached pipeline result
+    Args:
+        pipeline (str): Pipeline or mode name
+        image_digest (str): sha256 hex digest of the uploaded image bytes
+        extra (dict, optional): Additional parameters included in the key
+    Returns:
+        tuple: (key, cached result or None); key is None when caching is disabled
+    """
+    if not RESULT_CACHE_ENABLED:
+        return None, None
+    key = make_cache_key(image_digest, pipeline, extra)
+    cached = result_cache.get(key)
+    RESULT_CACHE_LOOKUPS.inc(pipeline, 'miss' if cached is None else 'hit')
+    if cached is not None:
+        logger.info(f"Result cache hit for {pipeline} ({key[:12]})")
+    return key, cached
+
+def mark_degraded(reason):
+    """
+    Flag the result being computed as a fallback so it is not cached
+    Services call this where they swallow a failure and return a default
+    answer; outside track_degraded() it does nothing.
+    Args:
+        reason (str): Short description, logged when the result is skipped
+    """
+    reasons = _degraded.get()
+    if reasons is not None:
+        reasons.append(reason)
+
+@contextmanager
+def track_degraded():
+    """
+    Collect mark_degraded() calls made while computing a result, including
+    from pipeline steps (executors copy the context into their workers)
+    Yields:
+        list: Reasons recorded so far
+    """
+    reasons = []
+    token = _degraded.set(reasons)
+    try:
+        yield reasons
+    finally:
+        _degraded.reset(token)
+
+def store_result(key, result, cacheable=None, degraded=None):
+    """Store a freshly computed result unless caching is disabled, it is degraded or not cacheable"""
+    if key is None:
+        return
+    if degraded:
+        logger.info(f"Not caching degraded result {key[:12]}: {'; '.join(degraded)}")
+        return
+    if cacheable is None or cacheable(result):
+        result_cache.set(key, result)
+
+def cache_meta(key, hit):
+    """Describe the cache outcome for response metadata"""
+    if key is None:
+        return {'cache': 'disabled'}
+    return {'cache': 'hit' if hit else 'miss', 'cache_key': key}
+
+def cached_pipeline(pipeline, image_digest, compute, extra=None, cacheable=None):
+    """
+    Return a cached pipeline result or compute and store it
+    Args:
+        pipeline (str): Pipeline or mode name
+        image_digest (str): sha256 hex digest of the uploaded image bytes
+        compute (callable): Zero-argument function producing a JSON-serialisable result
+        extra (dict, optional): Additional parameters included in the key
+        cacheable (callable, optional): Predicate deciding whether a result is stored;
+            results flagged with mark_degraded() are never stored
+    Returns:
+        tuple: (result, meta) where meta describes whether the cache was hit
+    """
+    key, cached = lookup_result(pipeline, image_digest, extra)
+    if cached is not None:
+        return cached, cache_meta(key, True)
+
+    with track_degraded() as degraded:
+        result = compute()
+    store_result(key, result, cacheable, degraded)
+    return result, cache_meta(key, False)
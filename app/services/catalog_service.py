@@ -0,0 +1,546 @@
+"""
+Bulk analysis of whole image catalogues.
+
+A catalogue is a directory, a ZIP archive or a manifest (.txt, .csv or
+.jsonl listing image paths). Images are captioned in BLIP-sized batches and
+the Gemini stages run on a small bounded pool, so a catalogue of tens of
+thousands of images neither starves the GPU nor floods the API.
+
+Results are appended to a JSONL or CSV file. After every batch the output
+is flushed and a line is appended to a checkpoint log recording the
+completed ids and the output offset, so an interrupted run resumes where it
+stopped: partially written rows past the last checkpoint are truncated and
+completed images are never processed twice.
+"""
+import csv
+import io
+import json
+import os
+import re
+import threading
+import time
+import uuid
+import zipfile
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.file_utils import allowed_file, open_image
+from app.services.image_service import image_processor
+from app.services.image_context import ImageContext
+from app.services.quality_service import QualityGateError, check_quality_gate
+from app.services.text_service import generate_context
+from app.services.seo_service import generate_seo_content, generate_social_variations
+from config.config import (
+    CATALOG_BATCH_SIZE,
+    CATALOG_LLM_CONCURRENCY,
+    CATALOG_FOLDER,
+    CATALOG_ROOT,
+    CATALOG_MAX_ENTRY_BYTES,
+    STAGE_MAX_RESOLUTION,
+)
+
+logger = logging.getLogger(__name__)
+
+TASKS = ('alt_text', 'seo', 'social')
+OUTPUT_FORMATS = ('jsonl', 'csv')
+
+TASK_FIELDS = {
+    'alt_text': ['alt_text'],
+    'seo': ['context', 'meta_title', 'meta_description', 'alternative_titles', 'keywords', 'product_description'],
+    'social': ['context', 'instagram_captions', 'twitter_posts', 'facebook_post', 'hashtags'],
+}
+
+MANIFEST_EXTENSIONS = ('.txt', '.csv', '.jsonl')
+
+
+class CatalogItem:
+    """One image in a catalogue, read on demand"""
+
+    def __init__(self, item_id, reader):
+        self.id = item_id
+        self._reader = reader
+
+    def read(self):
+        return self._reader()
+
+
+class Catalog(list):
+    """
+    CatalogItems of one catalogue; closing it releases the ZIP archive the
+    items read from. Use it as a context manager around process_catalog.
+    """
+
+    def __init__(self, items=(), archive=None):
+        super().__init__(items)
+        self.archive = archive
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _file_reader(path):
+    def read():
+        with open(path, 'rb') as f:
+            return f.read()
+    return read
+
+def _zip_reader(archive, info):
+    def read():
+        # Checked before inflating, so a small archive cannot expand into a huge entry
+        if info.file_size > CATALOG_MAX_ENTRY_BYTES:
+            raise ValueError(f"Entry is {info.file_size} bytes uncompressed, "
+                             f"above the {CATALOG_MAX_ENTRY_BYTES} byte limit")
+        return archive.read(info)
+    return read
+
+def _resolve(path, base_dir, root=None):
+    """Resolve a manifest path, refusing paths outside root when one is given"""
+    resolved = os.path.realpath(os.path.join(base_dir, path))
+    if root is not None:
+        root = os.path.realpath(root)
+        if os.path.commonpath([resolved, root]) != root:
+            raise ValueError(f"Path '{path}' is outside the catalogue root")
+    return resolved
+
+def _read_manifest(path):
+    """Return (id, image path) pairs listed in a manifest"""
+    extension = os.path.splitext(path)[1].lower()
+    entries = []
+    with open(path, newline='', encoding='utf-8') as f:
+        if extension == '.csv':
+            reader = csv.DictReader(f)
+            column = 'path' if 'path' in (reader.fieldnames or []) else reader.fieldnames[0]
+            for row in reader:
+                if row.get(column):
+                    entries.append((row.get('id') or row[column], row[column]))
+        elif extension == '.jsonl':
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries.append((entry.get('id') or entry['path'], entry['path']))
+        else:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    entries.append((line, line))
+    return entries
+
+def load_catalog(source, root=None):
+    """
+    List the images in a catalogue
+    Args:
+        source (str): Directory, ZIP archive or manifest file
+        root (str, optional): Directory manifest paths must stay inside
+    Returns:
+        Catalog: CatalogItem instances in a stable order; close it (or use it
+            as a context manager) once processing is done
+    """
+    if os.path.isdir(source):
+        items = []
+        for dirpath, _, filenames in os.walk(source):
+            for filename in filenames:
+                if allowed_file(filename):
+                    path = os.path.join(dirpath, filename)
+                    items.append(CatalogItem(os.path.relpath(path, source), _file_reader(path)))
+        return Catalog(sorted(items, key=lambda item: item.id))
+
+    if zipfile.is_zipfile(source):
+        archive = zipfile.ZipFile(source)
+        try:
+            entries = sorted(
+                (info for info in archive.infolist()
+                 if not info.is_dir() and allowed_file(os.path.basename(info.filename))
+                 and not os.path.basename(info.filename).startswith('.')),
+                key=lambda info: info.filename
+            )
+        except Exception:
+            archive.close()
+            raise
+        return Catalog([CatalogItem(info.filename, _zip_reader(archive, info)) for info in entries], archive)
+
+    if source.lower().endswith(MANIFEST_EXTENSIONS):
+        # Paths are relative to the root when one is enforced, else to the manifest
+        base_dir = root or os.path.dirname(os.path.abspath(source))
+        items = []
+        seen = set()
+        for item_id, path in _read_manifest(source):
+            if item_id in seen:
+                continue
+            seen.add(item_id)
+            items.append(CatalogItem(item_id, _file_reader(_resolve(path, base_dir, root))))
+        return Catalog(items)
+
+    raise ValueError(f"Unsupported catalogue source '{source}': expected a directory, ZIP or manifest")
+
+
+class Checkpoint:
+    """
+    Append-only progress log stored next to the output file.
+    Each line records the ids completed by one batch and the output size
+    after their rows were flushed; a torn last line is ignored on load.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """
+        Returns:
+            tuple: (completed ids, failed ids mapped to errors, committed output offset)
+        """
+        completed, failed, offset = set(), {}, 0
+        if not os.path.exists(self.path):
+            return completed, failed, offset
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # Interrupted write
+                completed.update(entry['completed'])
+                failed.update(entry['failed'])
+                offset = entry['offset']
+        for item_id in completed:
+            failed.pop(item_id, None)
+        return completed, failed, offset
+
+    def record(self, completed, failed, offset):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'completed': completed, 'failed': failed, 'offset': offset}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ResultWriter:
+    """Appends result rows as JSONL or CSV"""
+
+    def __init__(self, path, output_format, fields, offset=0):
+        self.output_format = output_format
+        self.fields = fields
+        exists = os.path.exists(path)
+        self.file = open(path, 'r+' if exists else 'w', newline='', encoding='utf-8')
+        # Drop rows written after the last checkpoint
+        self.file.seek(offset)
+        self.file.truncate()
+        if output_format == 'csv':
+            self.csv = csv.DictWriter(self.file, fieldnames=fields, extrasaction='ignore')
+            if offset == 0:
+                self.csv.writeheader()
+
+    def write(self, row):
+        if self.output_format == 'csv':
+            self.csv.writerow({
+                key: ' | '.join(map(str, value)) if isinstance(value, list) else value
+                for key, value in row.items()
+            })
+        else:
+            self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def commit(self):
+        """Flush rows to disk and return the committed offset"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def _output_fields(tasks):
+    fields = ['id']
+    for task in TASKS:
+        if task in tasks:
+            fields.extend(field for field in TASK_FIELDS[task] if field not in fields)
+    return fields
+
+def _decode(item):
+    image, original_size = open_image(io.BytesIO(item.read()), STAGE_MAX_RESOLUTION.get('decode'))
+    return ImageContext(image, original_size=original_size)
+
+def _gemini_stages(alt_text, tasks):
+    """Run the Gemini stages for one captioned image"""
+    row = {}
+    context_result = generate_context(alt_text)
+    if not context_result['success']:
+        raise ValueError(context_result['error'])
+    row['context'] = context_result['data']['context']
+    if 'seo' in tasks:
+        row.update(generate_seo_content(row['context'], alt_text))
+    if 'social' in tasks:
+        row.update(generate_social_variations(row['context'], alt_text))
+    return row
+
+def process_catalog(items, output_path, output_format='jsonl', tasks=TASKS, batch_size=None,
+                    llm_concurrency=None, restart=False, progress=None):
+    """
+    Analyze a catalogue, resuming from the checkpoint next to output_path
+    Args:
+        items (list): CatalogItem instances, normally a Catalog from load_catalog (the caller closes it)
+        output_path (str): JSONL or CSV results file
+        output_format (str): 'jsonl' or 'csv'
+        tasks (iterable): Subset of TASKS; alt text is always generated
+        batch_size (int, optional): Images per BLIP batch
+        llm_concurrency (int, optional): Gemini calls in flight at once
+        restart (bool): Discard earlier progress and start over
+        progress (callable, optional): Called with the summary dict after every batch
+    Returns:
+        dict: total, completed, skipped, failed counts and per-image errors
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format '{output_format}'")
+    tasks = set(tasks) | {'alt_text'}
+    unknown = tasks - set(TASKS)
+    if unknown:
+        raise ValueError(f"Unknown tasks: {sorted(unknown)}")
+    batch_size = batch_size or CATALOG_BATCH_SIZE
+    llm_concurrency = llm_concurrency or CATALOG_LLM_CONCURRENCY
+    needs_gemini = bool(tasks & {'seo', 'social'})
+
+    checkpoint = Checkpoint(output_path + '.checkpoint')
+    if restart:
+        checkpoint.clear()
+    completed, failed, offset = checkpoint.load()
+    if not os.path.exists(output_path):
+        offset = 0
+
+    todo = [item for item in items if item.id not in completed]
+    summary = {
+        'total': len(items),
+        'completed': len(completed),
+        'skipped': len(items) - len(todo),
+        'failed': 0,
+        'errors': {}
+    }
+    logger.info(f"Catalogue: {len(items)} images, {summary['skipped']} already done, {len(todo)} to process")
+
+    writer = ResultWriter(output_path, output_format, _output_fields(tasks), offset)
+    pool = ThreadPoolExecutor(max_workers=llm_concurrency, thread_name_prefix='catalog-llm')
+    # Keep enough batches in flight to saturate the Gemini pool while BLIP works ahead
+    max_in_flight = max(2, -(-2 * llm_concurrency // batch_size))
+    in_flight = deque()
+
+    def flush(entry):
+        rows, futures = entry
+        batch_completed, batch_failed = [], {}
+        for item_id, row in rows:
+            if item_id in futures:
+                try:
+                    row.update(futures[item_id].result())
+                except Exception as e:
+                    batch_failed[item_id] = str(e)
+                    continue
+            if 'error' in row:
+                batch_failed[item_id] = row['error']
+                continue
+            writer.write(row)
+            batch_completed.append(item_id)
+        checkpoint.record(batch_completed, batch_failed, writer.commit())
+        summary['completed'] += len(batch_completed)
+        summary['failed'] += len(batch_failed)
+        summary['errors'].update(batch_failed)
+        if progress is not None:
+            progress(summary)
+
+    try:
+        for start in range(0, len(todo), batch_size):
+            batch = todo[start:start + batch_size]
+            rows, images = [], []
+            for item in batch:
+                try:
+                    context = _decode(item)
+                    check_quality_gate(context)
+                    images.append((item.id, context))
+                    rows.append((item.id, {'id': item.id}))
+                except QualityGateError as e:
+                    rows.append((item.id, {'id': item.id, 'error': str(e)}))
+                except Exception as e:
+                    logger.warning(f"Could not decode '{item.id}': {str(e)}")
+                    rows.append((item.id, {'id': item.id, 'error': f"Invalid image: {str(e)}"}))
+
+            captions = {}
+            if images:
+                try:
+                    captions = dict(zip(
+                        [item_id for item_id, _ in images],
+                        image_processor.generate_alt_text_batch([image for _, image in images])
+                    ))
+                except Exception as e:
+                    logger.error(f"Caption batch failed: {str(e)}")
+                    for item_id, row in rows:
+                        row.setdefault('error', f"Captioning failed: {str(e)}")
+
+            futures = {}
+            for item_id, row in rows:
+                if item_id in captions:
+                    row['alt_text'] = captions[item_id]
+                    if needs_gemini:
+                        futures[item_id] = pool.submit(_gemini_stages, captions[item_id], tasks)
+            in_flight.append((rows, futures))
+
+            while in_flight and (len(in_flight) > max_in_flight
+                                 or all(f.done() for f in in_flight[0][1].values())):
+                flush(in_flight.popleft())
+
+        while in_flight:
+            flush(in_flight.popleft())
+    finally:
+        pool.shutdown(wait=True)
+        writer.close()
+
+    logger.info(f"Catalogue finished: {summary['completed']} completed, {summary['failed']} failed")
+    return summary
+
+
+# Batches submitted through the API, one directory each under CATALOG_FOLDER
+BATCH_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_active_batches = {}
+_batches_lock = threading.Lock()
+
+def _batch_dir(batch_id):
+    if not BATCH_ID_PATTERN.match(batch_id or ''):
+        raise ValueError('Invalid batch id')
+    return os.path.join(CATALOG_FOLDER, batch_id)
+
+def _write_state(batch_id, state):
+    path = os.path.join(_batch_dir(batch_id), 'batch.json')
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def _read_state(batch_id):
+    path = os.path.join(_batch_dir(batch_id), 'batch.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def results_path(batch_id):
+    """Path of a batch's results file"""
+    state = _read_state(batch_id)
+    if state is None:
+        return None
+    return os.path.join(_batch_dir(batch_id), f"results.{state['output_format']}")
+
+def create_batch(stream, filename, output_format='jsonl', tasks=TASKS):
+    """
+    Store an uploaded ZIP archive or manifest as a new batch
+    Args:
+        stream: Uploaded file stream
+        filename (str): Original filename, used to tell archives from manifests
+        output_format (str): 'jsonl' or 'csv'
+        tasks (iterable): Subset of TASKS
+    Returns:
+        str: Batch id
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format '{output_format}'")
+    unknown = set(tasks) - set(TASKS)
+    if unknown:
+        raise ValueError(f"Unknown tasks: {sorted(unknown)}")
+
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.zip':
+        source_name = 'source.zip'
+    elif extension in MANIFEST_EXTENSIONS:
+        if CATALOG_ROOT is None:
+            raise ValueError('Manifests are disabled; set CATALOG_ROOT to allow them')
+        source_name = f'manifest{extension}'
+    else:
+        raise ValueError('Upload a ZIP archive or a .txt, .csv or .jsonl manifest')
+
+    batch_id = uuid.uuid4().hex
+    batch_dir = _batch_dir(batch_id)
+    os.makedirs(batch_dir)
+    source = os.path.join(batch_dir, source_name)
+    with open(source, 'wb') as f:
+        for chunk in iter(lambda: stream.read(64 * 1024), b''):
+            f.write(chunk)
+
+    _write_state(batch_id, {
+        'id': batch_id,
+        'source': source_name,
+        'output_format': output_format,
+        'tasks': sorted(tasks),
+        'status': 'queued',
+        'created': time.time(),
+        'updated': time.time(),
+        'total': None,
+        'completed': 0,
+        'failed': 0
+    })
+    return batch_id
+
+def _run_batch(batch_id):
+    state = _read_state(batch_id)
+    batch_dir = _batch_dir(batch_id)
+
+    def save(**changes):
+        state.update(changes, updated=time.time())
+        _write_state(batch_id, state)
+
+    try:
+        with load_catalog(os.path.join(batch_dir, state['source']), root=CATALOG_ROOT) as items:
+            save(status='running', total=len(items))
+            summary = process_catalog(
+                items,
+                os.path.join(batch_dir, f"results.{state['output_format']}"),
+                output_format=state['output_format'],
+                tasks=state['tasks'],
+                progress=lambda summary: save(completed=summary['completed'], failed=summary['failed'])
+            )
+        save(status='done', completed=summary['completed'], failed=summary['failed'], errors=summary['errors'])
+    except Exception as e:
+        logger.error(f"Batch {batch_id} failed: {str(e)}", exc_info=True)
+        save(status='failed', error=str(e))
+    finally:
+        with _batches_lock:
+            _active_batches.pop(batch_id, None)
+
+def start_batch(batch_id):
+    """
+    Process a batch in a background thread, resuming earlier progress
+    Args:
+        batch_id (str): Id returned by create_batch
+    Returns:
+        bool: False if the batch is already running in this process
+    """
+    if _read_state(batch_id) is None:
+        raise ValueError('Unknown batch id')
+    with _batches_lock:
+        if batch_id in _active_batches:
+            return False
+        thread = threading.Thread(target=_run_batch, args=(batch_id,), name=f'catalog-{batch_id[:8]}', daemon=True)
+        _active_batches[batch_id] = thread
+    thread.start()
+    return True
+
+def batch_status(batch_id):
+    """
+    Describe a batch's progress
+    Returns:
+        dict or None: Stored batch state, with status 'interrupted' for runs that
+            stopped without finishing (resume them with start_batch)
+    """
+    state = _read_state(batch_id)
+    if state is None:
+        return None
+    with _batches_lock:
+        active = batch_id in _active_batches
+    if state['status'] in ('queued', 'running') and not active:
+        state['status'] = 'interrupted'
+    return state
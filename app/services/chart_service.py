@@ -0,0 +1,144 @@
+"""
+Colour chart rendering for the advanced analysis.
+
+Charts are drawn with matplotlib's object-oriented Figure API (no global
+pyplot state, so renders are safe to run from several threads) and the
+encoded output is cached on a hash of the colour data it was drawn from.
+Callers can also ask for the chart data alone and render it client-side.
+"""
+import base64
+import hashlib
+import io
+import json
+import logging
+
+from app.services.cache_service import MemoryLRUCache, register_cache_metrics
+from app.utils.metrics import CHART_LATENCY
+from config.config import CHART_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+CHART_FORMATS = ('png', 'svg', 'json')
+
+PRIMARY_COLOR = '#23cca2'
+TEXT_COLOR = '#2c3e50'
+
+chart_cache = MemoryLRUCache(CHART_CACHE_MAX_ENTRIES)
+register_cache_metrics('chart', chart_cache)
+
+def _new_figure(figsize):
+    from matplotlib.figure import Figure  # Deferred: matplotlib is slow to import
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+def histogram_spec(color_data):
+    """Chart data for the per-channel colour distribution"""
+    return {
+        'type': 'line',
+        'title': 'Color Distribution',
+        'labels': ['R', 'G', 'B'],
+        'values': [float(value) for value in color_data['distribution']],
+        'color': PRIMARY_COLOR
+    }
+
+def pie_spec(color_data):
+    """Chart data for the dominant colour shares"""
+    colors = color_data['dominant_colors']
+    return {
+        'type': 'pie',
+        'title': 'Dominant Colors',
+        'labels': [f'Color {i+1}' for i in range(len(colors))],
+        'values': [float(value) for value in color_data['percentages']],
+        'colors': ['#{:02x}{:02x}{:02x}'.format(*color) for color in colors]
+    }
+
+def _draw_histogram(spec):
+    fig = _new_figure((8, 4))
+    ax = fig.add_subplot()
+    ax.plot(range(len(spec['values'])), spec['values'], marker='o', color=spec['color'])
+    ax.set_xticks(range(len(spec['labels'])))
+    ax.set_xticklabels(spec['labels'])
+    ax.set_title(spec['title'], color=TEXT_COLOR)
+    ax.grid(True, alpha=0.3)
+    return fig
+
+def _draw_pie(spec):
+    fig = _new_figure((6, 6))
+    ax = fig.add_subplot()
+    _, _, autotexts = ax.pie(spec['values'],
+                             colors=spec['colors'],
+                             autopct='%1.1f%%',
+                             labels=spec['labels'])
+    ax.set_title(spec['title'])
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontsize(8)
+    return fig
+
+_CHARTS = {
+    'histogram': (histogram_spec, _draw_histogram),
+    'pie_chart': (pie_spec, _draw_pie),
+}
+
+def _encode(fig, chart_format):
+    buf = io.BytesIO()
+    fig.savefig(buf, format=chart_format, bbox_inches='tight')
+    return base64.b64encode(buf.getvalue()).decode('utf-8')
+
+def render_chart(name, color_data, chart_format='png'):
+    """
+    Render one colour chart
+    Args:
+        name (str): 'histogram' or 'pie_chart'
+        color_data (dict): Output of AdvancedImageProcessor.analyze_colors
+        chart_format (str): 'png' or 'svg' (base64-encoded), or 'json' for the chart data
+    Returns:
+        str or dict: Encoded image, or the chart spec for 'json'
+    """
+    if chart_format not in CHART_FORMATS:
+        raise ValueError(f"Unsupported chart format '{chart_format}'")
+    build_spec, draw = _CHARTS[name]
+    spec = build_spec(color_data)
+    if chart_format == 'json':
+        return spec
+
+    key = hashlib.sha256(json.dumps([name, chart_format, spec], sort_keys=True).encode('utf-8')).hexdigest()
+    encoded = chart_cache.get(key)
+    if encoded is None:
+        with CHART_LATENCY.time(name, chart_format):
+            encoded = _encode(draw(spec), chart_format)
+        chart_cache.set(key, encoded)
+    return encoded
+
+def render_color_charts(color_data, chart_format='png'):
+    """
+    Render the histogram and pie chart for a colour analysis
+    Args:
+        color_data (dict): Output of AdvancedImageProcessor.analyze_colors
+        chart_format (str): One of CHART_FORMATS
+    Returns:
+        dict: 'histogram' and 'pie_chart' in the requested format
+    """
+    return {name: render_chart(name, color_data, chart_format) for name in _CHARTS}
+
+def with_color_charts(data, chart_format='png'):
+    """
+    Add rendered charts to an advanced analysis payload
+    Args:
+        data (dict): Advanced pipeline output
+        chart_format (str): One of CHART_FORMATS
+    Returns:
+        dict: Copy of data whose color_analysis includes histogram and pie_chart
+    """
+    color_analysis = dict(data['color_analysis'])
+    color_data = {
+        'distribution': color_analysis['distribution'],
+        'dominant_colors': color_analysis['dominant_colors'],
+        'percentages': color_analysis['color_percentages']
+    }
+    color_analysis.update(render_color_charts(color_data, chart_format))
+    color_analysis['chart_format'] = chart_format
+    return dict(data, color_analysis=color_analysis)
@@ -0,0 +1,197 @@
+"""
+Process-wide Gemini client.
+
+The SDK is configured once per process and GenerativeModel handles are
+cached per (model, generation config), so services no longer pay for
+genai.configure and model construction on every request. GEMINI_TRANSPORT
+can put a record or replay transport (app/services/gemini_transport.py)
+under the handles.
+"""
+import json
+import sys
+import threading
+import time
+import logging
+
+from config.config import GEMINI_API_KEY, GEMINI_TRANSPORT, GEMINI_RECORDING_PATH, GEMINI_REPLAY_LATENCY
+from config.ai_config import GEMINI_CONFIG
+from app.utils.metrics import GEMINI_LATENCY, GEMINI_ERRORS
+from app.utils.tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+# Generic helpers skipped when naming the service function behind a call
+_PASSTHROUGH_MODULES = {__name__, 'app.services.llm_service'}
+
+def _calling_service():
+    """Name the first caller outside this module and llm_service, e.g. 'seo_service.generate_seo_description'"""
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get('__name__') in _PASSTHROUGH_MODULES:
+        frame = frame.f_back
+    if frame is None:
+        return 'unknown'
+    return f"{frame.f_globals.get('__name__', '').rsplit('.', 1)[-1]}.{frame.f_code.co_name}"
+
+
+class ModelHandle:
+    """Cached GenerativeModel wrapper that records request metrics"""
+
+    def __init__(self, client, model_name, model):
+        self.client = client
+        self.model_name = model_name
+        self.model = model
+
+    def generate_content(self, contents, **kwargs):
+        service = _calling_service()
+        start = time.perf_counter()
+        try:
+            response = self.model.generate_content(contents, **kwargs)
+        except Exception as e:
+            self._record(service, start, error=type(e).__name__)
+            raise
+        self._record(service, start)
+        return response
+
+    def stream_content(self, contents, **kwargs):
+        """
+        Generate content with streaming, yielding text chunks as they arrive
+        The request is recorded once the stream is exhausted.
+        """
+        service = _calling_service()
+        start = time.perf_counter()
+        try:
+            for chunk in self.model.generate_content(contents, stream=True, **kwargs):
+                text = getattr(chunk, 'text', '')
+                if text:
+                    yield text
+        except Exception as e:
+            self._record(service, start, error=type(e).__name__)
+            raise
+        self._record(service, start)
+
+    def _record(self, service, start, error=None):
+        """Record a finished call in the client stats, metrics and current trace; error is the exception type name"""
+        end = time.perf_counter()
+        seconds = end - start
+        self.client._record(self.model_name, seconds, error=error is not None)
+        record_span('gemini', start, end, error=error, desc=service, model=self.model_name)
+        GEMINI_LATENCY.observe(seconds, service, self.model_name)
+        if error:
+            GEMINI_ERRORS.inc(service, self.model_name)
+
+
+class GeminiClient:
+    """Configures the Gemini SDK once and hands out cached model handles"""
+
+    def __init__(self, api_key=None, transport='live'):
+        self.api_key = api_key
+        self.transport = transport
+        self._genai = None
+        self._handles = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.configure_calls = 0
+
+    def _configure(self):
+        """Build the transport (the SDK, or a record/replay wrapper) on first use"""
+        if self._genai is not None:
+            return self._genai
+        with self._lock:
+            if self._genai is None:
+                from app.services.gemini_transport import create_transport
+
+                self._genai = create_transport(self.transport, self._load_sdk,
+                                               GEMINI_RECORDING_PATH, GEMINI_REPLAY_LATENCY)
+                logger.info(f"Gemini client configured ({self.transport} transport)")
+        return self._genai
+
+    def _load_sdk(self):
+        """Import and configure the SDK"""
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY environment variable is not set")
+        import google.generativeai as genai  # Deferred: the SDK is slow to import
+
+        genai.configure(api_key=self.api_key)
+        self.configure_calls += 1
+        return genai
+
+    def use_backend(self, genai):
+        """
+        Serve requests from a genai-compatible module instead of the SDK
+        (for example a local stand-in for benchmarks); cached handles are dropped
+        Args:
+            genai: Object exposing GenerativeModel(model_name, generation_config=None)
+        """
+        with self._lock:
+            self._genai = genai
+            self._handles = {}
+
+    def get_model(self, model_name=None, generation_config=None):
+        """
+        Return a cached handle for a model
+        Args:
+            model_name (str, optional): Gemini model name, defaults to the text model
+            generation_config (dict, optional): Generation parameters bound to the handle
+        Returns:
+            ModelHandle: Handle exposing generate_content
+        """
+        model_name = model_name or GEMINI_CONFIG['text_model']
+        key = (model_name, json.dumps(generation_config or {}, sort_keys=True))
+        handle = self._handles.get(key)
+        if handle is not None:
+            return handle
+
+        genai = self._configure()
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is None:
+                if generation_config:
+                    model = genai.GenerativeModel(model_name, generation_config=generation_config)
+                else:
+                    model = genai.GenerativeModel(model_name)
+                handle = ModelHandle(self, model_name, model)
+                self._handles[key] = handle
+        return handle
+
+    def _record(self, model_name, seconds, error=False):
+        with self._lock:
+            stats = self._stats.setdefault(model_name, {
+                'requests': 0,
+                'errors': 0,
+                'total_seconds': 0.0,
+                'max_seconds': 0.0
+            })
+            stats['requests'] += 1
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            if error:
+                stats['errors'] += 1
+
+    def metrics(self):
+        """
+        Return client and per-model request metrics
+        Returns:
+            dict: Configure count, cached handle count and per-model request stats
+        """
+        with self._lock:
+            models = {}
+            for model_name, stats in self._stats.items():
+                models[model_name] = dict(stats)
+                models[model_name]['avg_seconds'] = (
+                    stats['total_seconds'] / stats['requests'] if stats['requests'] else 0.0
+                )
+            return {
+                'transport': self.transport,
+                'configured': self._genai is not None,
+                'configure_calls': self.configure_calls,
+                'model_handles': len(self._handles),
+                'models': models
+            }
+
+
+# Shared client for the whole process
+gemini_client = GeminiClient(GEMINI_API_KEY, GEMINI_TRANSPORT)
+
+def get_model(model_name=None, generation_config=None):
+    """Shortcut for gemini_client.get_model"""
+    return gemini_client.get_model(model_name, generation_config)
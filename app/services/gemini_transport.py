@@ -0,0 +1,253 @@
+"""
+Record/replay transports for Gemini calls.
+
+A transport is a genai-compatible object (anything exposing
+GenerativeModel(model_name, generation_config=None)) that GeminiClient
+builds its model handles from. GEMINI_TRANSPORT selects one:
+
+    live:   the google.generativeai SDK itself
+    record: the SDK, with every request/response pair appended to
+            GEMINI_RECORDING_PATH as one JSON line
+    replay: serves responses from GEMINI_RECORDING_PATH without network
+            access or an API key, sleeping for the recorded latency or a
+            fixed GEMINI_REPLAY_LATENCY
+
+Requests are matched on model, generation config and content parts. Text
+parts are stored verbatim; images are stored as a SHA-256 of their pixels,
+so a replayed pipeline must feed Gemini the same image (same upload, same
+preprocessing) to hit its recording. Streamed responses keep their chunk
+boundaries and arrival times, so replay reproduces time-to-first-chunk.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ('live', 'record', 'replay')
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when no recording matches a request"""
+
+
+class _Text:
+    """Response or stream chunk with the .text attribute the services read"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def describe_part(part):
+    """
+    Turn one content part into its JSON-serializable recorded form
+    Args:
+        part: Prompt string, PIL image or {'mime_type', 'data'} blob
+    Returns:
+        str or dict: Text unchanged; images and blobs as a digest of their bytes
+    """
+    if isinstance(part, str):
+        return part
+    if hasattr(part, 'tobytes') and hasattr(part, 'mode'):
+        digest = hashlib.sha256(part.tobytes()).hexdigest()
+        return {'image': digest, 'mode': part.mode, 'size': list(part.size)}
+    if isinstance(part, dict) and 'data' in part:
+        return {'blob': hashlib.sha256(part['data']).hexdigest(), 'mime_type': part.get('mime_type')}
+    return {'object': type(part).__name__}
+
+def describe_request(model_name, generation_config, contents):
+    """
+    Describe a request and derive its replay key
+    Returns:
+        tuple: (key, parts) where key is a hex digest of model, config and parts
+    """
+    if not isinstance(contents, (list, tuple)):
+        contents = [contents]
+    parts = [describe_part(part) for part in contents]
+    payload = json.dumps({
+        'model': model_name,
+        'config': generation_config or {},
+        'parts': parts
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest(), parts
+
+
+class RecordingWriter:
+    """Appends recordings to a JSON Lines file, one line per request"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def write(self, record):
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+class RecordingModel:
+    """Passes requests to a live model and records each completed response"""
+
+    def __init__(self, model, model_name, generation_config, writer):
+        self.model = model
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.writer = writer
+
+    def _record(self, key, parts, text, latency_ms, chunks=None):
+        self.writer.write({
+            'key': key,
+            'model': self.model_name,
+            'config': self.generation_config or {},
+            'parts': parts,
+            'text': text,
+            'chunks': chunks,
+            'latency_ms': round(latency_ms, 1),
+            'recorded_at': time.time()
+        })
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        key, parts = describe_request(self.model_name, self.generation_config, contents)
+        start = time.perf_counter()
+        if stream:
+            return self._stream(key, parts, start, self.model.generate_content(contents, stream=True, **kwargs))
+        response = self.model.generate_content(contents, **kwargs)
+        self._record(key, parts, response.text, (time.perf_counter() - start) * 1000)
+        return response
+
+    def _stream(self, key, parts, start, response):
+        chunks = []
+        for chunk in response:
+            text = getattr(chunk, 'text', '')
+            chunks.append([round((time.perf_counter() - start) * 1000, 1), text])
+            yield chunk
+        # Only streams read to the end are recorded, so replay never serves a truncated response
+        self._record(key, parts, ''.join(text for _, text in chunks),
+                     (time.perf_counter() - start) * 1000, chunks)
+
+
+class RecordingTransport:
+    """Wraps the live SDK and records every request made through it"""
+
+    def __init__(self, genai, path):
+        self.genai = genai
+        self.writer = RecordingWriter(path)
+        logger.info(f"Recording Gemini calls to {path}")
+
+    def GenerativeModel(self, model_name, generation_config=None):
+        if generation_config:
+            model = self.genai.GenerativeModel(model_name, generation_config=generation_config)
+        else:
+            model = self.genai.GenerativeModel(model_name)
+        return RecordingModel(model, model_name, generation_config, self.writer)
+
+
+class ReplayModel:
+    """Serves recorded responses for one model and generation config"""
+
+    def __init__(self, transport, model_name, generation_config):
+        self.transport = transport
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        key, _ = describe_request(self.model_name, self.generation_config, contents)
+        record = self.transport.lookup(key, self.model_name)
+        latency = self.transport.latency_seconds(record)
+        if not stream:
+            time.sleep(latency)
+            return _Text(record['text'])
+        return self._stream(record, latency)
+
+    def _stream(self, record, latency):
+        chunks = record.get('chunks') or [[record.get('latency_ms', 0), record['text']]]
+        # Keep the recorded arrival pattern, scaled to the chosen total latency
+        total_ms = chunks[-1][0] or 1
+        elapsed = 0.0
+        for offset_ms, text in chunks:
+            target = latency * offset_ms / total_ms
+            time.sleep(max(0.0, target - elapsed))
+            elapsed = target
+            yield _Text(text)
+
+
+class ReplayTransport:
+    """Serves Gemini requests from a recording file"""
+
+    def __init__(self, path, latency='recorded'):
+        """
+        Args:
+            path (str): JSON Lines file written by RecordingTransport
+            latency (str or float): 'recorded' to replay each call's recorded latency,
+                or a fixed number of milliseconds per call (0 for none)
+        """
+        self.path = path
+        self.latency = latency if latency == 'recorded' else float(latency)
+        self._records = {}
+        self._cursors = {}
+        self._lock = threading.Lock()
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Gemini recording not found: {self.path}")
+        count = 0
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                self._records.setdefault(record['key'], []).append(record)
+                count += 1
+        logger.info(f"Loaded {count} Gemini recordings ({len(self._records)} distinct requests) from {self.path}")
+
+    def lookup(self, key, model_name):
+        """
+        Return the next recording for a request; repeated requests cycle through
+        every recording made for them so replay keeps their latency spread
+        Raises:
+            ReplayMissError: If the request was never recorded
+        """
+        with self._lock:
+            records = self._records.get(key)
+            if not records:
+                self.misses += 1
+                raise ReplayMissError(f"No recorded Gemini response for {model_name} request {key[:12]}")
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            return records[cursor % len(records)]
+
+    def latency_seconds(self, record):
+        if self.latency == 'recorded':
+            return record.get('latency_ms', 0) / 1000
+        return self.latency / 1000
+
+    def GenerativeModel(self, model_name, generation_config=None):
+        return ReplayModel(self, model_name, generation_config)
+
+
+def create_transport(mode, load_sdk, path, replay_latency='recorded'):
+    """
+    Build the genai-compatible transport for a mode
+    Args:
+        mode (str): 'live', 'record' or 'replay'
+        load_sdk (callable): Returns the configured google.generativeai module
+        path (str): Recording file
+        replay_latency (str or float): Replay latency, see ReplayTransport
+    Returns:
+        object: Transport exposing GenerativeModel
+    """
+    if mode not in TRANSPORTS:
+        raise ValueError(f"Unknown Gemini transport '{mode}', expected one of: {', '.join(TRANSPORTS)}")
+    if mode == 'replay':
+        return ReplayTransport(path, replay_latency)
+    genai = load_sdk()
+    if mode == 'record':
+        return RecordingTransport(genai, path)
+    return genai
@@ -0,0 +1,186 @@
+"""
+Shared per-image analysis state.
+
+An ImageContext wraps one decoded image and computes everything the
+analysis stages need from it at most once: the RGB array, the enhanced
+(contrast/sharpness) copy the models see, downsampled thumbnails for
+colour work, quality statistics, and the model-ready input arrays produced
+by the BLIP and DETR processors. Stages that run on the same upload share a
+single context, so no stage re-converts or re-normalizes the full-resolution
+image on its own.
+
+Each stage also works at no more than its cap in STAGE_MAX_RESOLUTION:
+enhancement and the model inputs use a 'models'-sized copy and quality
+statistics use a 'quality'-sized thumbnail.
+"""
+import os
+import threading
+import logging
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from config.config import STAGE_MAX_RESOLUTION
+from app.utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+@traced('preprocess')
+def enhance(image):
+    """
+    Convert to RGB and apply the contrast/sharpness boost used before captioning
+    Args:
+        image (PIL.Image): Input image in any mode
+    Returns:
+        PIL.Image: Enhanced RGB image
+    """
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image = ImageEnhance.Contrast(image).enhance(1.2)
+    return ImageEnhance.Sharpness(image).enhance(1.1)
+
+
+class ImageContext:
+    """
+    One decoded image plus everything derived from it, computed on first use.
+
+    All derived values are cached and safe to request from several pipeline
+    steps at once; each one is computed by exactly one thread.
+    """
+
+    def __init__(self, image, rgb_array=None, enhanced=False, original_size=None, max_resolution=None):
+        """
+        Args:
+            image (PIL.Image): Decoded image
+            rgb_array (np.ndarray, optional): Pre-computed RGB pixels of `image` to reuse
+            enhanced (bool): True if `image` is already enhanced and model-ready
+            original_size (tuple, optional): Uploaded (width, height) if `image` was downscaled at decode
+            max_resolution (dict, optional): Per-stage caps, defaults to STAGE_MAX_RESOLUTION
+        """
+        self.image = image if image.mode == 'RGB' else image.convert('RGB')
+        self.original_size = tuple(original_size or self.image.size)
+        self.max_resolution = max_resolution if max_resolution is not None else STAGE_MAX_RESOLUTION
+        self._rgb_array = rgb_array
+        self._processed = self.image if enhanced else None
+        self._derived = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key, build):
+        """Return a derived value, computing it once under a per-key lock"""
+        if key in self._derived:
+            return self._derived[key]
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._derived:
+                self._derived[key] = build()
+        return self._derived[key]
+
+    @property
+    def size(self):
+        """Size of the uploaded image; quality checks and box scaling use this"""
+        return self.original_size
+
+    def working_image(self, stage):
+        """Original RGB image downscaled to a stage's cap (the image itself when it fits)"""
+        max_side = self.max_resolution.get(stage)
+        if not max_side or max(self.image.size) <= max_side:
+            return self.image
+        return self.thumbnail(max_side, processed=False)
+
+    @property
+    def rgb_array(self):
+        """Read-only HxWx3 uint8 array of the original image"""
+        if self._rgb_array is None:
+            def build():
+                array = np.asarray(self.image)
+                array.setflags(write=False)
+                return array
+            self._rgb_array = self._cached('rgb_array', build)
+        return self._rgb_array
+
+    @property
+    def processed(self):
+        """Enhanced RGB image, at most the 'models' cap, that the models see"""
+        if self._processed is None:
+            self._processed = self._cached('processed', lambda: enhance(self.working_image('models')))
+        return self._processed
+
+    @property
+    def array(self):
+        """Read-only HxWx3 uint8 array of the enhanced image"""
+        def build():
+            array = np.asarray(self.processed)
+            array.setflags(write=False)
+            return array
+        return self._cached('array', build)
+
+    def thumbnail(self, max_side, processed=True):
+        """
+        Downsampled RGB copy no larger than max_side on either edge
+        Args:
+            max_side (int): Longest edge in pixels
+            processed (bool): Downsample the enhanced image rather than the original
+        Returns:
+            PIL.Image: Cached thumbnail (do not modify it)
+        """
+        def build():
+            source = self.processed if processed else self.image
+            width, height = source.size
+            if max(width, height) <= max_side:
+                return source
+            ratio = max_side / max(width, height)
+            size = (max(1, round(width * ratio)), max(1, round(height * ratio)))
+            # resize() allocates only the output; reducing_gap shrinks by an integer factor first
+            return source.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        return self._cached(('thumbnail', max_side, processed), build)
+
+    def model_input(self, name, build):
+        """
+        Model-ready input for this image, built once per model
+        Args:
+            name (str): Cache key, normally the model name
+            build (callable): Takes the enhanced PIL.Image and returns the input
+        Returns:
+            object: Whatever build returned
+        """
+        return self._cached(('model_input', name), lambda: build(self.processed))
+
+    def stats(self, name, build):
+        """Cache an arbitrary statistic computed from this context"""
+        return self._cached(('stats', name), lambda: build(self))
+
+
+def as_context(image, enhanced=False):
+    """
+    Wrap an image in an ImageContext (contexts are returned unchanged)
+    Args:
+        image: ImageContext, PIL.Image or a file path
+        enhanced (bool): True if a PIL image is already enhanced and model-ready
+    Returns:
+        ImageContext: Context for the image
+    """
+    if isinstance(image, ImageContext):
+        return image
+    if isinstance(image, (str, os.PathLike)):
+        image = Image.open(image)
+        image.load()
+    return ImageContext(image, enhanced=enhanced)
+
+_upload_lock = threading.Lock()
+
+def upload_context(upload):
+    """
+    Shared context for an UploadedImage, created on first request
+    Args:
+        upload (UploadedImage): Decoded upload
+    Returns:
+        ImageContext: The same context for every stage of the request
+    """
+    if upload.context is None:
+        rgb = upload.rgb
+        with _upload_lock:
+            if upload.context is None:
+                upload.context = ImageContext(rgb, original_size=upload.original_size)
+    return upload.context
@@ -1,8 +1,22 @@
-from PIL import Image, ImageEnhance
+from PIL import Image
 import numpy as np
-from transformers import BlipProcessor, BlipForConditionalGeneration, DetrImageProcessor, DetrForObjectDetection
-import torch
-from config.config import BLIP_MODEL
+from config.config import (
+    CAPTION_BATCH_WINDOW_MS,
+    CAPTION_MAX_BATCH_SIZE,
+    DETECTION_BATCH_WINDOW_MS,
+    DETECTION_MAX_BATCH_SIZE,
+    MODEL_SERVER_ADDRESS,
+    PALETTE_MAX_SIDE,
+    VISION_BACKEND,
+)
+from app.utils.batch_utils import MicroBatcher
+from app.utils.metrics import registry as metrics_registry, VISION_LATENCY, VISION_BATCH_SIZE
+from app.utils.tracing import span, traced
+from app.services.backends.base import create_backend
+from app.services.cache_service import mark_degraded
+from app.services.image_context import ImageContext, as_context, enhance
+from app.services.palette_service import extract_palette
+from app.services.quality_service import assess_quality
 from collections import Counter
 import warnings
 import logging
@@ -16,107 +30,97 @@ warnings.filterwarnings(
 )
 
 class ImageProcessor:
-    def __init__(self):
-        # Initialize models with error handling
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        
-        # Initialize BLIP for general image description
-        try:
-            self.blip_processor = BlipProcessor.from_pretrained(BLIP_MODEL)
-            self.blip_model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL)
-            self.blip_model = self.blip_model.to(self.device)
-            self.blip_available = True
-            logger.info("BLIP model loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading BLIP model: {str(e)}")
-            self.blip_available = False
-            self.blip_processor = None
-            self.blip_model = None
-        
-        # Initialize DETR for object detection
-        try:
-            self.detr_processor = DetrImageProcessor.from_pretrained('facebook/detr-resnet-50')
-            self.detr_model = DetrForObjectDetection.from_pretrained('facebook/detr-resnet-50')
-            self.detr_model = self.detr_model.to(self.device)
-            self.detr_available = True
-            logger.info("DETR model loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading DETR model: {str(e)}")
-            self.detr_available = False
-            self.detr_processor = None
-            self.detr_model = None
+    """
+    Local vision models for captioning and object detection.
+
+    Model calls go through a vision backend (see app/services/backends),
+    selected with VISION_BACKEND. Backends resolve their models through the
+    model registry, so they are only loaded the first time a method needs them.
+    """
+
+    def __init__(self, backend=None):
+        """
+        Args:
+            backend (VisionBackend, optional): Backend to run models on, defaults to VISION_BACKEND
+        """
+        self._backend = backend
+
+        # Coalesce concurrent captioning requests into batched BLIP calls
+        self.caption_batcher = MicroBatcher(
+            self.generate_alt_text_batch,
+            max_batch_size=CAPTION_MAX_BATCH_SIZE,
+            window_ms=CAPTION_BATCH_WINDOW_MS,
+            name='blip-caption-batcher'
+        )
+
+        # Shared detection queue so concurrent requests run one DETR forward
+        self.detection_batcher = MicroBatcher(
+            self.detect_objects_batch,
+            max_batch_size=DETECTION_MAX_BATCH_SIZE,
+            window_ms=DETECTION_BATCH_WINDOW_MS,
+            name='detr-detection-batcher'
+        )
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = create_backend(VISION_BACKEND)
+            logger.info(f"Using the '{self._backend.name}' vision backend")
+        return self._backend
+
+    def set_backend(self, backend):
+        """Replace the vision backend (used by benchmarks to run a stand-in)"""
+        self._backend = backend
+
+    @property
+    def device(self):
+        return self.backend.device
+
+    @property
+    def blip_available(self):
+        return self.backend.caption_available
+
+    @property
+    def detr_available(self):
+        return self.backend.detection_available
+
+    def warm_up(self, models):
+        """
+        Load models ahead of the first request
+        Args:
+            models (iterable): Model names such as 'blip' and 'detr'
+        """
+        self.backend.warm_up(list(models))
 
     def preprocess_image(self, image):
         """
         Preprocess image for better analysis
         Args:
-            image (PIL.Image): Input image
+            image (PIL.Image or ImageContext): Input image
         Returns:
             PIL.Image: Preprocessed image
         """
         try:
-            # Convert to RGB if necessary
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Enhance image quality
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(1.2)
-            
-            enhancer = ImageEnhance.Sharpness(image)
-            image = enhancer.enhance(1.1)
-            
-            return image
+            if isinstance(image, ImageContext):
+                return image.processed
+            return enhance(image)
         except Exception as e:
             raise ValueError(f"Error preprocessing image: {str(e)}")
 
     def validate_image_quality(self, image):
         """
-        Validate image quality metrics
+        Validate image quality metrics (see quality_service)
         Args:
-            image (PIL.Image): Input image
+            image (PIL.Image or ImageContext): Input image; a context caches the result
         Returns:
-            dict: Quality metrics
+            dict: Quality metrics, including 'issues' and 'is_valid'
         """
         try:
-            # Convert image to numpy array
-            img_array = np.array(image)
-            
-            # Calculate basic metrics
-            brightness = np.mean(img_array)
-            contrast = np.std(img_array)
-            resolution = image.size
-            
-            # Define quality thresholds
-            quality_metrics = {
-                'brightness': brightness,
-                'contrast': contrast,
-                'resolution': resolution,
-                'is_valid': True,
-                'issues': []
-            }
-            
-            # Check brightness
-            if brightness < 30:
-                quality_metrics['issues'].append('Image too dark')
-            elif brightness > 225:
-                quality_metrics['issues'].append('Image too bright')
-                
-            # Check contrast
-            if contrast < 20:
-                quality_metrics['issues'].append('Low contrast')
-                
-            # Check resolution
-            min_resolution = 200 * 200
-            if resolution[0] * resolution[1] < min_resolution:
-                quality_metrics['issues'].append('Resolution too low')
-                
-            quality_metrics['is_valid'] = len(quality_metrics['issues']) == 0
-            return quality_metrics
-            
+            return assess_quality(image)
         except Exception as e:
             raise ValueError(f"Error validating image quality: {str(e)}")
 
+    @traced('detr')
     def detect_objects(self, image):
         """
         Detect objects in the image using DETR
@@ -130,86 +134,89 @@ class ImageProcessor:
             return []
             
         try:
-            # Prepare image for object detection
-            inputs = self.detr_processor(images=image, return_tensors="pt")
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-            # Perform object detection
-            outputs = self.detr_model(**inputs)
-
-            # Convert outputs to probabilities
-            probas = outputs.logits.softmax(-1)[0, :, :-1]
-            keep = probas.max(-1).values > 0.7  # Confidence threshold
-
-            # Convert target sizes
-            target_sizes = torch.tensor([image.size[::-1]]).to(self.device)
-            postprocessed_outputs = self.detr_processor.post_process_object_detection(
-                outputs, 
-                target_sizes=target_sizes, 
-                threshold=0.7
-            )[0]
-
-            # Extract detected objects
-            objects = []
-            for score, label in zip(postprocessed_outputs['scores'], postprocessed_outputs['labels']):
-                if score > 0.7:  # Confidence threshold
-                    object_name = self.detr_model.config.id2label[label.item()]
-                    confidence = score.item()
-                    objects.append({
-                        'name': object_name,
-                        'confidence': round(confidence * 100, 2)
-                    })
-
-            # Remove duplicates while keeping highest confidence
-            unique_objects = {}
-            for obj in objects:
-                name = obj['name']
-                if name not in unique_objects or obj['confidence'] > unique_objects[name]['confidence']:
-                    unique_objects[name] = obj
-
-            return list(unique_objects.values())
-
+            return self.detect_objects_batch([as_context(image, enhanced=True)])[0]
         except Exception as e:
             logger.error(f"Error in object detection: {str(e)}")
             return []
 
+    def detect_objects_batch(self, images):
+        """
+        Detect objects in several images with a single DETR forward pass
+        Args:
+            images (list): ImageContexts, or PIL.Image inputs used as they are
+        Returns:
+            list: One list of detected objects per input image
+        """
+        if not images:
+            return []
+        VISION_BATCH_SIZE.observe(len(images), 'detr')
+        with VISION_LATENCY.time('detr', 'detect', self.backend.name):
+            return self.backend.detect_batch([as_context(image, enhanced=True) for image in images])
+
+    @traced('blip')
     def generate_alt_text(self, image):
         """
         Generate alt text for an image using BLIP model
         Args:
-            image (PIL.Image): Input image
+            image (PIL.Image or ImageContext): Input image
         Returns:
             str: Generated alt text
         """
         if not self.blip_available:
             logger.warning("BLIP model not available for alt text generation")
+            mark_degraded('BLIP unavailable')
             return "Image description unavailable due to model loading issues."
             
         try:
-            # Preprocess image
-            processed_image = self.preprocess_image(image)
+            # Enhancement, quality stats and model inputs are computed once per context
+            context = as_context(image)
             
             # Check image quality
-            quality_metrics = self.validate_image_quality(processed_image)
+            quality_metrics = self.validate_image_quality(context)
             if not quality_metrics['is_valid']:
                 logger.warning(f"Image quality issues detected: {quality_metrics['issues']}")
             
-            # Generate alt text using BLIP
-            inputs = self.blip_processor(processed_image, return_tensors="pt").to(self.device)
-            out = self.blip_model.generate(**inputs)
-            alt_text = self.blip_processor.decode(out[0], skip_special_tokens=True)
+            # Generate alt text using BLIP, batched with other pending requests
+            alt_text = self.caption_batcher.submit(context).result()
             
             return alt_text
             
         except Exception as e:
             logger.error(f"Error generating alt text: {str(e)}")
+            mark_degraded('alt text generation failed')
             return f"Error generating alt text: {str(e)}"
 
+    def generate_alt_text_batch(self, images):
+        """
+        Generate captions for several preprocessed images in one BLIP call
+        Args:
+            images (list): ImageContexts, or preprocessed PIL.Image inputs
+        Returns:
+            list: Generated captions, in the same order as the inputs
+        """
+        if not images:
+            return []
+        VISION_BATCH_SIZE.observe(len(images), 'blip')
+        with VISION_LATENCY.time('blip', 'caption', self.backend.name):
+            return self.backend.caption_batch([as_context(image, enhanced=True) for image in images])
+
+    @traced('blip_describe')
+    def describe_image(self, image):
+        """
+        Generate a longer BLIP description
+        Args:
+            image (ImageContext or PIL.Image): Context, or a preprocessed input image
+        Returns:
+            str: Generated description
+        """
+        with VISION_LATENCY.time('blip', 'describe', self.backend.name):
+            return self.backend.describe(as_context(image, enhanced=True))
+
     def generate_alt_text_general(self, image):
         """
         Generate comprehensive image analysis for general purpose
         Args:
-            image (PIL.Image): Input image
+            image (PIL.Image or ImageContext): Input image
         Returns:
             dict: Analysis results containing description, objects, and colors
         """
@@ -222,28 +229,28 @@ class ImageProcessor:
         }
         
         try:
-            # Preprocess image
-            processed_image = self.preprocess_image(image)
+            # Every stage below reuses the same enhanced image and its derived arrays
+            context = as_context(image)
             
             # Check image quality
-            quality_metrics = self.validate_image_quality(processed_image)
+            quality_metrics = self.validate_image_quality(context)
             result['quality_issues'] = quality_metrics.get('issues', [])
             
             # Generate description using BLIP (if available)
             if self.blip_available:
-                inputs = self.blip_processor(processed_image, return_tensors="pt").to(self.device)
-                out = self.blip_model.generate(
-                    **inputs,
-                    max_length=100,
-                    num_beams=5,
-                    min_length=30,
-                    temperature=0.7
-                )
-                result['description'] = self.blip_processor.decode(out[0], skip_special_tokens=True)
+                result['description'] = self.describe_image(context)
+            else:
+                mark_degraded('BLIP unavailable')
             
             # Detect objects using DETR (if available)
             if self.detr_available:
-                objects = self.detect_objects(processed_image)
+                try:
+                    with span('detr'):
+                        objects = self.detection_batcher.submit(context).result()
+                except Exception as e:
+                    logger.error(f"Error in object detection: {str(e)}")
+                    mark_degraded('object detection failed')
+                    objects = []
                 # Ensure objects have the expected structure
                 formatted_objects = []
                 for obj in objects:
@@ -253,26 +260,13 @@ class ImageProcessor:
                         formatted_objects.append({'name': obj, 'confidence': 1.0})
                 result['objects'] = formatted_objects
             
-            # Extract colors using numpy
-            img_array = np.array(processed_image)
-            pixels = img_array.reshape(-1, 3)
-            
-            from sklearn.cluster import KMeans
-            kmeans = KMeans(n_clusters=5, random_state=42, n_init=10)
-            kmeans.fit(pixels)
-            
-            # Convert colors to hex format
-            colors = []
-            for color in kmeans.cluster_centers_:
-                hex_color = '#{:02x}{:02x}{:02x}'.format(
-                    int(color[0]), int(color[1]), int(color[2])
-                )
-                colors.append(hex_color)
+            # Extract colors from a downsampled, quantized copy of the image
+            with span('colors'):
+                colors = extract_palette(context.thumbnail(PALETTE_MAX_SIDE), n_colors=5)['hex']
             
             result['dominant_colors'] = colors
             
             # Log the result structure for debugging
-            logger = logging.getLogger(__name__)
             logger.info(f"generate_alt_text_general result keys: {result.keys()}")
             logger.info(f"objects count: {len(result['objects'])}")
             logger.info(f"colors count: {len(result['dominant_colors'])}")
@@ -281,7 +275,24 @@ class ImageProcessor:
             
         except Exception as e:
             logger.error(f"Error in generate_alt_text_general: {str(e)}", exc_info=True)
+            mark_degraded('general analysis failed')
             return result  # Return default result on error instead of raising
 
-# Create singleton instance
-image_processor = ImageProcessor() 
+def _create_image_processor():
+    """Use the shared model server when one is configured, else load models in-process"""
+    if MODEL_SERVER_ADDRESS:
+        from app.services.model_server import RemoteImageProcessor
+        logger.info(f"Using model server at {MODEL_SERVER_ADDRESS}")
+        return RemoteImageProcessor(MODEL_SERVER_ADDRESS)
+    return ImageProcessor()
+
+# Create singleton instance (models load lazily on first use)
+image_processor = _create_image_processor()
+
+metrics_registry.register_collector(
+    'batcher_queue_depth', 'gauge', 'Items waiting in the vision micro-batchers', ('batcher',),
+    lambda: {
+        ('caption',): image_processor.caption_batcher.qsize(),
+        ('detection',): image_processor.detection_batcher.qsize()
+    }
+)
@@ -0,0 +1,398 @@
+"""
+Persistent analysis job queue.
+
+Web processes submit an upload and return a job id straight away; worker
+processes (see worker.py) claim jobs from a SQLite queue, run the route
+pipeline with their own warm BLIP/DETR models and store the result. Jobs
+are leased rather than locked, so a job held by a worker that crashed is
+picked up again once its lease expires. A live worker renews the lease
+while the job runs, and a result is only recorded by the worker that still
+holds the lease.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+
+from app.utils.file_utils import read_upload
+from app.utils.metrics import registry as metrics_registry
+from config.config import (
+    JOB_DB_PATH,
+    JOB_FOLDER,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_INTERVAL,
+    JOB_RETENTION_SECONDS,
+    MODEL_SERVER_ADDRESS,
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+FINISHED_STATUSES = ('done', 'failed')
+
+# Route pipelines that only need the uploaded image
+JOB_PIPELINES = ('advanced', 'seo', 'social_media', 'social_media_analyze', 'image_analyzer', 'general')
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue shared by web and worker processes.
+    Uploaded image bytes are stored as files next to the database and
+    removed once the job finishes.
+    """
+
+    def __init__(self, path, payload_dir, lease_seconds=600, max_attempts=3):
+        self.path = path
+        self.payload_dir = payload_dir
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        os.makedirs(payload_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")  # Readers do not block the workers' writes
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    pipeline TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    result TEXT,
+                    meta TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_expires REAL,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _payload_path(self, job_id):
+        return os.path.join(self.payload_dir, f'{job_id}.bin')
+
+    def submit(self, pipeline, upload, options=None):
+        """
+        Queue an analysis
+        Args:
+            pipeline (str): Key in PIPELINES
+            upload (UploadedImage): Uploaded image
+            options (dict, optional): Request options kept with the job
+        Returns:
+            str: Job id
+        """
+        job_id = uuid.uuid4().hex
+        with open(self._payload_path(job_id), 'wb') as f:
+            upload.seek(0)
+            for chunk in iter(lambda: upload.read(64 * 1024), b''):
+                f.write(chunk)
+            upload.seek(0)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, pipeline, status, filename, digest, options, created) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, pipeline, upload.filename, upload.digest, json.dumps(options or {}), time.time())
+            )
+        return job_id
+
+    def claim(self, worker_id):
+        """
+        Lease the oldest runnable job to a worker
+        Runnable jobs are queued ones and running ones whose lease expired.
+        Returns:
+            dict or None: Claimed job
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                # IMMEDIATE takes the write lock up front so two workers never claim the same job
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' "
+                    "OR (status = 'running' AND lease_expires < ?) ORDER BY created LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                    "lease_expires = ?, started = ? WHERE id = ?",
+                    (worker_id, now + self.lease_seconds, now, row[0])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+        job = self.get(row[0])
+        if job['attempts'] > self.max_attempts:
+            self.fail(job['id'], f"Gave up after {self.max_attempts} attempts", lease=self.lease_of(job))
+            return self.claim(worker_id)
+        return job
+
+    @staticmethod
+    def lease_of(job):
+        """(worker, attempt) identifying the claim a job dict was returned for"""
+        return job['worker'], job['attempts']
+
+    def renew(self, job):
+        """
+        Extend the lease of a claimed job
+        Returns:
+            bool: False if the job was reclaimed or finished in the meantime
+        """
+        worker, attempts = self.lease_of(job)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? "
+                "WHERE id = ? AND status = 'running' AND worker = ? AND attempts = ?",
+                (time.time() + self.lease_seconds, job['id'], worker, attempts)
+            )
+        return cursor.rowcount == 1
+
+    @contextmanager
+    def hold(self, job):
+        """Renew a claimed job's lease in the background while the enclosed block runs"""
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    if not self.renew(job):
+                        logger.warning(f"Job {job['id']} lost its lease to another worker")
+                        return
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not renew the lease of job {job['id']}: {str(e)}")
+
+        thread = threading.Thread(target=heartbeat, name=f"lease-{job['id'][:8]}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def payload(self, job):
+        """
+        Open a claimed job's image
+        Returns:
+            UploadedImage: The image the job was submitted with
+        """
+        with open(self._payload_path(job['id']), 'rb') as f:
+            return read_upload(f, job['filename'])
+
+    def _finish(self, job_id, status, result=None, meta=None, error=None, lease=None):
+        """
+        Record a job's outcome and remove its payload
+        Args:
+            lease (tuple, optional): (worker, attempt) from lease_of(); when given the
+                outcome is only recorded if that claim still holds the job
+        Returns:
+            bool: Whether the outcome was recorded
+        """
+        query = ("UPDATE jobs SET status = ?, result = ?, meta = ?, error = ?, lease_expires = NULL, "
+                 "finished = ? WHERE id = ?")
+        params = [status, json.dumps(result) if result is not None else None,
+                  json.dumps(meta) if meta is not None else None, error, time.time(), job_id]
+        if lease is not None:
+            query += " AND status = 'running' AND worker = ? AND attempts = ?"
+            params.extend(lease)
+        with self._connect() as conn:
+            cursor = conn.execute(query, params)
+        if cursor.rowcount != 1:
+            # Another worker reclaimed the job and may still be reading the payload
+            logger.warning(f"Outcome of job {job_id} discarded: the lease is no longer held")
+            return False
+        try:
+            os.remove(self._payload_path(job_id))
+        except FileNotFoundError:
+            pass
+        return True
+
+    def complete(self, job_id, result, meta=None, lease=None):
+        return self._finish(job_id, 'done', result=result, meta=meta, lease=lease)
+
+    def fail(self, job_id, error, lease=None):
+        return self._finish(job_id, 'failed', error=error, lease=lease)
+
+    def get(self, job_id):
+        """
+        Look up a job
+        Returns:
+            dict or None: Job fields, with result, meta and options decoded and
+                the queue position for queued jobs
+        """
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            if job['status'] == 'queued':
+                job['position'] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created < ?", (job['created'],)
+                ).fetchone()[0]
+        for field in ('options', 'result', 'meta'):
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    def counts(self):
+        """Return the number of jobs in each status"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+    def purge(self, older_than):
+        """Delete finished jobs that finished more than older_than seconds ago"""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?",
+                (time.time() - older_than,)
+            )
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """Return the process-wide job queue, creating the database on first use"""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue(JOB_DB_PATH, JOB_FOLDER, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS)
+    return _job_queue
+
+def _job_counts():
+    # Only report once this process has opened the queue, so a scrape never creates the database
+    if _job_queue is None:
+        return {}
+    return {(status,): count for status, count in _job_queue.counts().items()}
+
+metrics_registry.register_collector('jobs', 'gauge', 'Background jobs by status', ('status',), _job_counts)
+
+def job_view(job):
+    """Public representation of a job for API responses"""
+    view = {
+        'job_id': job['id'],
+        'pipeline': job['pipeline'],
+        'status': job['status'],
+        'created': job['created'],
+        'started': job['started'],
+        'finished': job['finished']
+    }
+    if job['status'] == 'queued':
+        view['position'] = job.get('position', 0)
+    if job['status'] == 'done':
+        view['data'] = job['result']
+        view['meta'] = job['meta']
+    if job['status'] == 'failed':
+        view['error'] = job['error']
+    return view
+
+def run_job(job, queue=None):
+    """Run one claimed job through its pipeline and record the outcome"""
+    from app.services.cache_service import cached_pipeline
+    from app.services.pipeline_service import run_pipeline
+
+    queue = queue or get_job_queue()
+    lease = queue.lease_of(job)
+    try:
+        upload = queue.payload(job)
+    except FileNotFoundError:
+        queue.fail(job['id'], 'Job payload is missing', lease=lease)
+        return
+    try:
+        with queue.hold(job):
+            result, meta = cached_pipeline(
+                job['pipeline'], upload.digest,
+                lambda: run_pipeline(job['pipeline'], upload=upload).output
+            )
+        queue.complete(job['id'], result, meta, lease=lease)
+    except Exception as e:
+        logger.error(f"Job {job['id']} ({job['pipeline']}) failed: {str(e)}", exc_info=True)
+        queue.fail(job['id'], str(e), lease=lease)
+    finally:
+        upload.close()
+
+def run_worker(worker_id=None, stop_event=None, warm_up=('blip', 'detr'), queue=None):
+    """
+    Claim and run jobs until stop_event is set
+    Args:
+        worker_id (str, optional): Name recorded on claimed jobs
+        stop_event (Event, optional): Set to stop after the current job
+        warm_up (iterable): Models to load before taking jobs
+        queue (JobQueue, optional): Queue to serve, defaults to the shared queue
+    """
+    from app.utils.init_utils import initialize_ml_dependencies
+    from app.services.image_service import image_processor
+
+    queue = queue or get_job_queue()
+    worker_id = worker_id or f'worker-{os.getpid()}'
+    stop_event = stop_event or threading.Event()
+
+    initialize_ml_dependencies()
+    # With a model server the models live there, not in this process
+    if warm_up and not MODEL_SERVER_ADDRESS:
+        image_processor.warm_up(warm_up)
+    logger.info(f"{worker_id} ready")
+
+    last_purge = 0
+    while not stop_event.is_set():
+        if time.time() - last_purge > 3600:
+            queue.purge(JOB_RETENTION_SECONDS)
+            last_purge = time.time()
+
+        job = queue.claim(worker_id)
+        if job is None:
+            stop_event.wait(JOB_POLL_INTERVAL)
+            continue
+        logger.info(f"{worker_id} running job {job['id']} ({job['pipeline']})")
+        run_job(job, queue)
+
+def job_events(job_id, timeout=300, queue=None):
+    """
+    Yield job snapshots whenever the status changes, until the job finishes
+    Args:
+        job_id (str): Job to watch
+        timeout (float): Seconds to watch before giving up
+    Yields:
+        dict or None: job_view snapshots; None as a keep-alive while nothing changes
+    """
+    queue = queue or get_job_queue()
+    deadline = time.monotonic() + timeout
+    last_status = None
+    last_yield = time.monotonic()
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job is None:
+            return
+        if job['status'] != last_status:
+            last_status = job['status']
+            last_yield = time.monotonic()
+            yield job_view(job)
+            if last_status in FINISHED_STATUSES:
+                return
+        elif time.monotonic() - last_yield > 15:
+            last_yield = time.monotonic()
+            yield None
+        time.sleep(JOB_POLL_INTERVAL)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+
+from config.ai_config import GEMINI_CONFIG
+from config.config import PROMPT_CACHE_ENABLED, PROMPT_CACHE_MAX_ENTRIES, PROMPT_CACHE_TTL
+from app.services.cache_service import MemoryLRUCache, register_cache_metrics
+from app.services.gemini_client import get_model
+
+logger = logging.getLogger(__name__)
+
+# Memoized Gemini text responses, keyed on model, generation config and prompt
+prompt_cache = MemoryLRUCache(PROMPT_CACHE_MAX_ENTRIES, PROMPT_CACHE_TTL)
+register_cache_metrics('prompt', prompt_cache)
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so prompts differing only in indentation share a key"""
+    return ' '.join(prompt.split())
+
+def make_prompt_key(model_name, prompt, generation_config=None):
+    """
+    Build the memoization key for a text prompt
+    Args:
+        model_name (str): Gemini model name
+        prompt (str): Prompt text
+        generation_config (dict, optional): Generation parameters
+    Returns:
+        str: Hex digest of the normalized request
+    """
+    payload = json.dumps({
+        'model': model_name,
+        'config': generation_config or {},
+        'prompt': normalize_prompt(prompt)
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def generate_text(prompt, model_name=None, generation_config=None, use_cache=True):
+    """
+    Generate text with Gemini, reusing earlier responses to identical prompts
+    Args:
+        prompt (str): Prompt text
+        model_name (str, optional): Gemini model name, defaults to the text model
+        generation_config (dict, optional): Generation parameters
+        use_cache (bool): Set to False to bypass the memoization layer
+    Returns:
+        str: Response text
+    """
+    model_name = model_name or GEMINI_CONFIG['text_model']
+    use_cache = use_cache and PROMPT_CACHE_ENABLED
+
+    key = None
+    if use_cache:
+        key = make_prompt_key(model_name, prompt, generation_config)
+        cached = prompt_cache.get(key)
+        if cached is not None:
+            logger.debug(f"Prompt cache hit ({key[:12]})")
+            return cached
+
+    response = get_model(model_name, generation_config).generate_content(prompt)
+    text = response.text
+
+    if key is not None:
+        prompt_cache.set(key, text)
+    return text
+
+def stream_text(prompt, model_name=None, generation_config=None, use_cache=True):
+    """
+    Stream text from Gemini chunk by chunk
+    A memoized response is yielded as a single chunk; a fresh response is
+    stored in the prompt cache once the stream completes.
+    Args:
+        prompt (str): Prompt text
+        model_name (str, optional): Gemini model name, defaults to the text model
+        generation_config (dict, optional): Generation parameters
+        use_cache (bool): Set to False to bypass the memoization layer
+    Yields:
+        str: Response text chunks
+    """
+    model_name = model_name or GEMINI_CONFIG['text_model']
+    use_cache = use_cache and PROMPT_CACHE_ENABLED
+
+    key = None
+    if use_cache:
+        key = make_prompt_key(model_name, prompt, generation_config)
+        cached = prompt_cache.get(key)
+        if cached is not None:
+            logger.debug(f"Prompt cache hit ({key[:12]})")
+            yield cached
+            return
+
+    chunks = []
+    for chunk in get_model(model_name, generation_config).stream_content(prompt):
+        chunks.append(chunk)
+        yield chunk
+
+    if key is not None:
+        prompt_cache.set(key, ''.join(chunks))
+
+def prompt_cache_stats():
+    """Return prompt cache size and hit/miss counters"""
+    return prompt_cache.stats()
@@ -1,14 +1,17 @@
 from PIL import Image
 import logging
-from config.ai_config import get_gemini_client, GEMINI_CONFIG, format_success_response, format_error_response
+from config.ai_config import GEMINI_CONFIG, format_success_response, format_error_response
+from app.services.gemini_client import get_model
+from app.utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
-def analyze_medical_image(image_path, context=None):
+@traced('medical_analysis')
+def analyze_medical_image(image_source, context=None):
     """
     Analyze medical image using Gemini Vision
     Args:
-        image_path (str): Path to the medical image
+        image_source: Path to the medical image or an already decoded PIL.Image
         context (str, optional): Additional context about the image
     Returns:
         dict: Analysis results
@@ -16,14 +19,16 @@ def analyze_medical_image(image_path, context=None):
     try:
         # Load and validate image
         try:
-            image = Image.open(image_path)
+            if isinstance(image_source, Image.Image):
+                image = image_source
+            else:
+                image = Image.open(image_source)
         except Exception as e:
             logger.error(f"Error loading image: {str(e)}")
             return format_error_response("Invalid image file", "INVALID_IMAGE")
 
-        # Initialize Gemini
-        genai = get_gemini_client()
-        model = genai.GenerativeModel(GEMINI_CONFIG['vision_model'])
+        # Reuse the shared Gemini model handle
+        model = get_model(GEMINI_CONFIG['vision_model'])
 
         # Prepare prompt
         prompt = """Analyze this medical image and provide a detailed report.
@@ -60,6 +65,22 @@ def analyze_medical_image(image_path, context=None):
         logger.error(f"Error analyzing medical image: {str(e)}")
         return format_error_response(str(e), "ANALYSIS_ERROR")
 
+def analyze_medical_upload(upload, context=None):
+    """
+    Analyze an upload buffered by file_utils.read_upload
+    Args:
+        upload (UploadedImage): Upload, decoded here
+        context (str, optional): Additional context about the image
+    Returns:
+        dict: Analysis results, or an INVALID_IMAGE error if the upload cannot be decoded
+    """
+    try:
+        image = upload.image
+    except Exception as e:
+        logger.error(f"Error loading image: {str(e)}")
+        return format_error_response("Invalid image file", "INVALID_IMAGE")
+    return analyze_medical_image(image, context)
+
 def parse_medical_report(text):
     """Parse medical report into sections"""
     sections = {
@@ -0,0 +1,166 @@
+import threading
+import time
+import logging
+
+from app.utils.metrics import registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+class ModelLoadError(RuntimeError):
+    """Raised when a registered model could not be loaded"""
+
+
+def model_bytes(model):
+    """
+    Estimate the memory held by a loaded model's weights
+    Args:
+        model: Loader result; torch modules are found inside tuples, lists and dicts
+    Returns:
+        int: Bytes of parameters and buffers (0 when nothing is measurable, e.g. ONNX sessions)
+    """
+    if isinstance(model, (tuple, list)):
+        return sum(model_bytes(item) for item in model)
+    if isinstance(model, dict):
+        return sum(model_bytes(item) for item in model.values())
+    if hasattr(model, 'parameters') and hasattr(model, 'buffers'):
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+    return 0
+
+
+class ModelRegistry:
+    """
+    Loads models the first time they are requested instead of at import.
+
+    Each model is registered with a loader callable. The first call to get()
+    runs the loader under a per-model lock so concurrent requests wait for a
+    single load, and later calls return the cached instance. Failed loads are
+    remembered so a broken model is not retried on every request.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._errors = {}
+        self._load_times = {}
+        self._memory = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+        self._device = None
+
+    def register(self, name, loader):
+        """
+        Register a model loader
+        Args:
+            name (str): Name used to look the model up
+            loader (callable): Zero-argument function returning the loaded model
+        """
+        with self._registry_lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    @property
+    def device(self):
+        """Torch device used for all local models"""
+        if self._device is None:
+            import torch
+            self._device = "cuda" if torch.cuda.is_available() else "cpu"
+        return self._device
+
+    def is_loaded(self, name):
+        """Check whether a model has already been loaded"""
+        return name in self._models
+
+    def get(self, name):
+        """
+        Return a model, loading it on first use
+        Args:
+            name (str): Registered model name
+        Returns:
+            object: Whatever the registered loader returned
+        Raises:
+            ModelLoadError: If the model is unknown or failed to load
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._loaders:
+            raise ModelLoadError(f"Unknown model '{name}'")
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited
+            if name in self._models:
+                return self._models[name]
+            if name in self._errors:
+                raise ModelLoadError(f"Model '{name}' failed to load: {self._errors[name]}")
+
+            logger.info(f"Loading model '{name}'...")
+            start = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                self._errors[name] = str(e)
+                logger.error(f"Error loading model '{name}': {str(e)}")
+                raise ModelLoadError(f"Model '{name}' failed to load: {str(e)}") from e
+
+            self._load_times[name] = time.perf_counter() - start
+            self._models[name] = model
+            try:
+                self._memory[name] = model_bytes(model)
+            except Exception as e:
+                logger.warning(f"Could not measure memory of model '{name}': {str(e)}")
+            logger.info(f"Model '{name}' loaded in {self._load_times[name]:.2f}s")
+            return model
+
+    def warm_up(self, names):
+        """
+        Load a list of models ahead of the first request
+        Args:
+            names (list): Model names to load; unknown or failing models are logged
+        """
+        for name in names:
+            try:
+                self.get(name)
+            except ModelLoadError as e:
+                logger.warning(f"Warm-up skipped for '{name}': {str(e)}")
+
+    def memory(self):
+        """Return estimated weight bytes per loaded model"""
+        return dict(self._memory)
+
+    def report(self):
+        """
+        Summarise registry state
+        Returns:
+            dict: Per-model status and load time in seconds
+        """
+        report = {}
+        for name in self._loaders:
+            if name in self._models:
+                status = 'loaded'
+            elif name in self._errors:
+                status = 'failed'
+            else:
+                status = 'not_loaded'
+            report[name] = {
+                'status': status,
+                'load_seconds': round(self._load_times.get(name, 0.0), 3),
+                'error': self._errors.get(name)
+            }
+        return report
+
+# Process-wide registry shared by all services
+model_registry = ModelRegistry()
+
+def _model_memory():
+    values = {(name,): size for name, size in model_registry.memory().items()}
+    if model_registry._device == 'cuda':
+        import torch
+
+        values[('cuda_allocated',)] = torch.cuda.memory_allocated()
+    return values
+
+metrics_registry.register_collector('model_memory_bytes', 'gauge',
+                                    'Estimated weight memory of loaded models, plus CUDA allocations',
+                                    ('model',), _model_memory)
@@ -0,0 +1,381 @@
+"""
+Shared model server.
+
+BLIP and DETR run in a small pool of model processes instead of inside
+every web worker, so memory grows with the number of model processes and
+not with the number of web processes. Web processes reach the server over
+a multiprocessing.connection channel; decoded image arrays are written
+into a shared memory block and only its name and the array shapes travel
+over the socket, so pixels are never pickled.
+
+Start the server with `python serve_models.py` and point the web processes
+at it with MODEL_SERVER_ADDRESS.
+
+multiprocessing.connection unpickles whatever an authenticated peer sends,
+so the authkey is effectively a code execution credential: the server and
+its clients refuse to run without an explicit MODEL_SERVER_AUTHKEY, and the
+server only listens on a Unix socket or a loopback address.
+"""
+import ipaddress
+import itertools
+import os
+import queue
+import threading
+import time
+import logging
+from multiprocessing import shared_memory
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+from PIL import Image
+
+from app.services.image_service import ImageProcessor
+from app.services.image_context import as_context
+from app.utils.metrics import VISION_LATENCY
+from app.utils.tracing import traced
+from config.config import MODEL_SERVER_AUTHKEY, MODEL_SERVER_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ('caption', 'detect', 'describe', 'status')
+
+# Published defaults that must never be used as the authkey
+INSECURE_AUTHKEYS = ('default-secret-key', 'your-secret-key-here')
+
+
+class ModelServerError(RuntimeError):
+    """Raised when the model server is unreachable or a remote call failed"""
+
+
+def parse_address(address):
+    """
+    Turn MODEL_SERVER_ADDRESS into a multiprocessing.connection address
+    Args:
+        address (str): 'host:port', ':port' or a Unix socket path
+    Returns:
+        tuple or str: (host, port) for TCP, the path for a Unix socket
+    """
+    if address.startswith('/') or address.startswith('.'):
+        return address
+    host, _, port = address.rpartition(':')
+    return (host or '127.0.0.1', int(port))
+
+def _authkey(authkey=None):
+    """
+    Raises:
+        ModelServerError: If no explicit authkey is configured or it is a published default
+    """
+    authkey = authkey or MODEL_SERVER_AUTHKEY
+    if not authkey or authkey in INSECURE_AUTHKEYS:
+        raise ModelServerError(
+            "MODEL_SERVER_AUTHKEY must be set to a random secret shared by the model server and its clients"
+        )
+    return authkey.encode('utf-8')
+
+def _is_local(address):
+    """True for Unix socket paths and loopback TCP addresses"""
+    if isinstance(address, str):
+        return True
+    host = address[0]
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def pack_images(images):
+    """
+    Copy RGB images into a new shared memory block
+    Args:
+        images (list): PIL.Image inputs
+    Returns:
+        tuple: (SharedMemory, list of (offset, shape)); the caller closes and unlinks it
+    """
+    arrays = [np.asarray(img if img.mode == 'RGB' else img.convert('RGB')) for img in images]
+    layout = []
+    offset = 0
+    for array in arrays:
+        layout.append((offset, array.shape))
+        offset += array.nbytes
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for array, (start, shape) in zip(arrays, layout):
+        np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=start)[...] = array
+    return shm, layout
+
+def _attach(name):
+    """Attach to a block created by a client without taking ownership of it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers the block with this process's resource
+        # tracker, which would unlink it when the model process exits
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+def unpack_images(shm, layout):
+    """Build PIL images from a shared memory block (pixels are copied out)"""
+    images = []
+    for offset, shape in layout:
+        view = np.ndarray(tuple(shape), dtype=np.uint8, buffer=shm.buf, offset=offset)
+        images.append(Image.fromarray(view.copy()))
+        del view
+    return images
+
+
+def _run_operation(processor, op, images):
+    if op == 'caption':
+        return processor.generate_alt_text_batch(images)
+    if op == 'detect':
+        return processor.detect_objects_batch(images)
+    if op == 'describe':
+        return [processor.describe_image(image) for image in images]
+    if op == 'status':
+        return {
+            'pid': os.getpid(),
+            'blip_available': processor.blip_available,
+            'detr_available': processor.detr_available,
+            'device': processor.device
+        }
+    raise ValueError(f"Unknown operation '{op}'")
+
+def _model_worker(tasks, results, warm_up):
+    """Model process: holds one copy of the models and serves tasks until it gets None"""
+    from app.utils.init_utils import initialize_ml_dependencies
+
+    initialize_ml_dependencies()
+    processor = ImageProcessor()
+    if warm_up:
+        processor.warm_up(warm_up)
+    logger.info(f"Model process {os.getpid()} ready")
+
+    for task in iter(tasks.get, None):
+        task_id, op, shm_name, layout = task
+        try:
+            images = []
+            if shm_name:
+                shm = _attach(shm_name)
+                try:
+                    images = unpack_images(shm, layout)
+                finally:
+                    shm.close()
+            results.put((task_id, _run_operation(processor, op, images), None))
+        except Exception as e:
+            logger.error(f"Model operation '{op}' failed: {str(e)}", exc_info=True)
+            results.put((task_id, None, str(e)))
+
+
+class ModelServer:
+    """
+    Accepts client connections and fans requests out to the model processes.
+    Each connection is served by its own thread; requests from all
+    connections share one task queue, so any idle model process picks up
+    the next batch.
+    """
+
+    def __init__(self, address, workers=1, authkey=None, warm_up=('blip', 'detr')):
+        import multiprocessing
+
+        self.address = parse_address(address)
+        if not _is_local(self.address):
+            raise ModelServerError(f"Model server address {address} is not local; use a Unix socket or a loopback host")
+        self.authkey = _authkey(authkey)
+        self.workers = max(1, int(workers))
+        self.warm_up = tuple(warm_up)
+        # Spawn so each model process initialises torch cleanly
+        self._context = multiprocessing.get_context('spawn')
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+        self._processes = []
+        self._waiting = {}
+        self._waiting_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._stopped = threading.Event()
+
+    def _start_worker(self):
+        process = self._context.Process(
+            target=_model_worker, args=(self._tasks, self._results, self.warm_up), daemon=True
+        )
+        process.start()
+        return process
+
+    def _dispatch_results(self):
+        while not self._stopped.is_set():
+            try:
+                task_id, result, error = self._results.get(timeout=1)
+            except queue.Empty:
+                continue
+            with self._waiting_lock:
+                slot = self._waiting.pop(task_id, None)
+            if slot is not None:
+                slot['response'] = (result, error)
+                slot['event'].set()
+
+    def _supervise(self):
+        while not self._stopped.wait(1):
+            for index, process in enumerate(self._processes):
+                if not process.is_alive():
+                    logger.warning(f"Model process {process.pid} exited with code {process.exitcode}, restarting")
+                    self._processes[index] = self._start_worker()
+
+    def call(self, op, shm_name=None, layout=None, timeout=None):
+        """Run one operation on the next free model process"""
+        task_id = next(self._ids)
+        slot = {'event': threading.Event(), 'response': None}
+        with self._waiting_lock:
+            self._waiting[task_id] = slot
+        self._tasks.put((task_id, op, shm_name, layout or []))
+        if not slot['event'].wait(timeout or MODEL_SERVER_TIMEOUT):
+            with self._waiting_lock:
+                self._waiting.pop(task_id, None)
+            raise ModelServerError(f"Model operation '{op}' timed out")
+        result, error = slot['response']
+        if error is not None:
+            raise ModelServerError(error)
+        return result
+
+    def _serve_connection(self, conn):
+        with conn:
+            while not self._stopped.is_set():
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if request['op'] not in OPERATIONS:
+                        raise ValueError(f"Unknown operation '{request['op']}'")
+                    result = self.call(request['op'], request.get('shm'), request.get('layout'))
+                    conn.send({'result': result})
+                except Exception as e:
+                    conn.send({'error': str(e)})
+
+    def serve_forever(self):
+        """Start the model processes and accept connections until interrupted"""
+        self._processes = [self._start_worker() for _ in range(self.workers)]
+        threading.Thread(target=self._dispatch_results, name='model-results', daemon=True).start()
+        threading.Thread(target=self._supervise, name='model-supervisor', daemon=True).start()
+
+        listener = Listener(self.address, authkey=self.authkey)
+        logger.info(f"Model server listening on {self.address} with {self.workers} model processes")
+        try:
+            while not self._stopped.is_set():
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # Failed handshakes (wrong authkey) should not stop the server
+                    logger.warning(f"Rejected model server connection: {str(e)}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            self.stop()
+            listener.close()
+
+    def stop(self):
+        self._stopped.set()
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+
+
+class RemoteImageProcessor(ImageProcessor):
+    """
+    ImageProcessor whose model calls run on the model server.
+    Preprocessing, quality checks and colour extraction stay local, and the
+    caption/detection micro-batchers still coalesce requests in this process
+    so each batch is a single round trip.
+    """
+
+    STATUS_TTL = 30  # Seconds a model availability answer is reused
+
+    def __init__(self, address, authkey=None, timeout=None):
+        super().__init__()
+        self.address = parse_address(address)
+        self.authkey = _authkey(authkey)
+        self.timeout = timeout or MODEL_SERVER_TIMEOUT
+        self._idle = []
+        self._idle_lock = threading.Lock()
+        self._status = None
+        self._status_checked = 0
+
+    def _connection(self):
+        with self._idle_lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return Client(self.address, authkey=self.authkey)
+        except Exception as e:
+            raise ModelServerError(f"Model server unreachable at {self.address}: {str(e)}")
+
+    def _call(self, op, images=()):
+        shm, layout = (None, [])
+        if images:
+            # Only the enhanced pixels travel; model inputs are built on the server
+            shm, layout = pack_images([as_context(image, enhanced=True).processed for image in images])
+        conn = self._connection()
+        try:
+            conn.send({'op': op, 'shm': shm.name if shm else None, 'layout': layout})
+            if not conn.poll(self.timeout):
+                raise ModelServerError(f"Model operation '{op}' timed out")
+            response = conn.recv()
+        except Exception:
+            # The connection may be mid-message, so never reuse it
+            conn.close()
+            raise
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        with self._idle_lock:
+            self._idle.append(conn)
+        if 'error' in response:
+            raise ModelServerError(response['error'])
+        return response['result']
+
+    def status(self):
+        """Return the model server's availability report, refreshed every STATUS_TTL seconds"""
+        if self._status is None or time.monotonic() - self._status_checked > self.STATUS_TTL:
+            try:
+                self._status = self._call('status')
+            except ModelServerError as e:
+                logger.error(str(e))
+                self._status = {'blip_available': False, 'detr_available': False, 'device': None}
+            self._status_checked = time.monotonic()
+        return self._status
+
+    @property
+    def device(self):
+        return self.status().get('device') or 'remote'
+
+    def warm_up(self, models):
+        """Models are loaded by the model server, so there is nothing to warm up here"""
+        logger.info(f"Skipping local warm-up of {', '.join(models)}: models are served by {self.address}")
+
+    @property
+    def blip_available(self):
+        return self.status()['blip_available']
+
+    @property
+    def detr_available(self):
+        return self.status()['detr_available']
+
+    def generate_alt_text_batch(self, images):
+        if not images:
+            return []
+        with VISION_LATENCY.time('blip', 'caption', 'remote'):
+            return self._call('caption', list(images))
+
+    def detect_objects_batch(self, images):
+        if not images:
+            return []
+        with VISION_LATENCY.time('detr', 'detect', 'remote'):
+            return self._call('detect', list(images))
+
+    @traced('blip_describe')
+    def describe_image(self, image):
+        with VISION_LATENCY.time('blip', 'describe', 'remote'):
+            return self._call('describe', [image])[0]
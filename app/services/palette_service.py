@@ -0,0 +1,78 @@
+"""
+Fast dominant-colour extraction.
+
+Instead of clustering every pixel of the full-resolution image, the image
+is downsampled to a small thumbnail, quantized with median cut, and the
+median-cut colours are refined with a few k-means (Lloyd) iterations on the
+thumbnail pixels. The result is deterministic and takes tens of
+milliseconds even for 12 MP photos.
+"""
+import numpy as np
+from PIL import Image
+import logging
+
+from config.config import PALETTE_MAX_SIDE, PALETTE_REFINE_ITERATIONS
+from app.utils.metrics import PALETTE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+def _thumbnail(image, max_side):
+    """Return an RGB copy of the image no larger than max_side on either edge"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    thumb = image.copy()
+    thumb.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+    return thumb
+
+def _refine(pixels, centers, iterations):
+    """Run a few Lloyd iterations starting from the median-cut centres"""
+    labels = None
+    for _ in range(max(1, iterations)):
+        distances = ((pixels[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=len(centers))
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, pixels)
+        occupied = counts > 0
+        centers[occupied] = sums[occupied] / counts[occupied, None]
+    return centers, labels
+
+@PALETTE_LATENCY.time()
+def extract_palette(image, n_colors=5, max_side=None, iterations=None):
+    """
+    Extract dominant colours and their share of the image
+    Args:
+        image (PIL.Image): Input image in any mode
+        n_colors (int): Number of colours to return
+        max_side (int, optional): Longest thumbnail edge used for analysis
+        iterations (int, optional): k-means refinement iterations
+    Returns:
+        dict: 'colors' (RGB int lists), 'hex', 'percentages' (sorted by share,
+            descending) and 'mean_rgb' (average colour per channel)
+    """
+    max_side = max_side or PALETTE_MAX_SIDE
+    iterations = PALETTE_REFINE_ITERATIONS if iterations is None else iterations
+
+    thumb = _thumbnail(image, max_side)
+    pixels = np.asarray(thumb, dtype=np.float32).reshape(-1, 3)
+
+    # Median cut gives a deterministic starting palette
+    quantized = thumb.quantize(colors=n_colors, method=Image.Quantize.MEDIANCUT)
+    palette = np.array(quantized.getpalette()[:n_colors * 3], dtype=np.float32).reshape(-1, 3)
+    used = np.unique(np.asarray(quantized))
+    centers = palette[used[used < len(palette)]].copy()
+
+    centers, labels = _refine(pixels, centers, iterations)
+    counts = np.bincount(labels, minlength=len(centers))
+
+    order = np.argsort(-counts, kind='stable')
+    centers = centers[order]
+    percentages = counts[order] / counts.sum() * 100
+
+    colors = np.clip(np.rint(centers), 0, 255).astype(int)
+    return {
+        'colors': colors.tolist(),
+        'hex': ['#{:02x}{:02x}{:02x}'.format(*color) for color in colors],
+        'percentages': percentages.tolist(),
+        'mean_rgb': pixels.mean(axis=0).tolist()
+    }
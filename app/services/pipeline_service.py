@@ -0,0 +1,211 @@
+"""
+Route pipelines expressed as dependency graphs.
+
+Each pipeline takes the decoded upload (an UploadedImage) as input and returns the `data`
+payload its route sends back. Image steps share the upload's ImageContext, so
+the image is converted, enhanced and normalized for each model only once.
+Every image pipeline starts with a 'quality' step; when QUALITY_GATE_ENABLED
+is set it rejects unusable images before any model or Gemini call. Independent steps (for example the caption
+and hashtag calls in the social media pipeline) run concurrently.
+"""
+import logging
+
+from app.utils.pipeline_utils import Pipeline, Step
+from app.services.image_service import image_processor
+from app.services.image_context import upload_context
+from app.services.cache_service import mark_degraded
+from app.services.quality_service import check_quality_gate
+from app.services.text_service import (
+    generate_context,
+    enhance_context,
+    social_media_caption,
+    generate_hashtags,
+    enhance_alt_text,
+)
+from app.services.seo_service import generate_seo_content, generate_social_variations
+from app.services.advanced_image_service import AdvancedImageProcessor
+
+logger = logging.getLogger(__name__)
+
+def _require(result):
+    """Unwrap a service response, raising if the call failed"""
+    if not result['success']:
+        raise ValueError(result['error'])
+    return result['data']
+
+def _enhanced_alt_text(alt_text):
+    # Ensure alt text is at least 6 words long
+    alt_text_result = enhance_alt_text(alt_text)
+    if alt_text_result['success']:
+        return alt_text_result['data']['enhanced_alt_text']
+    mark_degraded('alt text enhancement failed')
+    return alt_text
+
+def _hashtags_or_empty(context):
+    hashtags_result = generate_hashtags(context)
+    if not hashtags_result['success']:
+        logger.error(f"Hashtag generation failed: {hashtags_result.get('error')}")
+        mark_degraded('hashtag generation failed')
+        return []  # Fallback to empty list
+    return hashtags_result['data']['hashtags']
+
+def _hashtag_response(caption):
+    # The analyze route returns the whole service response as 'hashtags'
+    hashtags_result = generate_hashtags(caption)
+    if not hashtags_result['success']:
+        logger.error(f"Hashtag generation failed: {hashtags_result.get('error')}")
+        mark_degraded('hashtag generation failed')
+    return hashtags_result
+
+def _sentiment(processor, enhanced_text):
+    try:
+        sentiment_result = processor.sentiment_analysis(enhanced_text)
+        return {
+            'score': float(sentiment_result['Confidence'].values[0]),
+            'label': sentiment_result['Sentiment'].values[0]
+        }
+    except Exception as sentiment_err:
+        logger.error(f"Error in sentiment analysis: {str(sentiment_err)}")
+        mark_degraded('sentiment analysis failed')
+        return {
+            'score': 0.5,
+            'label': 'Neutral'
+        }
+
+def _streamed(fn, stage):
+    """Wrap a Gemini step so its text chunks are sent through the 'emit' input"""
+    def step(context, alt_text, emit):
+        return fn(context, alt_text, on_text=lambda text: emit({'event': 'delta', 'stage': stage, 'text': text}))
+    return step
+
+def _advanced_output(results):
+    # Charts are rendered per request by chart_service, so only the data is kept here
+    color_data = results['colors']
+    return {
+        'description': results['enhanced_text'],
+        'color_analysis': {
+            'distribution': color_data['distribution'],
+            'dominant_colors': color_data['dominant_colors'],
+            'color_percentages': color_data['percentages']
+        },
+        'sentiment': results['sentiment']
+    }
+
+def _quality_gate(upload):
+    # Cheap checks first: a rejected image never reaches BLIP or Gemini
+    return check_quality_gate(upload_context(upload))
+
+def _alt_text(upload, quality):
+    return image_processor.generate_alt_text(upload_context(upload))
+
+def _load_advanced_processor(upload, quality):
+    # Share the upload's image context with the captioning step
+    processor = AdvancedImageProcessor()
+    processor.load_image(upload_context(upload))
+    return processor
+
+PIPELINES = {
+    'social_media': Pipeline('social_media', [
+        Step('quality', _quality_gate, deps=['upload'], kind='cpu'),
+        Step('alt_text', _alt_text, deps=['upload', 'quality'], kind='cpu'),
+        Step('enhanced_alt_text', _enhanced_alt_text, deps=['alt_text']),
+        Step('context', lambda enhanced_alt_text: _require(generate_context(enhanced_alt_text))['context'],
+             deps=['enhanced_alt_text']),
+        Step('caption', lambda context: _require(social_media_caption(context))['caption'], deps=['context']),
+        Step('hashtags', _hashtags_or_empty, deps=['context']),
+    ], output=lambda r: {
+        'alt_text': r['enhanced_alt_text'],
+        'caption': r['caption'],
+        'hashtags': r['hashtags']
+    }),
+
+    'seo': Pipeline('seo', [
+        Step('quality', _quality_gate, deps=['upload'], kind='cpu'),
+        Step('alt_text', _alt_text, deps=['upload', 'quality'], kind='cpu'),
+        Step('context', lambda alt_text: _require(generate_context(alt_text))['context'], deps=['alt_text']),
+        Step('seo_content', generate_seo_content, deps=['context', 'alt_text']),
+        Step('social_content', generate_social_variations, deps=['context', 'alt_text']),
+    ], output=lambda r: {**r['seo_content'], **r['social_content']}),
+
+    # Same graph as 'seo', but Gemini text is streamed to the 'emit' input as it arrives
+    'seo_stream': Pipeline('seo_stream', [
+        Step('quality', _quality_gate, deps=['upload'], kind='cpu'),
+        Step('alt_text', _alt_text, deps=['upload', 'quality'], kind='cpu'),
+        Step('context', lambda alt_text: _require(generate_context(alt_text))['context'], deps=['alt_text']),
+        Step('seo_content', _streamed(generate_seo_content, 'seo_content'), deps=['context', 'alt_text', 'emit']),
+        Step('social_content', _streamed(generate_social_variations, 'social_content'),
+             deps=['context', 'alt_text', 'emit']),
+    ], output=lambda r: {**r['seo_content'], **r['social_content']}),
+
+    'general': Pipeline('general', [
+        Step('quality', _quality_gate, deps=['upload'], kind='cpu'),
+        Step('analysis', lambda upload, quality: image_processor.generate_alt_text_general(upload_context(upload)),
+             deps=['upload', 'quality'], kind='cpu'),
+    ], output=lambda r: {
+        # Formatted to match frontend expectations
+        'description': r['analysis'].get('description', 'No description available'),
+        'objects': [obj['name'] for obj in r['analysis'].get('objects', []) if isinstance(obj, dict) and 'name' in obj],
+        'colors': r['analysis'].get('dominant_colors', [])
+    }),
+
+    'image_analyzer': Pipeline('image_analyzer', [
+        Step('quality', _quality_gate, deps=['upload'], kind='cpu'),
+        Step('alt_text', _alt_text, deps=['upload', 'quality'], kind='cpu'),
+        Step('context', lambda alt_text: _require(enhance_context(alt_text))['enhanced_context'], deps=['alt_text']),
+    ], output=lambda r: {
+        'alt_text': r['alt_text'],
+        'context': r['context']
+    }),
+
+    'social_media_analyze': Pipeline('social_media_analyze', [
+        Step('quality', _quality_gate, deps=['upload'], kind='cpu'),
+        Step('processor', _load_advanced_processor, deps=['upload', 'quality'], kind='cpu'),
+        Step('alt_text', lambda processor: processor.generate_image_context(), deps=['processor']),
+        Step('enhanced_alt_text', _enhanced_alt_text, deps=['alt_text']),
+        Step('caption', lambda processor, enhanced_alt_text: processor.generate_enhanced_text(enhanced_alt_text),
+             deps=['processor', 'enhanced_alt_text']),
+        Step('hashtags', _hashtag_response, deps=['caption']),
+    ], output=lambda r: {
+        'alt_text': r['enhanced_alt_text'],
+        'caption': r['caption'],
+        'hashtags': r['hashtags']
+    }),
+
+    'advanced': Pipeline('advanced', [
+        Step('quality', _quality_gate, deps=['upload'], kind='cpu'),
+        Step('processor', _load_advanced_processor, deps=['upload', 'quality'], kind='cpu'),
+        Step('alt_text', _alt_text, deps=['upload', 'quality'], kind='cpu'),
+        Step('context', lambda alt_text: _require(generate_context(alt_text))['context'], deps=['alt_text']),
+        Step('enhanced_text', lambda processor, context: processor.generate_enhanced_text(context),
+             deps=['processor', 'context']),
+        # Colour analysis only needs the pixels, so it overlaps with the Gemini calls
+        Step('colors', lambda processor: processor.analyze_colors(), deps=['processor'], kind='cpu'),
+        Step('sentiment', _sentiment, deps=['processor', 'enhanced_text']),
+    ], output=_advanced_output),
+}
+
+def run_pipeline(name, **inputs):
+    """
+    Run a named route pipeline
+    Args:
+        name (str): Key in PIPELINES
+        **inputs: Pipeline inputs, normally upload=UploadedImage
+    Returns:
+        PipelineResult: Step results, timings and the route's data payload
+    """
+    if name not in PIPELINES:
+        raise ValueError(f"Unknown pipeline '{name}'")
+    return PIPELINES[name].run(**inputs)
+
+async def arun_pipeline(name, **inputs):
+    """
+    Run a named route pipeline from an event loop (see Pipeline.arun)
+    Args:
+        name (str): Key in PIPELINES
+        **inputs: Pipeline inputs, normally upload=UploadedImage
+    Returns:
+        PipelineResult: Step results, timings and the route's data payload
+    """
+    if name not in PIPELINES:
+        raise ValueError(f"Unknown pipeline '{name}'")
+    return await PIPELINES[name].arun(**inputs)
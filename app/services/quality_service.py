@@ -0,0 +1,206 @@
+"""
+Fast image quality metrics.
+
+All metrics come from one downsampled copy of the image (the 'quality' cap
+in STAGE_MAX_RESOLUTION) in a single vectorized NumPy pass, so a check takes
+a few milliseconds and can decide whether BLIP and Gemini calls are worth
+making before any of them run.
+
+Metrics:
+    brightness / contrast: mean and standard deviation of luma
+    blur:            variance of the 4-neighbour Laplacian (low = blurry)
+    noise:           Immerkaer's fast noise sigma estimate
+    clipped_*:       share of pixels crushed to black or blown to white
+    colorfulness:    Hasler and Suesstrunk's colourfulness
+    aspect_ratio:    long edge over short edge of the uploaded image
+"""
+import math
+import time
+import logging
+
+import numpy as np
+from PIL import Image
+
+from app.services.image_context import ImageContext
+from config.config import (
+    STAGE_MAX_RESOLUTION,
+    QUALITY_BLUR_THRESHOLD,
+    QUALITY_NOISE_THRESHOLD,
+    QUALITY_CLIP_FRACTION,
+    QUALITY_MAX_ASPECT_RATIO,
+    QUALITY_GATE_ENABLED,
+    QUALITY_GATE_ISSUES,
+)
+
+logger = logging.getLogger(__name__)
+
+MIN_RESOLUTION = 200 * 200
+
+# Issue code -> message shown to users
+QUALITY_ISSUES = {
+    'too_dark': 'Image too dark',
+    'too_bright': 'Image too bright',
+    'low_contrast': 'Low contrast',
+    'low_resolution': 'Resolution too low',
+    'blurry': 'Image is blurry',
+    'noisy': 'Image is noisy',
+    'clipped_shadows': 'Shadows are clipped',
+    'clipped_highlights': 'Highlights are clipped',
+    'extreme_aspect_ratio': 'Extreme aspect ratio',
+}
+
+
+class QualityGateError(ValueError):
+    """Raised when the quality gate rejects an image before model calls"""
+
+    def __init__(self, quality):
+        self.quality = quality
+        issues = [QUALITY_ISSUES[code] for code in quality['codes'] if code in QUALITY_GATE_ISSUES]
+        super().__init__(f"Image rejected by quality check: {', '.join(issues)}")
+
+    def response_body(self, style='code'):
+        """
+        JSON body for a rejected request, in the error shape of the route that ran the gate
+        Args:
+            style (str): 'code' for {success, error, code}, 'error_code' for
+                {success, error, error_code}, 'success' for {success, error}
+                or 'plain' for {error}
+        Returns:
+            dict: Error body, always including the quality report
+        """
+        if style == 'plain':
+            body = {'error': str(self)}
+        else:
+            body = {'success': False, 'error': str(self)}
+            if style in ('code', 'error_code'):
+                body[style] = 'QUALITY_GATE'
+        body['quality'] = self.quality
+        return body
+
+
+def compute_metrics(pixels, resolution):
+    """
+    Compute quality metrics from an RGB array
+    Args:
+        pixels (np.ndarray): HxWx3 uint8 RGB array, normally a downsampled copy
+        resolution (tuple): (width, height) of the uploaded image
+    Returns:
+        dict: Metric values as plain floats
+    """
+    rgb = pixels.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    luma = 0.299 * r + 0.587 * g + 0.114 * b
+
+    # 4-neighbour Laplacian on the interior pixels
+    laplacian = (luma[:-2, 1:-1] + luma[2:, 1:-1] + luma[1:-1, :-2] + luma[1:-1, 2:]
+                 - 4 * luma[1:-1, 1:-1])
+
+    # Immerkaer: convolve with [[1,-2,1],[-2,4,-2],[1,-2,1]], which cancels image structure
+    height, width = luma.shape
+    if height > 2 and width > 2:
+        residual = (luma[:-2, :-2] - 2 * luma[:-2, 1:-1] + luma[:-2, 2:]
+                    - 2 * luma[1:-1, :-2] + 4 * luma[1:-1, 1:-1] - 2 * luma[1:-1, 2:]
+                    + luma[2:, :-2] - 2 * luma[2:, 1:-1] + luma[2:, 2:])
+        noise = math.sqrt(math.pi / 2) * np.abs(residual).sum() / (6 * (width - 2) * (height - 2))
+        blur = laplacian.var()
+    else:
+        noise = blur = 0.0
+
+    rg = r - g
+    yb = 0.5 * (r + g) - b
+    colorfulness = (math.sqrt(rg.var() + yb.var())
+                    + 0.3 * math.sqrt(rg.mean() ** 2 + yb.mean() ** 2))
+
+    long_side, short_side = max(resolution), max(1, min(resolution))
+    return {
+        'brightness': float(luma.mean()),
+        'contrast': float(luma.std()),
+        'blur': float(blur),
+        'noise': float(noise),
+        'clipped_shadows': float((luma <= 2).mean()),
+        'clipped_highlights': float((luma >= 253).mean()),
+        'colorfulness': float(colorfulness),
+        'aspect_ratio': round(long_side / short_side, 3),
+        'resolution': tuple(resolution),
+    }
+
+def find_issues(metrics):
+    """Return the issue codes for a set of metrics"""
+    codes = []
+    if metrics['brightness'] < 30:
+        codes.append('too_dark')
+    elif metrics['brightness'] > 225:
+        codes.append('too_bright')
+    if metrics['contrast'] < 20:
+        codes.append('low_contrast')
+    width, height = metrics['resolution']
+    if width * height < MIN_RESOLUTION:
+        codes.append('low_resolution')
+    # Flat images have no edges either, so only call them blurry when they have contrast
+    if metrics['blur'] < QUALITY_BLUR_THRESHOLD and 'low_contrast' not in codes:
+        codes.append('blurry')
+    if metrics['noise'] > QUALITY_NOISE_THRESHOLD:
+        codes.append('noisy')
+    if metrics['clipped_shadows'] > QUALITY_CLIP_FRACTION:
+        codes.append('clipped_shadows')
+    if metrics['clipped_highlights'] > QUALITY_CLIP_FRACTION:
+        codes.append('clipped_highlights')
+    if metrics['aspect_ratio'] > QUALITY_MAX_ASPECT_RATIO:
+        codes.append('extreme_aspect_ratio')
+    return codes
+
+def _quality_pixels(image, max_side):
+    """Downsampled RGB pixels of the original (unenhanced) image"""
+    if isinstance(image, ImageContext):
+        return np.asarray(image.thumbnail(max_side, processed=False) if max_side else image.image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if max_side and max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+    return np.asarray(image)
+
+def assess_quality(image, max_side=None):
+    """
+    Measure image quality
+    Args:
+        image (PIL.Image or ImageContext): Input image; a context caches the result
+        max_side (int, optional): Longest edge analysed, defaults to the 'quality' cap
+    Returns:
+        dict: Metrics plus 'codes' (issue codes), 'issues' (messages),
+            'is_valid' and 'elapsed_ms'
+    """
+    max_side = max_side or STAGE_MAX_RESOLUTION.get('quality')
+
+    def build(_=None):
+        start = time.perf_counter()
+        resolution = image.size
+        metrics = compute_metrics(_quality_pixels(image, max_side), resolution)
+        codes = find_issues(metrics)
+        metrics.update({
+            'codes': codes,
+            'issues': [QUALITY_ISSUES[code] for code in codes],
+            'is_valid': not codes,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+        })
+        return metrics
+
+    if isinstance(image, ImageContext):
+        return image.stats(('quality', max_side), build)
+    return build()
+
+def check_quality_gate(image):
+    """
+    Assess an image and reject it if the gate is enabled and it has a blocking issue
+    Args:
+        image (PIL.Image or ImageContext): Input image
+    Returns:
+        dict: Quality metrics from assess_quality
+    Raises:
+        QualityGateError: If QUALITY_GATE_ENABLED and any QUALITY_GATE_ISSUES were found
+    """
+    quality = assess_quality(image)
+    if QUALITY_GATE_ENABLED and any(code in QUALITY_GATE_ISSUES for code in quality['codes']):
+        logger.info(f"Quality gate rejected image: {quality['codes']}")
+        raise QualityGateError(quality)
+    return quality
@@ -1,31 +1,23 @@
-from config.ai_config import get_gemini_client, format_success_response, format_error_response, GEMINI_CONFIG
+from config.ai_config import format_success_response, format_error_response
+from app.services.llm_service import generate_text, stream_text
+from app.utils.tracing import traced
+from app.utils.pipeline_utils import Pipeline, Step
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def generate_seo_description(context, alt_text=None):
-    """
-    Generate SEO-optimized content from image context
-    Args:
-        context (str): Image context to generate SEO content from
-        alt_text (str, optional): Additional alt text for context
-    Returns:
-        dict: Response containing generated SEO content
-    """
-    try:
-        genai = get_gemini_client()
-        model = genai.GenerativeModel(GEMINI_CONFIG['text_model'])
-        
-        base_prompt = f"""Generate SEO-optimized content for this image:
+def build_seo_prompt(context, alt_text=None):
+    """Build the prompt for the main SEO content call"""
+    base_prompt = f"""Generate SEO-optimized content for this image:
 
 Context: {context}
 """
-        if alt_text:
-            base_prompt += f"\nAdditional Description: {alt_text}"
-            
-        base_prompt += """
+    if alt_text:
+        base_prompt += f"\nAdditional Description: {alt_text}"
+        
+    base_prompt += """
 
 Please provide:
 1. A compelling meta title (50-60 characters)
@@ -35,17 +27,22 @@ Please provide:
 5. A detailed product description (200-300 words)
 
 Format the response in clear sections."""
+    return base_prompt
 
-        response = model.generate_content(base_prompt)
-        content = response.text.strip()
-        
-        # Parse the sections
-        sections = parse_seo_content(content)
-        
-        # Generate social media variations
-        social_prompt = f"""Generate social media variations for this content:
+def build_social_prompt(context, alt_text=None):
+    """
+    Build the prompt for social media variations.
+    It is based on the image context rather than the SEO output, so both
+    calls can run at the same time.
+    """
+    social_prompt = f"""Generate social media variations for this image:
 
-Original Content: {content}
+Image Context: {context}
+"""
+    if alt_text:
+        social_prompt += f"\nAdditional Description: {alt_text}"
+
+    social_prompt += """
 
 Provide:
 1. Three Instagram captions (each under 200 characters)
@@ -54,12 +51,72 @@ Provide:
 4. Five relevant hashtags
 
 Format each variation clearly."""
+    return social_prompt
+
+def _generate(prompt, on_text=None):
+    """
+    Run a text prompt, streaming chunks to on_text when given
+    Both paths share the prompt memo: a memoized response reaches on_text as
+    a single chunk, and a completed stream is memoized for either path.
+    """
+    if on_text is None:
+        return generate_text(prompt)
+
+    chunks = []
+    for chunk in stream_text(prompt):
+        chunks.append(chunk)
+        on_text(chunk)
+    return ''.join(chunks)
 
-        social_response = model.generate_content(social_prompt)
-        social_content = social_response.text.strip()
+@traced('seo_content')
+def generate_seo_content(context, alt_text=None, on_text=None):
+    """
+    Generate meta title, description, alternative titles, keywords and product description
+    Args:
+        context (str): Image context to generate SEO content from
+        alt_text (str, optional): Additional alt text for context
+        on_text (callable, optional): Receives response text chunks as they stream in
+    Returns:
+        dict: Parsed SEO sections
+    """
+    text = _generate(build_seo_prompt(context, alt_text), on_text)
+    return parse_seo_content(text.strip())
+
+@traced('social_variations')
+def generate_social_variations(context, alt_text=None, on_text=None):
+    """
+    Generate Instagram, Twitter/X and Facebook variations plus hashtags
+    Args:
+        context (str): Image context to generate social content from
+        alt_text (str, optional): Additional alt text for context
+        on_text (callable, optional): Receives response text chunks as they stream in
+    Returns:
+        dict: Parsed social media sections
+    """
+    text = _generate(build_social_prompt(context, alt_text), on_text)
+    return parse_social_content(text.strip())
+
+@traced('seo_description')
+def generate_seo_description(context, alt_text=None):
+    """
+    Generate SEO-optimized content from image context
+    Args:
+        context (str): Image context to generate SEO content from
+        alt_text (str, optional): Additional alt text for context
+    Returns:
+        dict: Response containing generated SEO content
+    """
+    try:
+        # The SEO and social media calls are independent, so run them concurrently
+        pipeline = Pipeline('seo_description', [
+            Step('seo', generate_seo_content, deps=['context', 'alt_text']),
+            Step('social', generate_social_variations, deps=['context', 'alt_text']),
+        ])
+        results = pipeline.run(context=context, alt_text=alt_text).results
         
         # Combine results
-        sections.update(parse_social_content(social_content))
+        sections = results['seo']
+        sections.update(results['social'])
         
         return format_success_response(sections)
         
@@ -0,0 +1,97 @@
+"""
+Progressive responses for multi-stage pipelines.
+
+The pipeline runs on the shared pipeline executor and pushes events onto a
+queue as each stage finishes (and as Gemini text streams in), while the
+route drains the queue and writes each event to the client straight away.
+"""
+import contextvars
+import json
+import queue
+import logging
+
+from app.utils.pipeline_utils import get_executor
+from app.services.cache_service import lookup_result, store_result, cache_meta, track_degraded
+from app.services.pipeline_service import run_pipeline
+
+logger = logging.getLogger(__name__)
+
+STREAM_FORMATS = ('ndjson', 'sse')
+
+_DONE = object()
+
+def _json_safe(value):
+    """Drop values that cannot be sent to the client (such as the upload)"""
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return None
+
+def stream_pipeline(name, upload, cache_as=None, hidden=('upload', 'emit')):
+    """
+    Start a pipeline and return an iterator over its progress events
+    Events are dicts with an 'event' key:
+        stage: {'stage', 'data'} when a step finishes
+        delta: {'stage', 'text'} for each streamed chunk of Gemini text
+        done:  {'data', 'meta'} with the same payload as the non-streaming route
+        error: {'error'} if the pipeline failed
+    Args:
+        name (str): Key in PIPELINES; the pipeline receives upload and emit inputs
+        upload (UploadedImage): Decoded upload, closed once the pipeline finishes
+        cache_as (str, optional): Result cache namespace, defaults to name
+        hidden (tuple): Step or input names never sent as stage events
+    Returns:
+        iterator: Events (dicts) in the order they happened
+    """
+    cache_as = cache_as or name
+    key, cached = lookup_result(cache_as, upload.digest)
+    if cached is not None:
+        upload.close()
+        return iter([{'event': 'done', 'data': cached, 'meta': cache_meta(key, True)}])
+
+    events = queue.Queue()
+
+    def on_step(stage, result):
+        if stage not in hidden:
+            events.put({'event': 'stage', 'stage': stage, 'data': _json_safe(result)})
+
+    def work():
+        try:
+            with track_degraded() as degraded:
+                result = run_pipeline(name, upload=upload, emit=events.put, on_step=on_step).output
+            store_result(key, result, degraded=degraded)
+            events.put({'event': 'done', 'data': result, 'meta': cache_meta(key, False)})
+        except Exception as e:
+            logger.error(f"Error streaming pipeline '{name}': {str(e)}")
+            events.put({'event': 'error', 'error': str(e)})
+        finally:
+            # The pipeline owns the upload, so a client disconnect cannot close it mid-run
+            upload.close()
+            events.put(_DONE)
+
+    # Started here rather than on first iteration, so the worker gets the request's
+    # context (its trace and profile) while the request is still being handled
+    get_executor().submit(contextvars.copy_context().run, work)
+    return _drain(events)
+
+def _drain(events):
+    while True:
+        event = events.get()
+        if event is _DONE:
+            return
+        yield event
+
+def format_event(event, stream_format='ndjson'):
+    """
+    Serialise an event for the wire
+    Args:
+        event (dict): Event from stream_pipeline
+        stream_format (str): 'ndjson' (one JSON object per line) or 'sse'
+    Returns:
+        str: Encoded event
+    """
+    payload = json.dumps(event)
+    if stream_format == 'sse':
+        return f"event: {event['event']}\ndata: {payload}\n\n"
+    return payload + '\n'
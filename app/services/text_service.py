@@ -1,18 +1,23 @@
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from config.gemini_config import get_gemini_client, format_success_response, format_error_response, GEMINI_CONFIG
+from config.ai_config import format_success_response, format_error_response, GEMINI_CONFIG
 import logging
 import re
 from itertools import groupby
 from app.services.image_service import image_processor
+from app.services.llm_service import generate_text
+from app.services.gemini_client import get_model
+from app.utils.tracing import traced
 import PIL.Image
 
 logger = logging.getLogger(__name__)
 
-def generate_context(alt_text):
+@traced('generate_context')
+def generate_context(alt_text, use_cache=True):
     """
     Generates context from alt text using Gemini.
     Args:
         alt_text (str): Alt text to generate context from
+        use_cache (bool): Reuse a memoized response for an identical prompt
     Returns:
         dict: Response containing generated context
     """
@@ -20,9 +25,6 @@ def generate_context(alt_text):
         # Clean the alt text first
         cleaned_alt_text = clean_text(alt_text)
         
-        genai = get_gemini_client()
-        model = genai.GenerativeModel(GEMINI_CONFIG['text_model'])
-        
         prompt = f"""
         Generate a clear and concise description for this image.
         Avoid any repetition or redundant phrases.
@@ -30,26 +32,24 @@ def generate_context(alt_text):
         Original description: {cleaned_alt_text}
         """
 
-        response = model.generate_content(prompt)
-        context = response.text.strip()
+        context = generate_text(prompt, use_cache=use_cache).strip()
         return format_success_response({'context': context})
 
     except Exception as e:
         logger.error(f"Error generating context: {str(e)}")
         return format_error_response(str(e), 'CONTEXT_GENERATION_ERROR')
 
-def enhance_context(context):
+@traced('enhance_context')
+def enhance_context(context, use_cache=True):
     """
     Enhances the context with additional details using Gemini.
     Args:
         context (str): Original context to enhance
+        use_cache (bool): Reuse a memoized response for an identical prompt
     Returns:
         dict: Response containing enhanced context
     """
     try:
-        genai = get_gemini_client()
-        model = genai.GenerativeModel(GEMINI_CONFIG['text_model'])
-        
         prompt = f"""Enhance this context with more descriptive details while maintaining accuracy:
 
 Original: {context}
@@ -60,8 +60,7 @@ Requirements:
 3. Maintain factual accuracy
 4. Keep the enhanced version under 100 words"""
 
-        response = model.generate_content(prompt)
-        enhanced = response.text.strip()
+        enhanced = generate_text(prompt, use_cache=use_cache).strip()
         return format_success_response({'enhanced_context': enhanced})
     except Exception as e:
         return format_error_response(
@@ -90,12 +89,10 @@ def clean_text(text, remove_duplicates=True, remove_repetitive_chars=True):
     
     return cleaned_text
 
-def social_media_caption(context):
+@traced('social_media_caption')
+def social_media_caption(context, use_cache=True):
     """Generate engaging social media caption using Gemini"""
     try:
-        genai = get_gemini_client()
-        model = genai.GenerativeModel(GEMINI_CONFIG['text_model'])
-        
         prompt = f"""
         Create an engaging social media caption for this image.
         Make it conversational, include relevant emojis, and keep it under 200 characters.
@@ -104,8 +101,7 @@ def social_media_caption(context):
         Image context: {context}
         """
 
-        response = model.generate_content(prompt)
-        caption = response.text.strip()
+        caption = generate_text(prompt, use_cache=use_cache).strip()
         # Clean any potential repetitions
         caption = clean_text(caption)
         return format_success_response({'caption': caption})
@@ -114,6 +110,7 @@ def social_media_caption(context):
         logger.error(f"Error generating caption: {str(e)}")
         return format_error_response(str(e), 'CAPTION_GENERATION_ERROR')
 
+@traced('sentiment')
 def analyze_sentiment(text):
     """
     Analyzes sentiment of text using VADER.
@@ -170,6 +167,7 @@ def analyze_sentiment(text):
             error_code="SENTIMENT_ANALYSIS_ERROR"
         )
 
+@traced('medical_analysis')
 def analyze_medical_image(image_path, alt_text):
     """
     Analyzes medical image and generates detailed report using Gemini.
@@ -187,8 +185,7 @@ def analyze_medical_image(image_path, alt_text):
         base_description = image_processor.generate_alt_text(image_path)
         print(f"Base description: {base_description}") # Debug log
         
-        genai = get_gemini_client()
-        model = genai.GenerativeModel(GEMINI_CONFIG['vision_model'])
+        model = get_model(GEMINI_CONFIG['vision_model'])
         
         # Load the image
         image = PIL.Image.open(image_path)
@@ -242,12 +239,10 @@ Use precise medical terminology and maintain professional objectivity."""
         logger.error(f"Error analyzing medical image: {str(e)}")
         return format_error_response(str(e), 'MEDICAL_ANALYSIS_ERROR')
 
-def generate_hashtags(text):
+@traced('hashtags')
+def generate_hashtags(text, use_cache=True):
     """Generate relevant hashtags from the text"""
     try:
-        genai = get_gemini_client()
-        model = genai.GenerativeModel(GEMINI_CONFIG['text_model'])
-        
         prompt = f"""
         Generate 8-10 relevant, trending hashtags for this social media post.
         Make them specific, engaging, and properly formatted with # symbol.
@@ -259,9 +254,8 @@ def generate_hashtags(text):
         #Photography #Nature #Wildlife #Beautiful
         """
 
-        response = model.generate_content(prompt)
         # Extract hashtags from response
-        hashtags_text = response.text.strip()
+        hashtags_text = generate_text(prompt, use_cache=use_cache).strip()
         # Split by spaces and filter valid hashtags
         hashtags = [tag.strip() for tag in hashtags_text.split() if tag.strip().startswith('#')]
         
@@ -276,7 +270,8 @@ def generate_hashtags(text):
         logger.error(f"Error generating hashtags: {str(e)}")
         return format_error_response(str(e), 'HASHTAG_GENERATION_ERROR')
 
-def enhance_alt_text(alt_text, min_words=6):
+@traced('enhance_alt_text')
+def enhance_alt_text(alt_text, min_words=6, use_cache=True):
     """
     Ensures alt text is at least the minimum number of words.
     If it's shorter, enhances it using Gemini.
@@ -284,6 +279,7 @@ def enhance_alt_text(alt_text, min_words=6):
     Args:
         alt_text (str): Original alt text
         min_words (int): Minimum number of words required
+        use_cache (bool): Reuse a memoized response for an identical prompt
         
     Returns:
         dict: Response containing enhanced alt text
@@ -297,9 +293,6 @@ def enhance_alt_text(alt_text, min_words=6):
             return format_success_response({'enhanced_alt_text': alt_text})
         
         # Otherwise, enhance it using Gemini
-        genai = get_gemini_client()
-        model = genai.GenerativeModel(GEMINI_CONFIG['text_model'])
-        
         prompt = f"""
         Enhance this image description to be more detailed and descriptive.
         The current description is too short: "{alt_text}"
@@ -309,8 +302,7 @@ def enhance_alt_text(alt_text, min_words=6):
         Keep it factual and objective.
         """
         
-        response = model.generate_content(prompt)
-        enhanced_text = response.text.strip()
+        enhanced_text = generate_text(prompt, use_cache=use_cache).strip()
         
         # Ensure the enhanced text is actually longer
         if len(enhanced_text.split()) < min_words:
@@ -0,0 +1,98 @@
+import threading
+import queue
+import time
+import logging
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads for a short window and hands
+    them to a batch function in a single call.
+
+    Each caller receives a Future that is resolved with the result for its
+    own item once the batch containing it has been processed.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, window_ms=10, name='micro-batcher'):
+        """
+        Args:
+            batch_fn (callable): Function taking a list of items and returning
+                a list of results of the same length and order
+            max_batch_size (int): Maximum number of items processed per call
+            window_ms (float): How long to wait for more items after the
+                first one arrives, in milliseconds
+            name (str): Name used for the worker thread and in log messages
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_worker(self):
+        """Start the worker thread on first use"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        """
+        Queue a single item for batched processing
+        Args:
+            item: Input passed to batch_fn as part of a list
+        Returns:
+            concurrent.futures.Future: Resolved with the result for this item
+        """
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future))
+        return future
+
+    def qsize(self):
+        """Number of items waiting to be batched"""
+        return self._queue.qsize()
+
+    def _collect(self):
+        """Block for the first item, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Skip items whose callers have already given up
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise ValueError(
+                        f"{self.name} returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                logger.error(f"Error in {self.name} batch of {len(items)}: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -1,5 +1,13 @@
 import imghdr
-from config.config import ALLOWED_EXTENSIONS
+import hashlib
+import tempfile
+import threading
+from PIL import Image
+from config.config import ALLOWED_EXTENSIONS, UPLOAD_FOLDER, UPLOAD_SPILL_THRESHOLD, STAGE_MAX_RESOLUTION
+from app.utils.metrics import DECODE_LATENCY
+from app.utils.tracing import span, traced
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
 
 def allowed_file(filename, allowed_extensions=None):
     """
@@ -66,4 +74,133 @@ def validate_image(input_data):
         import logging
         logger = logging.getLogger(__name__)
         logger.error(f"Error validating image: {str(e)}")
-        return False 
\ No newline at end of file
+        return False
+
+def open_image(fp, max_side=None):
+    """
+    Decode an image, downscaling it while decoding when it exceeds max_side.
+    JPEGs are decoded directly at 1/2, 1/4 or 1/8 scale with draft(), so the
+    full-resolution bitmap is never materialised; other formats are shrunk
+    by an integer factor with reduce() before the final resize.
+    Args:
+        fp: Path or file-like object
+        max_side (int, optional): Longest edge of the decoded image, 0/None for no cap
+    Returns:
+        tuple: (decoded PIL.Image, original (width, height))
+    """
+    image = Image.open(fp)
+    original_size = image.size
+    image_format = image.format
+    width, height = original_size
+    if not max_side or max(width, height) <= max_side:
+        image.load()
+        return image, original_size
+
+    if image_format == 'JPEG':
+        # draft() picks the largest DCT scale that stays at or above the requested size
+        ratio = max_side / max(width, height)
+        image.draft('RGB', (max(1, int(width * ratio)), max(1, int(height * ratio))))
+    image.load()
+
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    factor = max(image.size) // max_side
+    if factor >= 2:
+        image = image.reduce(factor)
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.Resampling.BICUBIC, reducing_gap=None)
+    image.format = image_format
+    return image, original_size
+
+class UploadedImage:
+    """
+    An upload held in memory (or a spooled temp file above the spill
+    threshold) and decoded once, so every analysis stage shares the same
+    decoded PIL image instead of re-reading a file from disk.
+    Images larger than the 'decode' cap in STAGE_MAX_RESOLUTION are
+    downscaled while decoding; original_size keeps the uploaded dimensions.
+    """
+
+    def __init__(self, buffer, filename, digest, size):
+        self.buffer = buffer
+        self.filename = filename
+        self.digest = digest
+        self.size = size
+        self._image = None
+        self._original_size = None
+        self._rgb = None
+        self._lock = threading.Lock()
+        # Shared ImageContext, set by app.services.image_context.upload_context
+        self.context = None
+
+    def read(self, size=-1):
+        return self.buffer.read(size)
+
+    def seek(self, offset, whence=0):
+        return self.buffer.seek(offset, whence)
+
+    def getvalue(self):
+        """Return the raw upload bytes"""
+        self.buffer.seek(0)
+        data = self.buffer.read()
+        self.buffer.seek(0)
+        return data
+
+    @property
+    def image(self):
+        """Decoded PIL image in its original mode, capped at the decode resolution"""
+        if self._image is None:
+            with self._lock:
+                if self._image is None:
+                    self.buffer.seek(0)
+                    # Decoded eagerly so concurrent stages never race on lazy loading
+                    with DECODE_LATENCY.time(), span('decode'):
+                        image, self._original_size = open_image(self.buffer, STAGE_MAX_RESOLUTION.get('decode'))
+                    self._image = image
+        return self._image
+
+    @property
+    def original_size(self):
+        """(width, height) of the uploaded image before any downscaling"""
+        if self._original_size is None:
+            self.image
+        return self._original_size
+
+    @property
+    def rgb(self):
+        """Decoded image converted to RGB once"""
+        if self._rgb is None:
+            image = self.image
+            with self._lock:
+                if self._rgb is None:
+                    self._rgb = image if image.mode == 'RGB' else image.convert('RGB')
+        return self._rgb
+
+    def close(self):
+        self.buffer.close()
+
+
+@traced('save')
+def read_upload(stream, filename, spill_threshold=None):
+    """
+    Read an uploaded file into memory, hashing it on the way.
+    Args:
+        stream: File-like object positioned anywhere (it is rewound)
+        filename (str): Original filename
+        spill_threshold (int): Bytes kept in memory before spilling to a temp file
+    Returns:
+        UploadedImage: Buffered upload with a sha256 digest
+    """
+    if spill_threshold is None:
+        spill_threshold = UPLOAD_SPILL_THRESHOLD
+
+    buffer = tempfile.SpooledTemporaryFile(max_size=spill_threshold, dir=UPLOAD_FOLDER)
+    digest = hashlib.sha256()
+    size = 0
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b''):
+        digest.update(chunk)
+        buffer.write(chunk)
+        size += len(chunk)
+    buffer.seek(0)
+    return UploadedImage(buffer, filename, digest.hexdigest(), size)
@@ -0,0 +1,116 @@
+import contextlib
+import logging
+from config.config import INFERENCE_PROFILES
+
+logger = logging.getLogger(__name__)
+
+def get_profile(name):
+    """
+    Look up an inference profile from config
+    Args:
+        name (str): Key in INFERENCE_PROFILES
+    Returns:
+        dict: Profile settings plus its 'name'
+    """
+    if name not in INFERENCE_PROFILES:
+        raise ValueError(f"Unknown inference profile '{name}'. Use one of: {', '.join(INFERENCE_PROFILES)}")
+    return dict(INFERENCE_PROFILES[name], name=name)
+
+def apply_thread_settings(profile):
+    """Set the intra-op thread count if the profile defines one (process-wide)"""
+    if profile.get('num_threads'):
+        import torch
+        torch.set_num_threads(profile['num_threads'])
+        logger.info(f"torch threads set to {profile['num_threads']} for profile '{profile['name']}'")
+
+def bf16_supported(device):
+    """Check whether bfloat16 kernels are usable on a device"""
+    import torch
+    if device == 'cuda':
+        return torch.cuda.is_bf16_supported()
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+class _TracedEncoder:
+    """
+    Callable stand-in for a traced vision encoder.
+    Accepts the keyword arguments transformers passes and returns the
+    traced tuple, which callers index the same way as the original output.
+    """
+
+    def __init__(self, traced, original):
+        self.traced = traced
+        self.original = original
+
+    def __call__(self, pixel_values=None, **kwargs):
+        if kwargs.get('output_attentions') or kwargs.get('output_hidden_states'):
+            return self.original(pixel_values=pixel_values, **kwargs)
+        return self.traced(pixel_values)
+
+    def __getattr__(self, name):
+        return getattr(self.original, name)
+
+def _trace_vision_encoder(model, image_size):
+    import torch
+
+    encoder = model.vision_model
+    example = torch.zeros(1, 3, image_size, image_size, device=next(model.parameters()).device)
+    with torch.inference_mode():
+        traced = torch.jit.trace(encoder, example, strict=False, check_trace=False)
+    # Bypass nn.Module registration so the traced callable replaces the submodule
+    object.__setattr__(model, 'vision_model', _TracedEncoder(torch.jit.freeze(traced.eval()), encoder))
+    model._modules.pop('vision_model', None)
+
+def optimize_model(model, profile, device, image_size=None):
+    """
+    Apply an inference profile to a loaded model
+    Args:
+        model (torch.nn.Module): Model in eval mode
+        profile (dict): Profile from get_profile
+        device (str): Device the model lives on
+        image_size (int, optional): Encoder input size, needed for 'torchscript'
+    Returns:
+        torch.nn.Module: The optimized model (possibly the same object)
+    """
+    import torch
+
+    if profile['quantize'] == 'dynamic_int8':
+        if device == 'cpu':
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            logger.warning(f"Dynamic int8 quantization is CPU-only; running fp32 on {device}")
+
+    if profile['autocast'] == 'bfloat16' and not bf16_supported(device):
+        logger.warning(f"bfloat16 is not supported on this {device}; running fp32")
+
+    if profile['compile'] == 'torch_compile':
+        if hasattr(model, 'vision_model') and hasattr(model, 'text_decoder'):
+            # BLIP's generate() never calls model.forward: it runs the vision encoder once,
+            # then text_decoder.generate(), which calls the decoder's forward for every token
+            model.vision_model.forward = torch.compile(model.vision_model.forward, dynamic=True)
+            model.text_decoder.forward = torch.compile(model.text_decoder.forward, dynamic=True)
+        else:
+            # Models called as model(**inputs), such as DETR; compiling forward rather
+            # than the module keeps attribute and config access working
+            model.forward = torch.compile(model.forward, dynamic=True)
+    elif profile['compile'] == 'torchscript':
+        if hasattr(model, 'vision_model') and image_size:
+            _trace_vision_encoder(model, image_size)
+        else:
+            logger.warning(f"TorchScript profile not applicable to {type(model).__name__}; running eagerly")
+    return model
+
+def inference_context(profile, device):
+    """
+    Context for a forward pass under a profile: inference mode, plus
+    bfloat16 autocast when the profile asks for it and the device supports it
+    """
+    import torch
+
+    stack = contextlib.ExitStack()
+    stack.enter_context(torch.inference_mode())
+    if profile['autocast'] == 'bfloat16' and bf16_supported(device):
+        stack.enter_context(torch.autocast(device_type=device, dtype=torch.bfloat16))
+    return stack
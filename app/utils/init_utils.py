@@ -1,27 +1,46 @@
 import nltk
 import os
 import logging
+import threading
 import numpy as np
-import torch
+from config.config import INFERENCE_PROFILE
+from app.utils.inference_utils import get_profile, apply_thread_settings
 
 logger = logging.getLogger(__name__)
 
+_torch_lock = threading.Lock()
+_torch_initialized = False
+
 def initialize_ml_dependencies():
     """Initialize machine learning dependencies"""
     try:
         # Initialize NumPy
         np.random.seed(42)
         
-        # Initialize PyTorch
-        if torch.cuda.is_available():
-            torch.cuda.init()
-        torch.manual_seed(42)
-        
+        # PyTorch is initialized on first model load (see initialize_torch)
         logger.info("ML dependencies initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing ML dependencies: {str(e)}")
         raise
 
+def initialize_torch():
+    """Import and seed PyTorch once, the first time a local model is needed"""
+    global _torch_initialized
+    if _torch_initialized:
+        return
+    with _torch_lock:
+        if _torch_initialized:
+            return
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.init()
+        torch.manual_seed(42)
+        # Thread count is process-wide, so it follows the default profile
+        apply_thread_settings(get_profile(INFERENCE_PROFILE))
+        _torch_initialized = True
+        logger.info("PyTorch initialized successfully")
+
 def initialize_nltk():
     """Download required NLTK data if not already present"""
     try:
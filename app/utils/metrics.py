@@ -0,0 +1,301 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms are sharded: each thread is assigned one of
+METRIC_SHARDS shards on first use and only ever takes that shard's lock, so
+request threads do not contend with each other on the hot path. A scrape
+sums the shards. Gauges whose value lives elsewhere (queue depths, cache
+stats, memory) are registered as collectors and only evaluated on scrape.
+
+Every process keeps its own registry; with several web workers each one
+serves its own /metrics.
+"""
+import bisect
+import itertools
+import os
+import sys
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = 'image_analyzer'
+METRIC_SHARDS = 16
+
+# Seconds; covers sub-millisecond CPU steps up to slow Gemini calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_shard_ids = itertools.count()
+_local = threading.local()
+
+def _shard_index():
+    """Shard owned by the calling thread, assigned round-robin on first use"""
+    index = getattr(_local, 'shard', None)
+    if index is None:
+        index = _local.shard = next(_shard_ids) % METRIC_SHARDS
+    return index
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """Base for sharded metrics keyed by a tuple of label values"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = f"{NAMESPACE}_{name}"
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = [(threading.Lock(), {}) for _ in range(METRIC_SHARDS)]
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(value) for value in labels)
+
+    def _merged(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """Yield (suffix, label names, label values, extra label, value) for the exposition"""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter; exported as <name>_total"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(f"{name}_total", documentation, labelnames)
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        lock, values = self._shards[_shard_index()]
+        with lock:
+            values[key] = values.get(key, 0) + amount
+
+    def _merged(self):
+        totals = {}
+        for lock, values in self._shards:
+            with lock:
+                for key, value in values.items():
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def value(self, *labels):
+        return self._merged().get(self._key(labels), 0)
+
+    def samples(self):
+        for key, value in sorted(self._merged().items()):
+            yield '', self.labelnames, key, None, value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, such as requests in flight"""
+
+    kind = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        lock, values = self._shards[_shard_index()]
+        with lock:
+            values[key] = values.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels):
+        """Count the enclosed block as in progress"""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+    _merged = Counter._merged
+
+    def samples(self):
+        for key, value in sorted(self._merged().items()):
+            yield '', self.labelnames, key, None, value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        lock, values = self._shards[_shard_index()]
+        with lock:
+            state = values.get(key)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), then sum and count
+                state = values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        """Observe the duration of the enclosed block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def _merged(self):
+        totals = {}
+        for lock, values in self._shards:
+            with lock:
+                for key, state in values.items():
+                    total = totals.get(key)
+                    if total is None:
+                        totals[key] = list(state)
+                    else:
+                        for index, value in enumerate(state):
+                            total[index] += value
+        return totals
+
+    def samples(self):
+        for key, state in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                yield '_bucket', self.labelnames, key, f'le="{_format_value(float(bound))}"', cumulative
+            yield '_sum', self.labelnames, key, None, state[-2]
+            yield '_count', self.labelnames, key, None, state[-1]
+
+
+class MetricsRegistry:
+    """Holds metrics and scrape-time collectors and renders the exposition"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric '{name}' is already registered with a different type or labels")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def register_collector(self, name, kind, documentation, labelnames, collect):
+        """
+        Register a metric whose values are read on scrape
+        Args:
+            name (str): Metric name without the namespace
+            kind (str): 'gauge' or 'counter' (counters are exported as <name>_total)
+            documentation (str): HELP text
+            labelnames (tuple): Label names
+            collect (callable): Returns a dict of label-value tuple -> number
+        """
+        if kind == 'counter':
+            name = f"{name}_total"
+        with self._lock:
+            self._collectors.append((f"{NAMESPACE}_{name}", kind, documentation, tuple(labelnames), collect))
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text format (version 0.0.4)
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, names, values, extra, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(names, values, extra)} {_format_value(value)}")
+
+        for name, kind, documentation, labelnames, collect in collectors:
+            try:
+                values = collect()
+            except Exception as e:
+                logger.warning(f"Metrics collector {name} failed: {str(e)}")
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _resident_memory():
+    """Current resident set size, falling back to the peak where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return {(): int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')}
+    except (OSError, ValueError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {(): peak if sys.platform == 'darwin' else peak * 1024}
+
+
+# Process-wide registry
+registry = MetricsRegistry()
+registry.register_collector('process_resident_memory_bytes', 'gauge', 'Resident memory of this process', (),
+                            _resident_memory)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Hot-path instruments shared by the services
+HTTP_REQUESTS = registry.counter('http_requests', 'HTTP requests by endpoint and status', ('endpoint', 'method', 'status'))
+HTTP_LATENCY = registry.histogram('http_request_seconds', 'HTTP request latency', ('endpoint',))
+HTTP_IN_FLIGHT = registry.gauge('http_requests_in_flight', 'HTTP requests being served', ('endpoint',))
+VISION_LATENCY = registry.histogram('vision_inference_seconds', 'BLIP generate and DETR forward time per call',
+                                    ('model', 'operation', 'backend'))
+VISION_BATCH_SIZE = registry.histogram('vision_batch_size', 'Images per vision batch', ('model',),
+                                       buckets=(1, 2, 4, 8, 16, 32))
+GEMINI_LATENCY = registry.histogram('gemini_request_seconds', 'Gemini call latency', ('service', 'model'))
+GEMINI_ERRORS = registry.counter('gemini_errors', 'Failed Gemini calls', ('service', 'model'))
+PALETTE_LATENCY = registry.histogram('palette_seconds', 'Colour palette (k-means) extraction time')
+CHART_LATENCY = registry.histogram('chart_render_seconds', 'Matplotlib chart rendering time', ('chart', 'format'))
+DECODE_LATENCY = registry.histogram('upload_decode_seconds', 'Upload decode and downscale time')
+PIPELINE_STEP_LATENCY = registry.histogram('pipeline_step_seconds', 'Pipeline step time', ('pipeline', 'step'))
+PIPELINE_STEP_ERRORS = registry.counter('pipeline_step_errors', 'Pipeline steps that raised', ('pipeline', 'step'))
+RESULT_CACHE_LOOKUPS = registry.counter('result_cache_lookups', 'Result cache lookups by pipeline and outcome',
+                                        ('pipeline', 'outcome'))
@@ -0,0 +1,226 @@
+import asyncio
+import contextvars
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config.config import PIPELINE_MAX_WORKERS, ASYNC_CPU_WORKERS, ASYNC_IO_WORKERS
+from app.utils.metrics import registry as metrics_registry, PIPELINE_STEP_LATENCY, PIPELINE_STEP_ERRORS
+from app.utils.tracing import span
+from app.utils.profiling import attach as profile_attach
+
+logger = logging.getLogger(__name__)
+
+class Step:
+    """
+    A single pipeline stage.
+
+    The step's function is called with the results of its dependencies as
+    keyword arguments, so a step depending on 'context' receives context=...
+    """
+
+    def __init__(self, name, fn, deps=(), kind='llm'):
+        """
+        Args:
+            name (str): Result name other steps can depend on
+            fn (callable): Function computing the result
+            deps (iterable): Names of pipeline inputs or steps this step needs
+            kind (str): 'llm' for network-bound calls, 'cpu' for local model work
+        """
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.kind = kind
+
+    def __repr__(self):
+        return f"Step({self.name!r}, deps={self.deps!r})"
+
+
+class PipelineResult:
+    """Step results plus per-step timings in seconds"""
+
+    def __init__(self, results, timings, output):
+        self.results = results
+        self.timings = timings
+        self.output = output
+
+
+class Pipeline:
+    """
+    A dependency graph of steps.
+
+    Steps whose dependencies are satisfied run concurrently, so end-to-end
+    latency follows the critical path instead of the sum of all steps.
+    """
+
+    def __init__(self, name, steps, output=None):
+        """
+        Args:
+            name (str): Pipeline name used in logs
+            steps (list): Step instances, in any order
+            output (callable, optional): Builds the final result from the dict of step results
+        """
+        self.name = name
+        self.steps = list(steps)
+        self.output = output
+        names = [step.name for step in self.steps]
+        if len(names) != len(set(names)):
+            raise ValueError(f"Duplicate step names in pipeline '{name}'")
+
+    def _run_step(self, step, results, timings):
+        start = time.perf_counter()
+        try:
+            with span(step.name, desc=f"{self.name} step"), profile_attach():
+                return step.fn(**{dep: results[dep] for dep in step.deps})
+        except Exception:
+            PIPELINE_STEP_ERRORS.inc(self.name, step.name)
+            raise
+        finally:
+            timings[step.name] = time.perf_counter() - start
+            PIPELINE_STEP_LATENCY.observe(timings[step.name], self.name, step.name)
+
+    def run(self, executor=None, on_step=None, **inputs):
+        """
+        Execute the pipeline
+        Args:
+            executor (Executor, optional): Pool used for concurrent steps
+            on_step (callable, optional): Called with (step name, result) as each step finishes
+            **inputs: Initial values available to steps as dependencies
+        Returns:
+            PipelineResult: Results, timings and the built output
+        """
+        executor = executor or get_executor()
+        results = dict(inputs)
+        timings = {}
+        pending = list(self.steps)
+        running = {}
+
+        def finish(step, result):
+            results[step.name] = result
+            if on_step is not None:
+                on_step(step.name, result)
+
+        while pending or running:
+            for future in [future for future in running if future.done()]:
+                step = running.pop(future)
+                finish(step, future.result())
+
+            ready = [step for step in pending if all(dep in results for dep in step.deps)]
+            if ready:
+                # Hand all but one ready step to the pool and run the last in this thread
+                for step in ready:
+                    pending.remove(step)
+                for step in ready[:-1]:
+                    # Each submission gets its own copy of the context so request tracing follows the step
+                    context = contextvars.copy_context()
+                    running[executor.submit(context.run, self._run_step, step, results, timings)] = step
+                finish(ready[-1], self._run_step(ready[-1], results, timings))
+                continue
+
+            if not running:
+                if not pending:
+                    break
+                missing = {dep for step in pending for dep in step.deps if dep not in results}
+                raise ValueError(f"Pipeline '{self.name}' cannot resolve dependencies: {sorted(missing)}")
+
+            # If the pool has not started a step yet, run it here instead of waiting;
+            # this also keeps nested pipelines from deadlocking a saturated executor
+            stolen = next((future for future in running if future.cancel()), None)
+            if stolen is not None:
+                step = running.pop(stolen)
+                finish(step, self._run_step(step, results, timings))
+                continue
+
+            wait(running, return_when=FIRST_COMPLETED)
+
+        output = self.output(results) if self.output else results
+        return PipelineResult(results, timings, output)
+
+    async def arun(self, cpu_executor=None, io_executor=None, **inputs):
+        """
+        Execute the pipeline from an event loop
+        
+        'cpu' steps go to a small bounded pool so local model inference cannot
+        oversubscribe the machine; 'llm' steps go to a wide I/O pool so many
+        Gemini round trips can be awaited at once.
+        Args:
+            cpu_executor (Executor, optional): Pool for 'cpu' steps
+            io_executor (Executor, optional): Pool for 'llm' steps
+            **inputs: Initial values available to steps as dependencies
+        Returns:
+            PipelineResult: Results, timings and the built output
+        """
+        loop = asyncio.get_running_loop()
+        cpu_executor = cpu_executor or get_cpu_executor()
+        io_executor = io_executor or get_io_executor()
+        results = dict(inputs)
+        timings = {}
+        pending = list(self.steps)
+        running = {}
+
+        while pending or running:
+            ready = [step for step in pending if all(dep in results for dep in step.deps)]
+            for step in ready:
+                pending.remove(step)
+                executor = cpu_executor if step.kind == 'cpu' else io_executor
+                context = contextvars.copy_context()
+                future = loop.run_in_executor(executor, context.run, self._run_step, step, results, timings)
+                running[future] = step
+
+            if not running:
+                missing = {dep for step in pending for dep in step.deps if dep not in results}
+                raise ValueError(f"Pipeline '{self.name}' cannot resolve dependencies: {sorted(missing)}")
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                results[step.name] = future.result()
+
+        # Output builders may do real work, so keep them off the event loop
+        if self.output:
+            output = await loop.run_in_executor(cpu_executor, contextvars.copy_context().run, self.output, results)
+        else:
+            output = results
+        return PipelineResult(results, timings, output)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Return the process-wide pool used for pipeline steps"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PIPELINE_MAX_WORKERS, thread_name_prefix='pipeline')
+    return _executor
+
+_cpu_executor = None
+_io_executor = None
+
+def get_cpu_executor():
+    """Return the bounded pool used for local model inference in async mode"""
+    global _cpu_executor
+    if _cpu_executor is None:
+        with _executor_lock:
+            if _cpu_executor is None:
+                _cpu_executor = ThreadPoolExecutor(max_workers=ASYNC_CPU_WORKERS, thread_name_prefix='model-cpu')
+    return _cpu_executor
+
+def get_io_executor():
+    """Return the pool used for Gemini calls in async mode"""
+    global _io_executor
+    if _io_executor is None:
+        with _executor_lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(max_workers=ASYNC_IO_WORKERS, thread_name_prefix='llm-io')
+    return _io_executor
+
+def _executor_queue_depths():
+    pools = {'pipeline': _executor, 'model-cpu': _cpu_executor, 'llm-io': _io_executor}
+    # _work_queue holds submitted steps no worker thread has picked up yet
+    return {(name,): pool._work_queue.qsize() for name, pool in pools.items() if pool is not None}
+
+metrics_registry.register_collector('executor_queue_depth', 'gauge', 'Steps waiting for a pipeline worker thread',
+                                    ('executor',), _executor_queue_depths)
@@ -0,0 +1,320 @@
+"""
+On-demand profiling of single requests.
+
+A request sent with `X-Profile: cprofile` or `X-Profile: sample` and an
+`X-Admin-Token` matching PROFILING_ADMIN_TOKEN runs under a profiler:
+
+    cprofile: deterministic; cProfile runs in the request thread and in every
+              pipeline worker thread that runs a step for the request, and
+              the stats are merged into one .pstats file
+    sample:   statistical; a background thread samples the stacks of the
+              request's threads every PROFILE_SAMPLE_INTERVAL_MS and writes
+              a speedscope (https://speedscope.app) JSON file
+
+Threads join a session through attach(), which pipeline steps and the ASGI
+blocking helper call, so parallel steps are profiled together with the
+request. Only one session runs at a time; a second profiling request is
+served unprofiled. Profiles are stored under PROFILE_DIR (the newest
+PROFILE_MAX_FILES are kept) and downloaded from /admin/profiles/<id>.
+"""
+import contextvars
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+
+from config.config import (
+    PROFILING_ADMIN_TOKEN,
+    PROFILE_DIR,
+    PROFILE_SAMPLE_INTERVAL_MS,
+    PROFILE_MAX_FILES,
+)
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sample')
+PROFILE_EXTENSIONS = {'cprofile': '.pstats', 'sample': '.speedscope.json'}
+PROFILE_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_active_session = contextvars.ContextVar('profile_session', default=None)
+_session_lock = threading.Lock()
+
+
+def is_admin(token):
+    """Check an admin token; always False while PROFILING_ADMIN_TOKEN is unset"""
+    if not PROFILING_ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode('utf-8'), PROFILING_ADMIN_TOKEN.encode('utf-8'))
+
+def requested_mode(headers):
+    """
+    Read the profiling request from request headers
+    Args:
+        headers: Mapping with get(), e.g. flask.request.headers
+    Returns:
+        str or None: Profile mode when a valid mode and admin token were sent
+    """
+    mode = (headers.get('X-Profile') or '').strip().lower()
+    if not mode:
+        return None
+    if mode not in PROFILE_MODES:
+        logger.warning(f"Ignoring unknown profile mode '{mode}'")
+        return None
+    if not is_admin(headers.get('X-Admin-Token')):
+        logger.warning("Ignoring profile request without a valid admin token")
+        return None
+    return mode
+
+
+class StackSampler:
+    """Samples the Python stacks of a set of threads at a fixed interval"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.frames = []
+        self._frame_index = {}
+        self.samples = {}  # thread name -> list of (stack, weight ms)
+        self._threads = {}  # ident -> name
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def add_thread(self, thread):
+        self._threads[thread.ident] = thread.name
+
+    def remove_thread(self, ident):
+        self._threads.pop(ident, None)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _frame_id(self, frame):
+        code = frame.f_code
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return index
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight = (now - last) * 1000
+            last = now
+            frames = sys._current_frames()
+            for ident, name in list(self._threads.items()):
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_id(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples.setdefault(name, []).append((stack, weight))
+
+    def speedscope(self, name):
+        """Render the samples as a speedscope file (one sampled profile per thread)"""
+        profiles = []
+        for thread_name, samples in sorted(self.samples.items()):
+            total = sum(weight for _, weight in samples)
+            profiles.append({
+                'type': 'sampled',
+                'name': thread_name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': round(total, 3),
+                'samples': [stack for stack, _ in samples],
+                'weights': [round(weight, 3) for _, weight in samples]
+            })
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'image-analyzer',
+            'shared': {'frames': self.frames},
+            'profiles': profiles
+        }
+
+
+class ProfileSession:
+    """One profiled request"""
+
+    def __init__(self, mode, name):
+        self.mode = mode
+        self.name = name
+        self.profile_id = uuid.uuid4().hex
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.threads = set()
+        self.profilers = []
+        self._lock = threading.Lock()
+        self.sampler = StackSampler(PROFILE_SAMPLE_INTERVAL_MS / 1000) if mode == 'sample' else None
+
+    def join(self):
+        """
+        Add the calling thread to the session
+        Returns:
+            cProfile.Profile or None: Profiler the caller must disable when done ('cprofile' mode)
+        """
+        thread = threading.current_thread()
+        with self._lock:
+            if thread.ident in self.threads:
+                return None
+            self.threads.add(thread.ident)
+        if self.sampler is not None:
+            self.sampler.add_thread(thread)
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # The interpreter may allow only one active profiler (sys.monitoring on 3.12+)
+            logger.debug(f"Thread {thread.name} not profiled: {str(e)}")
+            return None
+        with self._lock:
+            self.profilers.append(profiler)
+        return profiler
+
+    def leave(self, profiler):
+        thread = threading.current_thread()
+        if profiler is not None:
+            profiler.disable()
+        if self.sampler is not None:
+            # Pool threads go on to serve other requests once they leave
+            self.sampler.remove_thread(thread.ident)
+        with self._lock:
+            self.threads.discard(thread.ident)
+
+    def save(self):
+        """
+        Write the profile to PROFILE_DIR
+        Returns:
+            str: Path of the written file, or None when nothing was recorded
+        """
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, self.profile_id + PROFILE_EXTENSIONS[self.mode])
+        if self.mode == 'sample':
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.sampler.speedscope(self.name), f)
+        else:
+            if not self.profilers:
+                return None
+            stats = pstats.Stats(self.profilers[0])
+            for profiler in self.profilers[1:]:
+                stats.add(profiler)
+            stats.dump_stats(path)
+        _prune_profiles()
+        return path
+
+
+def start_profile(mode, name, join=True):
+    """
+    Start profiling the current request
+    Args:
+        mode (str): 'cprofile' or 'sample'
+        name (str): Label stored with the profile, normally the endpoint
+        join (bool): Profile the calling thread too; the ASGI app passes False so the
+            event loop (shared with other requests) is left out and only worker threads are profiled
+    Returns:
+        tuple: (ProfileSession, state) to pass to stop_profile, or (None, None) when
+            another profile is already running
+    """
+    if not _session_lock.acquire(blocking=False):
+        logger.warning(f"Profile of {name} skipped: another request is being profiled")
+        return None, None
+    try:
+        session = ProfileSession(mode, name)
+        token = _active_session.set(session)
+        if session.sampler is not None:
+            session.sampler.start()
+        profiler = session.join() if join else None
+    except Exception:
+        _session_lock.release()
+        raise
+    logger.info(f"Profiling {name} ({mode}, profile {session.profile_id})")
+    return session, (token, profiler)
+
+def stop_profile(session, state):
+    """
+    Stop a session and store its profile
+    Returns:
+        dict: Profile id, mode, duration and stored path (None if nothing was recorded)
+    """
+    token, profiler = state
+    try:
+        session.leave(profiler)
+        if session.sampler is not None:
+            session.sampler.stop()
+        try:
+            _active_session.reset(token)
+        except ValueError:
+            _active_session.set(None)
+        path = session.save()
+    finally:
+        _session_lock.release()
+    duration_ms = round((time.perf_counter() - session.start) * 1000, 1)
+    logger.info(f"Profile {session.profile_id} of {session.name} stored at {path} ({duration_ms} ms)")
+    return {'profile_id': session.profile_id, 'mode': session.mode, 'duration_ms': duration_ms, 'path': path}
+
+@contextmanager
+def attach():
+    """Profile the enclosed block when the current context belongs to a profiled request (no-op otherwise)"""
+    session = _active_session.get()
+    # Threads already in the session (such as the request thread running a step inline) stay as they are
+    if session is None or threading.current_thread().ident in session.threads:
+        yield
+        return
+    profiler = session.join()
+    try:
+        yield
+    finally:
+        session.leave(profiler)
+
+def profile_path(profile_id):
+    """Return the stored file for a profile id, or None"""
+    if not PROFILE_ID_PATTERN.match(profile_id or ''):
+        return None
+    for extension in PROFILE_EXTENSIONS.values():
+        path = os.path.join(PROFILE_DIR, profile_id + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+def list_profiles():
+    """Stored profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for filename in os.listdir(PROFILE_DIR):
+        for mode, extension in PROFILE_EXTENSIONS.items():
+            if filename.endswith(extension) and PROFILE_ID_PATTERN.match(filename[:-len(extension)]):
+                path = os.path.join(PROFILE_DIR, filename)
+                profiles.append({
+                    'profile_id': filename[:-len(extension)],
+                    'mode': mode,
+                    'created': os.path.getmtime(path),
+                    'size': os.path.getsize(path)
+                })
+    return sorted(profiles, key=lambda profile: profile['created'], reverse=True)
+
+def _prune_profiles():
+    for profile in list_profiles()[PROFILE_MAX_FILES:]:
+        path = profile_path(profile['profile_id'])
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove old profile {path}: {str(e)}")
@@ -0,0 +1,206 @@
+"""
+Lightweight per-request stage tracing.
+
+A trace is started for each request (when TRACING_ENABLED is set) and held
+in a context variable; span() and @traced record the stages run on its
+behalf - upload save and decode, preprocessing, BLIP, DETR, colours, every
+Gemini call, pipeline steps and serialization. Pipeline executors copy the
+context into the worker threads they hand steps to, so spans from parallel
+steps land in the same trace.
+
+Outside a trace span() and @traced cost one context variable lookup. A
+finished trace can be rendered as a Server-Timing header, as a list of
+timings for the response body, or appended to a JSON Lines file.
+"""
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+_current_span = contextvars.ContextVar('span', default=None)
+
+
+class Trace:
+    """Spans recorded while serving one request"""
+
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        return next(self._ids)
+
+    def record(self, name, span_id, parent, start, end, attrs=None, error=None):
+        """Add a finished span; start and end are perf_counter() readings"""
+        span = {
+            'id': span_id,
+            'parent': parent,
+            'name': name,
+            'start_ms': round((start - self.start) * 1000, 2),
+            'duration_ms': round((end - start) * 1000, 2),
+            'thread': threading.current_thread().name
+        }
+        if attrs:
+            span['attrs'] = attrs
+        if error:
+            span['error'] = error
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+        return self
+
+    @property
+    def duration_ms(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return round((end - self.start) * 1000, 2)
+
+    def timings(self):
+        """Spans ordered by start time"""
+        with self._lock:
+            return sorted(self.spans, key=lambda span: (span['start_ms'], span['id']))
+
+    def server_timing(self):
+        """
+        Render the spans as a Server-Timing header value
+        Returns:
+            str: e.g. 'decode;dur=12.5, blip;dur=310.2, gemini;dur=820.4;desc="text_service.generate_context", total;dur=1190.8'
+        """
+        seen = {}
+        entries = []
+        for span in self.timings():
+            # Metric names must be unique tokens, so repeated stages are numbered
+            count = seen[span['name']] = seen.get(span['name'], 0) + 1
+            name = span['name'] if count == 1 else f"{span['name']}-{count}"
+            entry = f"{name};dur={span['duration_ms']}"
+            desc = (span.get('attrs') or {}).get('desc')
+            if desc:
+                entry += f';desc="{desc}"'
+            entries.append(entry)
+        entries.append(f"total;dur={self.duration_ms}")
+        return ', '.join(entries)
+
+    def as_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'started_at': self.started_at,
+            'duration_ms': self.duration_ms,
+            'spans': self.timings()
+        }
+
+
+def start_trace(name):
+    """
+    Start a trace in the current context
+    Args:
+        name (str): Trace name, normally the endpoint
+    Returns:
+        tuple: (Trace, token) - pass the token to end_trace
+    """
+    trace = Trace(name)
+    return trace, _current_trace.set(trace)
+
+def end_trace(token):
+    """Finish the current trace and detach it from the context"""
+    trace = _current_trace.get()
+    try:
+        _current_trace.reset(token)
+    except ValueError:
+        # Reset from a different context (e.g. after a streamed response); just clear it
+        _current_trace.set(None)
+    return trace.finish() if trace is not None else None
+
+def current_trace():
+    """Return the active Trace, or None outside a traced request"""
+    return _current_trace.get()
+
+@contextmanager
+def span(name, **attrs):
+    """Record the enclosed block as a span of the current trace (no-op outside a trace)"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    span_id = trace.next_id()
+    parent = _current_span.get()
+    token = _current_span.set(span_id)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.record(name, span_id, parent, start, time.perf_counter(), attrs, error)
+
+def record_span(name, start, end=None, error=None, **attrs):
+    """
+    Record a span timed by the caller, for work that cannot be wrapped in span()
+    (such as a generator that yields to its consumer between start and end)
+    Args:
+        name (str): Span name
+        start (float): time.perf_counter() reading when the work started
+        end (float, optional): Reading when it finished, defaults to now
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(name, trace.next_id(), _current_span.get(), start,
+                     end if end is not None else time.perf_counter(), attrs, error)
+
+def traced(name=None):
+    """
+    Decorator recording each call as a span
+    Args:
+        name (str, optional): Span name, defaults to the function's qualified name
+    """
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class TraceExporter:
+    """Appends finished traces to a JSON Lines file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, trace, **fields):
+        record = trace.as_dict()
+        record.update(fields)
+        line = json.dumps(record, default=str) + '\n'
+        try:
+            with self._lock:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            logger.warning(f"Could not export trace {trace.trace_id}: {str(e)}")
@@ -0,0 +1,9 @@
+"""
+ASGI entry point.
+
+Run with:
+    uvicorn asgi:app --workers 1 --port 5000
+"""
+from app.asgi_app import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,94 @@
+"""
+Benchmark BLIP captioning throughput at different batch sizes.
+
+Usage:
+    python -m benchmarks.bench_captioning [--images DIR] [--rounds N]
+
+Reports images/sec for direct batched calls and for concurrent callers going
+through the micro-batcher used by ImageProcessor.generate_alt_text.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+BATCH_SIZES = [1, 4, 8, 16]
+
+
+def load_images(image_dir=None, count=16, size=(640, 480)):
+    """Load images from a directory, or build deterministic synthetic ones"""
+    if image_dir:
+        paths = sorted(
+            os.path.join(image_dir, name) for name in os.listdir(image_dir)
+            if name.lower().rsplit('.', 1)[-1] in {'png', 'jpg', 'jpeg', 'gif'}
+        )
+        images = [Image.open(path).convert('RGB') for path in paths[:count]]
+        if images:
+            return images
+
+    rng = np.random.default_rng(42)
+    return [
+        Image.fromarray(rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8))
+        for _ in range(count)
+    ]
+
+
+def bench_direct(processor, images, batch_size, rounds):
+    """Time generate_alt_text_batch on fixed-size batches"""
+    processed = [processor.preprocess_image(img) for img in images]
+    processor.generate_alt_text_batch(processed[:1])  # warm-up
+
+    total = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for i in range(0, len(processed), batch_size):
+            batch = processed[i:i + batch_size]
+            processor.generate_alt_text_batch(batch)
+            total += len(batch)
+    elapsed = time.perf_counter() - start
+    return total / elapsed
+
+
+def bench_concurrent(processor, images, batch_size, rounds, window_ms):
+    """Time generate_alt_text with batch_size concurrent callers"""
+    from app.utils.batch_utils import MicroBatcher
+
+    processor.caption_batcher = MicroBatcher(
+        processor.generate_alt_text_batch,
+        max_batch_size=batch_size,
+        window_ms=window_ms,
+        name=f'bench-batcher-{batch_size}'
+    )
+    work = images * rounds
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=batch_size) as pool:
+        list(pool.map(processor.generate_alt_text, work))
+    elapsed = time.perf_counter() - start
+    return len(work) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Directory of sample images (synthetic images if omitted)')
+    parser.add_argument('--count', type=int, default=16, help='Number of images per round')
+    parser.add_argument('--rounds', type=int, default=2, help='Passes over the image set')
+    parser.add_argument('--window-ms', type=float, default=10, help='Micro-batch window for the concurrent run')
+    args = parser.parse_args()
+
+    from app.services.image_service import ImageProcessor
+
+    processor = ImageProcessor()
+    images = load_images(args.images, args.count)
+
+    print(f"{'batch':>6} {'direct img/s':>14} {'concurrent img/s':>18}")
+    for batch_size in BATCH_SIZES:
+        direct = bench_direct(processor, images, batch_size, args.rounds)
+        concurrent = bench_concurrent(processor, images, batch_size, args.rounds, args.window_ms)
+        print(f"{batch_size:>6} {direct:>14.2f} {concurrent:>18.2f}")
+
+
+if __name__ == '__main__':
+    main()
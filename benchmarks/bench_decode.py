@@ -0,0 +1,87 @@
+"""
+Measure decode-time downscaling on large uploads.
+
+Usage:
+    python -m benchmarks.bench_decode [--images DIR] [--count N] [--format JPEG,PNG]
+
+Every image is encoded once, then decoded and run through the CPU stages of
+general analysis (enhancement, quality check, palette) twice: at full
+resolution and with the STAGE_MAX_RESOLUTION caps. Each variant runs in its
+own process so the reported peak RSS belongs to that variant alone.
+"""
+import argparse
+import io
+import multiprocessing
+import time
+
+from benchmarks.bench_palette import load_images
+
+
+def _encode(images, image_format):
+    payloads = []
+    for image in images:
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, quality=90)
+        payloads.append(buffer.getvalue())
+    return payloads
+
+
+def _run_variant(payloads, capped):
+    """Decode and analyse every payload; runs in a fresh process"""
+    import resource
+
+    from app.utils.file_utils import open_image
+    from app.services.image_context import ImageContext
+    from app.services.image_service import ImageProcessor
+    from app.services.palette_service import extract_palette
+    from config.config import STAGE_MAX_RESOLUTION, PALETTE_MAX_SIDE
+
+    caps = STAGE_MAX_RESOLUTION if capped else {}
+    processor = ImageProcessor()
+    decode_seconds = analysis_seconds = 0.0
+    sizes = []
+    for payload in payloads:
+        start = time.perf_counter()
+        image, original_size = open_image(io.BytesIO(payload), caps.get('decode'))
+        decode_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        context = ImageContext(image, original_size=original_size, max_resolution=caps)
+        context.processed
+        processor.validate_image_quality(context)
+        extract_palette(context.thumbnail(PALETTE_MAX_SIDE), n_colors=5)
+        analysis_seconds += time.perf_counter() - start
+        sizes.append(context.processed.size)
+
+    count = len(payloads)
+    return {
+        'decode_ms': round(decode_seconds / count * 1000, 1),
+        'analysis_ms': round(analysis_seconds / count * 1000, 1),
+        'working_size': sizes[0],
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Directory of sample images (synthetic 12 MP images if omitted)')
+    parser.add_argument('--count', type=int, default=4, help='Number of images')
+    parser.add_argument('--format', default='JPEG,PNG', help='Comma-separated encodings to test')
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.count)
+    context = multiprocessing.get_context('spawn')
+
+    print(f"{'format':>6} {'variant':>8} {'working size':>13} {'decode ms':>10} {'analysis ms':>12} {'peak MB':>8}")
+    for image_format in [name.strip().upper() for name in args.format.split(',') if name.strip()]:
+        payloads = _encode(images, image_format)
+        for capped in (False, True):
+            with context.Pool(1) as pool:
+                result = pool.apply(_run_variant, (payloads, capped))
+            size = 'x'.join(str(side) for side in result['working_size'])
+            print(f"{image_format:>6} {'capped' if capped else 'full':>8} {size:>13} {result['decode_ms']:>10} "
+                  f"{result['analysis_ms']:>12} {result['peak_rss_mb']:>8}")
+
+
+if __name__ == '__main__':
+    main()
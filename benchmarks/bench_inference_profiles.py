@@ -0,0 +1,173 @@
+"""
+Compare BLIP/DETR inference profiles for speed and accuracy.
+
+Usage:
+    python -m benchmarks.bench_inference_profiles [--images DIR] [--profiles fp32,int8,bf16,onnx]
+        [--threads N] [--output results.json]
+
+Every profile runs captioning and detection on the same fixed image set;
+the profile name 'onnx' runs the ONNX Runtime backend instead of torch.
+Accuracy is measured against the fp32 profile: the share of identical
+captions, mean token overlap (Jaccard) of captions, and F1 of detected
+object labels.
+"""
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.bench_captioning import load_images
+
+BATCH_SIZE = 4
+
+
+def _token_jaccard(a, b):
+    a, b = set(a.lower().split()), set(b.lower().split())
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def _label_f1(reference, predicted):
+    reference = {obj['name'] for obj in reference}
+    predicted = {obj['name'] for obj in predicted}
+    if not reference and not predicted:
+        return 1.0
+    overlap = len(reference & predicted)
+    if not overlap:
+        return 0.0
+    precision = overlap / len(predicted)
+    recall = overlap / len(reference)
+    return 2 * precision * recall / (precision + recall)
+
+
+def run_profile(profile_name, images, rounds, default_threads):
+    """
+    Load both models under a profile and time batched inference
+    Args:
+        default_threads (int): torch thread count restored before the profile's own
+            setting, so one profile's thread count never carries over into the next
+    """
+    import torch
+
+    from app.services.backends import torch_backend
+    from app.services.image_service import ImageProcessor
+    from app.services.model_registry import ModelRegistry
+    from app.utils.inference_utils import get_profile, apply_thread_settings
+    from config.config import ONNX_NUM_THREADS
+
+    # 'onnx' runs the ONNX Runtime backend, which has no torch profile
+    profile = get_profile('fp32' if profile_name == 'onnx' else profile_name)
+    torch.set_num_threads(default_threads)
+    apply_thread_settings(profile)
+
+    registry = ModelRegistry()
+    if profile_name == 'onnx':
+        from app.services.backends import onnx_backend
+
+        registry.register('blip_onnx', onnx_backend._load_blip_onnx)
+        registry.register('detr_onnx', onnx_backend._load_detr_onnx)
+        backend = onnx_backend.OnnxBackend(registry)
+    else:
+        registry.register('blip', lambda: torch_backend._load_blip(profile_name))
+        registry.register('detr', lambda: torch_backend._load_detr(profile_name))
+        backend = torch_backend.TorchBackend(registry, profiles={'blip': profile_name, 'detr': profile_name})
+
+    processor = ImageProcessor(backend)
+    start = time.perf_counter()
+    backend.warm_up(['blip', 'detr'])
+    load_seconds = time.perf_counter() - start
+
+    processed = [processor.preprocess_image(img) for img in images]
+    # Warm-up pass (also triggers torch.compile / tracing costs outside the timings)
+    processor.generate_alt_text_batch(processed[:1])
+    processor.detect_objects_batch(processed[:1])
+
+    captions, detections = [], []
+    caption_seconds = detection_seconds = 0.0
+    for round_index in range(rounds):
+        for i in range(0, len(processed), BATCH_SIZE):
+            batch = processed[i:i + BATCH_SIZE]
+            start = time.perf_counter()
+            batch_captions = processor.generate_alt_text_batch(batch)
+            caption_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            batch_detections = processor.detect_objects_batch(batch)
+            detection_seconds += time.perf_counter() - start
+            if round_index == 0:
+                captions.extend(batch_captions)
+                detections.extend(batch_detections)
+
+    count = len(processed) * rounds
+    return {
+        'profile': profile_name,
+        'num_threads': profile['num_threads'] if profile_name != 'onnx' else ONNX_NUM_THREADS or None,
+        'load_seconds': round(load_seconds, 2),
+        'caption_ms_per_image': round(caption_seconds / count * 1000, 1),
+        'detection_ms_per_image': round(detection_seconds / count * 1000, 1),
+        'captions': captions,
+        'detections': detections
+    }
+
+
+def score(result, reference):
+    """Accuracy of a profile's outputs relative to the fp32 reference"""
+    pairs = list(zip(result['captions'], reference['captions']))
+    detection_pairs = list(zip(reference['detections'], result['detections']))
+    return {
+        'caption_exact': round(sum(a == b for a, b in pairs) / len(pairs), 3),
+        'caption_jaccard': round(sum(_token_jaccard(a, b) for a, b in pairs) / len(pairs), 3),
+        'detection_f1': round(sum(_label_f1(r, p) for r, p in detection_pairs) / len(detection_pairs), 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Directory of sample images (synthetic images if omitted)')
+    parser.add_argument('--count', type=int, default=8, help='Number of images')
+    parser.add_argument('--rounds', type=int, default=2, help='Timed passes over the image set')
+    parser.add_argument('--profiles', default='fp32,int8,bf16,compile,torchscript,onnx',
+                        help='Comma-separated profiles; fp32 is always run as the reference')
+    parser.add_argument('--threads', type=int, help='Override num_threads for every profile')
+    parser.add_argument('--output', help='Write the full results as JSON')
+    args = parser.parse_args()
+
+    from config.config import INFERENCE_PROFILES
+
+    if args.threads:
+        for profile in INFERENCE_PROFILES.values():
+            profile['num_threads'] = args.threads
+
+    profiles = [name.strip() for name in args.profiles.split(',') if name.strip()]
+    if 'fp32' in profiles:
+        profiles.remove('fp32')
+    profiles.insert(0, 'fp32')
+
+    import torch
+
+    default_threads = torch.get_num_threads()
+    images = load_images(args.images, args.count)
+    results = []
+    for name in profiles:
+        try:
+            results.append(run_profile(name, images, args.rounds, default_threads))
+        except Exception as e:
+            print(f"{name}: failed ({e})")
+
+    reference = next((result for result in results if result['profile'] == 'fp32'), None)
+    if reference is None:
+        sys.exit("The fp32 reference profile failed, so accuracy cannot be scored")
+    print(f"{'profile':>12} {'threads':>8} {'caption ms':>11} {'detect ms':>10} "
+          f"{'exact':>6} {'jaccard':>8} {'det F1':>7}")
+    for result in results:
+        result['accuracy'] = score(result, reference)
+        threads = result['num_threads'] or 'default'
+        print(f"{result['profile']:>12} {threads:>8} {result['caption_ms_per_image']:>11} "
+              f"{result['detection_ms_per_image']:>10} {result['accuracy']['caption_exact']:>6} "
+              f"{result['accuracy']['caption_jaccard']:>8} {result['accuracy']['detection_f1']:>7}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Compare palette_service.extract_palette with full-resolution KMeans.
+
+Usage:
+    python -m benchmarks.bench_palette [--images DIR] [--count N]
+
+For every image this reports the time taken by each method, the mean RGB
+distance between matched dominant colours and the mean absolute difference
+in their percentages. KMeans is run the way the services used to run it:
+scikit-learn KMeans with n_init=10 over every pixel.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+
+def load_images(image_dir=None, count=4, size=(4000, 3000)):
+    """Load images from a directory, or build deterministic synthetic photos"""
+    if image_dir:
+        paths = sorted(
+            os.path.join(image_dir, name) for name in os.listdir(image_dir)
+            if name.lower().rsplit('.', 1)[-1] in {'png', 'jpg', 'jpeg', 'gif'}
+        )
+        images = [Image.open(path).convert('RGB') for path in paths[:count]]
+        if images:
+            return images
+
+    # Colour regions with gradients and sensor-like noise, so the images have
+    # real dominant colours (uniform noise has none)
+    rng = np.random.default_rng(42)
+    width, height = size
+    images = []
+    for _ in range(count):
+        base = rng.integers(0, 256, size=(5, 3)).astype(np.float32)
+        cuts = np.sort(rng.uniform(0, 1, size=4))
+        x = np.linspace(0, 1, width, dtype=np.float32)
+        region = np.searchsorted(cuts, x)
+        row = base[region]
+        gradient = np.linspace(0.8, 1.2, height, dtype=np.float32)[:, None, None]
+        pixels = row[None, :, :] * gradient
+        pixels += rng.normal(0, 6, size=(height, width, 3)).astype(np.float32)
+        images.append(Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)))
+    return images
+
+
+def kmeans_palette(image, n_colors):
+    """Reference palette: KMeans over every pixel, sorted by share"""
+    from sklearn.cluster import KMeans
+
+    pixels = np.asarray(image).reshape(-1, 3)
+    kmeans = KMeans(n_clusters=n_colors, random_state=42, n_init=10)
+    kmeans.fit(pixels)
+    counts = np.bincount(kmeans.labels_, minlength=n_colors)
+    order = np.argsort(-counts)
+    return kmeans.cluster_centers_[order], counts[order] / counts.sum() * 100
+
+
+def compare(reference_colors, reference_pct, colors, pct):
+    """Match colours one-to-one and return (mean RGB distance, mean percentage error)"""
+    from scipy.optimize import linear_sum_assignment
+
+    colors = np.asarray(colors, dtype=float)
+    pct = np.asarray(pct, dtype=float)
+    cost = np.linalg.norm(reference_colors[:, None, :] - colors[None, :, :], axis=2)
+    rows, cols = linear_sum_assignment(cost)
+    return cost[rows, cols].mean(), np.abs(reference_pct[rows] - pct[cols]).mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Directory of sample images (synthetic 12 MP images if omitted)')
+    parser.add_argument('--count', type=int, default=4, help='Number of images')
+    parser.add_argument('--colors', type=int, default=5, help='Dominant colours to extract')
+    parser.add_argument('--skip-kmeans', action='store_true', help='Only time extract_palette')
+    args = parser.parse_args()
+
+    from app.services.palette_service import extract_palette
+
+    images = load_images(args.images, args.count)
+    extract_palette(images[0], n_colors=args.colors)  # warm-up
+
+    print(f"{'image':>5} {'pixels':>10} {'palette ms':>11} {'kmeans ms':>10} {'rgb dist':>9} {'pct err':>8}")
+    for index, image in enumerate(images):
+        start = time.perf_counter()
+        palette = extract_palette(image, n_colors=args.colors)
+        palette_ms = (time.perf_counter() - start) * 1000
+
+        # Same input twice must give the same palette
+        assert extract_palette(image, n_colors=args.colors) == palette, 'extract_palette is not deterministic'
+
+        pixels = image.width * image.height
+        if args.skip_kmeans:
+            print(f"{index:>5} {pixels:>10} {palette_ms:>11.1f}")
+            continue
+
+        start = time.perf_counter()
+        reference_colors, reference_pct = kmeans_palette(image, args.colors)
+        kmeans_ms = (time.perf_counter() - start) * 1000
+
+        distance, pct_error = compare(reference_colors, reference_pct, palette['colors'], palette['percentages'])
+        print(f"{index:>5} {pixels:>10} {palette_ms:>11.1f} {kmeans_ms:>10.1f} {distance:>9.2f} {pct_error:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
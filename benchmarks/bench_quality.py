@@ -0,0 +1,49 @@
+"""
+Time quality_service.assess_quality.
+
+Usage:
+    python -m benchmarks.bench_quality [--images DIR] [--count N] [--max-side PX]
+
+Reports the time to compute all quality metrics on the downsampled copy
+(including the resize) and on the full-resolution image, plus the metrics
+found, so thresholds can be checked against real photos.
+"""
+import argparse
+import time
+
+from benchmarks.bench_palette import load_images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Directory of sample images (synthetic 12 MP images if omitted)')
+    parser.add_argument('--count', type=int, default=4, help='Number of images')
+    parser.add_argument('--max-side', type=int, help="Longest analysed edge, defaults to the 'quality' cap")
+    args = parser.parse_args()
+
+    from app.services.image_context import ImageContext
+    from app.services.quality_service import assess_quality
+    from config.config import STAGE_MAX_RESOLUTION
+
+    max_side = args.max_side or STAGE_MAX_RESOLUTION['quality']
+    images = load_images(args.images, args.count)
+    assess_quality(images[0], max_side)  # warm-up
+
+    print(f"{'image':>5} {'pixels':>10} {'quality ms':>11} {'full ms':>8} {'blur':>8} {'noise':>6} "
+          f"{'colour':>7}  issues")
+    for index, image in enumerate(images):
+        start = time.perf_counter()
+        quality = assess_quality(ImageContext(image), max_side)
+        quality_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        assess_quality(image, max(image.size))
+        full_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{index:>5} {image.width * image.height:>10} {quality_ms:>11.1f} {full_ms:>8.1f} "
+              f"{quality['blur']:>8.1f} {quality['noise']:>6.2f} {quality['colorfulness']:>7.1f}  "
+              f"{', '.join(quality['codes']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+"""
+End-to-end benchmark of the analysis routes against local stand-ins.
+
+Usage:
+    python -m benchmarks.bench_routes [--routes social_media,seo,...] [--concurrency 1,4,16]
+        [--requests N] [--gemini-latency-ms MS] [--replay FILE] [--vision stub|real] [--http]
+        [--output results.json] [--baseline baseline.json] [--tolerance 0.1] [--check]
+
+Every route is driven through the Flask test client (or, with --http, over
+real HTTP against an in-process threaded server) at each concurrency level.
+Gemini is replaced by a deterministic stand-in with configurable latency
+(benchmarks/gemini_standin.py), or by a recording made with
+GEMINI_TRANSPORT=record when --replay is given; BLIP/DETR are stubbed too
+unless --vision real is given. Result and prompt caches are disabled so every
+request does the full work.
+
+Reported per route and concurrency level: throughput, p50/p95/max latency,
+errors, mean per-stage pipeline timings and the process's peak RSS so far.
+With --baseline, p95 latency and throughput are compared against a stored
+run and regressions beyond --tolerance are flagged (exit status 1).
+
+Before measuring, one request is sent to every selected route and any
+non-200 response aborts the run; --check stops after these requests, which
+makes it a quick smoke test that every route pipeline actually runs.
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Every request must do the full work, so caches are off before the app is imported
+os.environ['RESULT_CACHE_ENABLED'] = '0'
+os.environ['PROMPT_CACHE_ENABLED'] = '0'
+os.environ['MODEL_SERVER_ADDRESS'] = ''
+
+from benchmarks.bench_captioning import load_images
+
+# Route name -> (path, file field, extra form fields)
+ROUTES = {
+    'social_media': ('/social-media', 'image', {}),
+    'seo': ('/seo', 'image', {}),
+    'general': ('/api/analyze/general', 'image', {}),
+    'image_analyzer': ('/image-analyzer', 'image', {}),
+    'advanced': ('/advanced-analysis', 'image', {'chart_format': 'json'}),
+    'social_media_analyze': ('/api/social-media/analyze', 'image', {}),
+    'medical': ('/api/analyze-medical-image', 'file', {}),
+}
+
+
+class StageRecorder:
+    """Wraps run_pipeline in the routes module to collect PipelineResult.timings"""
+
+    def __init__(self, routes_module):
+        self.routes_module = routes_module
+        self.original = routes_module.run_pipeline
+        self.timings = []
+        self._lock = threading.Lock()
+        routes_module.run_pipeline = self.run_pipeline
+
+    def run_pipeline(self, name, **inputs):
+        result = self.original(name, **inputs)
+        with self._lock:
+            self.timings.append(dict(result.timings))
+        return result
+
+    def drain(self):
+        """Return mean seconds per stage since the last drain"""
+        with self._lock:
+            timings, self.timings = self.timings, []
+        totals = {}
+        for timing in timings:
+            for stage, seconds in timing.items():
+                totals.setdefault(stage, []).append(seconds)
+        return {stage: round(sum(values) / len(values) * 1000, 1) for stage, values in totals.items()}
+
+
+def _encode_images(images):
+    payloads = []
+    for image in images:
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        payloads.append(buffer.getvalue())
+    return payloads
+
+def _multipart(field, filename, payload, fields):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f'Content-Type: image/jpeg\r\n\r\n'.encode() + payload + b'\r\n'
+    )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class ClientDriver:
+    """Sends requests through the Flask test client"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def post(self, path, field, payload, fields):
+        data = dict(fields)
+        data[field] = (io.BytesIO(payload), 'bench.jpg')
+        response = self.app.test_client().post(path, data=data, content_type='multipart/form-data')
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class HttpDriver:
+    """Sends requests over HTTP to a threaded werkzeug server running the app"""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def post(self, path, field, payload, fields):
+        body, content_type = _multipart(field, 'bench.jpg', payload, fields)
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=300)
+        try:
+            conn.request('POST', path, body=body, headers={'Content-Type': content_type})
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def run_level(driver, recorder, route, payloads, concurrency, requests):
+    """Send `requests` requests to one route with `concurrency` callers"""
+    path, field, fields = ROUTES[route]
+    recorder.drain()
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def one(index):
+        start = time.perf_counter()
+        status = driver.post(path, field, payloads[index % len(payloads)], fields)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses.append(status)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+
+    return {
+        'route': route,
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for status in statuses if status != 200),
+        'throughput_rps': round(requests / wall, 2),
+        'p50_ms': round(_percentile(latencies, 0.5) * 1000, 1),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 1),
+        'max_ms': round(max(latencies) * 1000, 1),
+        'stages_ms': recorder.drain(),
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with a baseline run
+    Returns:
+        list: (route, concurrency, p95 change, throughput change, regressed) tuples
+    """
+    previous = {(row['route'], row['concurrency']): row for row in baseline['results']}
+    rows = []
+    for row in results:
+        before = previous.get((row['route'], row['concurrency']))
+        if before is None:
+            continue
+        p95_change = (row['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        rps_change = ((row['throughput_rps'] - before['throughput_rps']) / before['throughput_rps']
+                      if before['throughput_rps'] else 0.0)
+        regressed = p95_change > tolerance or rps_change < -tolerance
+        rows.append((row['route'], row['concurrency'], p95_change, rps_change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--routes', default=','.join(ROUTES), help='Comma-separated routes to run')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=32, help='Requests per route and level')
+    parser.add_argument('--images', help='Directory of sample images (synthetic images if omitted)')
+    parser.add_argument('--size', default='1600x1200', help='Synthetic image size, WIDTHxHEIGHT')
+    parser.add_argument('--gemini-latency-ms', type=float, default=300, help='Stand-in latency per Gemini call')
+    parser.add_argument('--gemini-jitter-ms', type=float, default=0, help='Uniform jitter around the latency')
+    parser.add_argument('--replay', help='Serve Gemini from a GEMINI_TRANSPORT=record file instead of the stand-in')
+    parser.add_argument('--replay-latency', default='recorded',
+                        help="'recorded', or fixed milliseconds per replayed call")
+    parser.add_argument('--response-words', type=int, default=80, help='Length of free-text stand-in responses')
+    parser.add_argument('--vision', choices=['stub', 'real'], default='stub',
+                        help='Stub BLIP/DETR, or use the configured vision backend')
+    parser.add_argument('--vision-latency-ms', type=float, default=50, help='Stub latency per vision batch')
+    parser.add_argument('--http', action='store_true', help='Drive the routes over HTTP instead of the test client')
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--baseline', help='Compare against a previous --output file')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative regression')
+    parser.add_argument('--check', action='store_true', help='Only check that every route answers 200, then exit')
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.routes import main_routes
+    from app.services.gemini_client import gemini_client
+    from app.services.gemini_transport import ReplayTransport
+    from app.services.image_service import image_processor
+    from benchmarks.gemini_standin import StandInGenai, StubVisionBackend
+
+    routes = [name.strip() for name in args.routes.split(',') if name.strip()]
+    unknown = [name for name in routes if name not in ROUTES]
+    if unknown:
+        parser.error(f"Unknown routes: {', '.join(unknown)}. Use any of: {', '.join(ROUTES)}")
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+    if args.replay:
+        gemini_client.use_backend(ReplayTransport(args.replay, args.replay_latency))
+    else:
+        gemini_client.use_backend(StandInGenai(args.gemini_latency_ms, args.gemini_jitter_ms, args.response_words))
+    if args.vision == 'stub':
+        image_processor.set_backend(StubVisionBackend(args.vision_latency_ms))
+
+    app = create_app()
+    recorder = StageRecorder(main_routes)
+    driver = HttpDriver(app) if args.http else ClientDriver(app)
+
+    width, height = (int(side) for side in args.size.lower().split('x'))
+    payloads = _encode_images(load_images(args.images, 8, size=(width, height)))
+
+    # One untimed request per route loads models and warms caches outside the measurements,
+    # and catches routes that fail outright before any time is spent measuring them
+    failed = []
+    for route in routes:
+        path, field, fields = ROUTES[route]
+        status = driver.post(path, field, payloads[0], fields)
+        if status != 200:
+            failed.append(f"{route} ({path}): HTTP {status}")
+    if failed or args.check:
+        driver.close()
+        for failure in failed:
+            print(f"Route check failed: {failure}", file=sys.stderr)
+        if failed:
+            sys.exit(1)
+        print(f"Route check passed: {', '.join(routes)}")
+        return
+
+    results = []
+    print(f"{'route':>20} {'conc':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'errors':>6} "
+          f"{'RSS MB':>7}  stages (mean ms)")
+    try:
+        for route in routes:
+            for concurrency in levels:
+                row = run_level(driver, recorder, route, payloads, concurrency, args.requests)
+                results.append(row)
+                stages = ', '.join(f"{stage}={ms}" for stage, ms in row['stages_ms'].items())
+                print(f"{route:>20} {concurrency:>5} {row['throughput_rps']:>8} {row['p50_ms']:>8} "
+                      f"{row['p95_ms']:>8} {row['max_ms']:>8} {row['errors']:>6} {row['peak_rss_mb']:>7}  {stages}")
+    finally:
+        driver.close()
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {
+            'transport': 'http' if args.http else 'test_client',
+            'requests': args.requests,
+            'image_size': [width, height],
+            'gemini': f"replay:{args.replay}" if args.replay else 'stand-in',
+            'gemini_latency_ms': args.replay_latency if args.replay else args.gemini_latency_ms,
+            'gemini_jitter_ms': args.gemini_jitter_ms,
+            'vision': args.vision,
+            'vision_latency_ms': args.vision_latency_ms,
+            'python': platform.python_version(),
+            'cpus': os.cpu_count()
+        },
+        'gemini_calls': sum(stats['requests'] for stats in gemini_client.metrics()['models'].values()),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.tolerance)
+        print(f"\n{'route':>20} {'conc':>5} {'p95 change':>11} {'rps change':>11}")
+        for route, concurrency, p95_change, rps_change, regressed in rows:
+            print(f"{route:>20} {concurrency:>5} {p95_change:>+10.1%} {rps_change:>+10.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
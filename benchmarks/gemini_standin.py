@@ -0,0 +1,185 @@
+"""
+Deterministic local stand-ins for Gemini and the vision models.
+
+StandInGenai mimics the parts of google.generativeai the services use
+(GenerativeModel.generate_content, with and without streaming). Responses
+are chosen by prompt type so every parser in the services gets the format
+it expects, their text is derived from a hash of the prompt, and every call
+sleeps for a configurable latency. StubVisionBackend does the same for
+BLIP/DETR so route benchmarks can run without model weights.
+
+Install them with gemini_client.use_backend(StandInGenai(...)) and
+image_processor.set_backend(StubVisionBackend(...)).
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+
+from app.services.backends.base import VisionBackend
+
+WORDS = (
+    'bright modern product vibrant natural light texture detail colour '
+    'scene design elegant composition warm background subject style '
+    'clean minimal outdoor crafted premium everyday quality fresh'
+).split()
+
+SEO_TEMPLATE = """Meta Title:
+{title}
+Meta Description:
+{sentence}
+Alternative Titles (A/B testing):
+{title} - Option A
+{title} - Option B
+Keywords:
+{keywords}
+Product Description:
+{paragraph}"""
+
+SOCIAL_TEMPLATE = """Instagram Captions:
+{sentence}
+{sentence2}
+{sentence3}
+Twitter Posts:
+{sentence}
+{sentence2}
+Facebook Post:
+{paragraph}
+Hashtags:
+{hashtags}"""
+
+MEDICAL_TEMPLATE = """1. Technical Assessment
+{sentence}
+2. Anatomical Observations
+{sentence2}
+3. Notable Findings
+{sentence3}
+4. Recommendations
+{paragraph}"""
+
+
+def _prompt_text(contents):
+    if isinstance(contents, str):
+        return contents
+    return ' '.join(part for part in contents if isinstance(part, str))
+
+
+class _Text:
+    def __init__(self, text):
+        self.text = text
+
+
+class StandInModel:
+    """GenerativeModel stand-in with deterministic, prompt-shaped responses"""
+
+    def __init__(self, genai, model_name, generation_config=None):
+        self.genai = genai
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def _words(self, rng, count):
+        return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+    def respond(self, prompt):
+        """Build the response text for a prompt"""
+        seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16], 16)
+        rng = random.Random(seed)
+        words = self.genai.response_words
+        fields = {
+            'title': self._words(rng, 6).title(),
+            'sentence': self._words(rng, 14).capitalize() + '.',
+            'sentence2': self._words(rng, 14).capitalize() + '.',
+            'sentence3': self._words(rng, 14).capitalize() + '.',
+            'paragraph': self._words(rng, words).capitalize() + '.',
+            'keywords': ', '.join(rng.sample(WORDS, 6)),
+            'hashtags': ' '.join('#' + word for word in rng.sample(WORDS, 8)),
+        }
+        lowered = prompt.lower()
+        if 'sentiment of this text' in lowered:
+            return json.dumps({
+                'category': rng.choice(['Positive', 'Neutral']),
+                'score': round(rng.uniform(0.6, 0.95), 2),
+                'indicators': rng.sample(WORDS, 3)
+            })
+        if 'seo-optimized' in lowered:
+            return SEO_TEMPLATE.format(**fields)
+        if 'social media variations' in lowered:
+            return SOCIAL_TEMPLATE.format(**fields)
+        if 'hashtags for this social media post' in lowered:
+            return fields['hashtags']
+        if 'medical image' in lowered:
+            return MEDICAL_TEMPLATE.format(**fields)
+        return fields['paragraph']
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        text = self.respond(_prompt_text(contents))
+        delay = self.genai.delay()
+        self.genai.count()
+        if not stream:
+            time.sleep(delay)
+            return _Text(text)
+        return self._stream(text, delay)
+
+    def _stream(self, text, delay):
+        words = text.split(' ')
+        chunks = [' '.join(words[i:i + 8]) for i in range(0, len(words), 8)]
+        for index, chunk in enumerate(chunks):
+            time.sleep(delay / len(chunks))
+            yield _Text(chunk if index == len(chunks) - 1 else chunk + ' ')
+
+
+class StandInGenai:
+    """Module-like object exposing GenerativeModel, with fixed latency plus seeded jitter"""
+
+    def __init__(self, latency_ms=300, jitter_ms=0, response_words=80, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.response_words = response_words
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def GenerativeModel(self, model_name, generation_config=None):
+        return StandInModel(self, model_name, generation_config)
+
+    def delay(self):
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def count(self):
+        with self._lock:
+            self.calls += 1
+
+
+class StubVisionBackend(VisionBackend):
+    """Vision backend returning fixed captions and objects after a fixed latency per batch"""
+
+    name = 'stub'
+
+    def __init__(self, latency_ms=50):
+        self.latency_ms = latency_ms
+
+    @property
+    def caption_available(self):
+        return True
+
+    @property
+    def detection_available(self):
+        return True
+
+    def warm_up(self, models):
+        pass
+
+    def caption_batch(self, images):
+        time.sleep(self.latency_ms / 1000)
+        return ['a product photo on a plain background'] * len(images)
+
+    def detect_batch(self, images):
+        time.sleep(self.latency_ms / 1000)
+        return [[{'name': 'bottle', 'confidence': 97.5}, {'name': 'cup', 'confidence': 81.2}]] * len(images)
+
+    def describe(self, image):
+        time.sleep(self.latency_ms / 1000)
+        return 'a product photo of a bottle and a cup on a plain light background in soft natural light'
@@ -0,0 +1,59 @@
+"""
+Analyze a whole image catalogue from the command line.
+
+Usage:
+    python catalog_cli.py SOURCE -o results.jsonl [--format csv] [--tasks alt_text,seo]
+
+SOURCE is a directory, a ZIP archive or a manifest (.txt, .csv or .jsonl
+listing image paths). Progress is checkpointed next to the output file, so
+re-running the same command after a crash skips the images already done.
+"""
+import argparse
+import logging
+import sys
+
+from app.utils.init_utils import initialize_ml_dependencies
+from app.services.catalog_service import TASKS, OUTPUT_FORMATS, load_catalog, process_catalog
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help='Directory, ZIP archive or manifest of images')
+    parser.add_argument('-o', '--output', required=True, help='Results file')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS,
+                        help='Output format (defaults to the output file extension, else jsonl)')
+    parser.add_argument('--tasks', default=','.join(TASKS), help=f"Comma-separated subset of {', '.join(TASKS)}")
+    parser.add_argument('--batch-size', type=int, help='Images per BLIP batch')
+    parser.add_argument('--llm-concurrency', type=int, help='Gemini calls in flight at once')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start over')
+    args = parser.parse_args()
+
+    output_format = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+    tasks = [task.strip() for task in args.tasks.split(',') if task.strip()]
+
+    initialize_ml_dependencies()
+
+    def report(summary):
+        done = summary['completed'] + summary['failed']
+        logger.info(f"{done}/{summary['total']} images ({summary['failed']} failed)")
+
+    with load_catalog(args.source) as items:
+        summary = process_catalog(
+            items, args.output,
+            output_format=output_format,
+            tasks=tasks,
+            batch_size=args.batch_size,
+            llm_concurrency=args.llm_concurrency,
+            restart=args.restart,
+            progress=report
+        )
+    for item_id, error in sorted(summary['errors'].items()):
+        logger.warning(f"{item_id}: {error}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
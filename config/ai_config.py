@@ -1,25 +1,14 @@
 """
 Centralized configuration for AI services
-"""
-import os
-import google.generativeai as genai
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
-def get_gemini_client():
-    """Initialize and return Gemini client"""
-    api_key = os.environ.get('GEMINI_API_KEY')
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY environment variable is not set")
-    genai.configure(api_key=api_key)
-    return genai
+The Gemini client itself lives in app/services/gemini_client.py so the SDK
+is configured once per process.
+"""
 
 # Standard model configurations
 GEMINI_CONFIG = {
-    "text_model": "gemini-1.5-flash",
-    "vision_model": "gemini-1.5-flash-002",
+    "text_model": "gemini-1.5-flash",  # For text generation
+    "vision_model": "gemini-1.5-flash-002",  # For image analysis
     "temperature": 0.7,
     "max_output_tokens": 2048
 }
@@ -40,4 +29,4 @@ def format_error_response(error_message, error_code=None):
             'message': error_message,
             'code': error_code
         }
-    }
\ No newline at end of file
+    }
@@ -14,6 +14,21 @@ if not os.path.exists(UPLOAD_FOLDER):
 
 # File Size Limits
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size for regular uploads
+UPLOAD_SPILL_THRESHOLD = int(os.environ.get('UPLOAD_SPILL_THRESHOLD', str(8 * 1024 * 1024)))  # Larger uploads are buffered on disk
+
+# Working resolution caps (longest edge in pixels, 0 = no cap)
+#   decode:  uploads are decoded at most this large (JPEG via draft(), others via reduce())
+#   models:  image enhanced and handed to BLIP/DETR (DETR resizes to at most 1333)
+#   quality: thumbnail used for brightness/contrast checks
+# Override with STAGE_MAX_RESOLUTION, e.g. "decode=4096,quality=256"
+def _stage_caps(value):
+    caps = {'decode': 2048, 'models': 1333, 'quality': 512}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        stage, _, pixels = item.partition('=')
+        caps[stage.strip()] = int(pixels)
+    return caps
+
+STAGE_MAX_RESOLUTION = _stage_caps(os.environ.get('STAGE_MAX_RESOLUTION', ''))
 
 # Gemini Config
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
@@ -26,6 +41,129 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'default-secret-key')
 # Model Config
 BLIP_MODEL = "Salesforce/blip-image-captioning-base"
 
+# Models to load at start-up instead of on first use, e.g. "blip,detr"
+MODEL_WARMUP = [name.strip() for name in os.environ.get('MODEL_WARMUP', '').split(',') if name.strip()]
+
+# Inference Profiles for local BLIP/DETR
+#   fp32:        full precision, eager execution
+#   int8:        dynamic int8 quantization of Linear layers (CPU)
+#   bf16:        bfloat16 autocast where the hardware supports it, else fp32
+#   compile:     torch.compile on the model forward
+#   torchscript: traced BLIP vision encoder (DETR runs eagerly)
+# Threads per profile: INFERENCE_THREADS_<PROFILE>, e.g. INFERENCE_THREADS_INT8=4
+def _profile_threads(name):
+    threads = os.environ.get(f'INFERENCE_THREADS_{name.upper()}')
+    return int(threads) if threads else None  # None keeps the torch default
+
+INFERENCE_PROFILES = {
+    'fp32': {'quantize': None, 'autocast': None, 'compile': None, 'num_threads': _profile_threads('fp32')},
+    'int8': {'quantize': 'dynamic_int8', 'autocast': None, 'compile': None, 'num_threads': _profile_threads('int8')},
+    'bf16': {'quantize': None, 'autocast': 'bfloat16', 'compile': None, 'num_threads': _profile_threads('bf16')},
+    'compile': {'quantize': None, 'autocast': None, 'compile': 'torch_compile',
+                'num_threads': _profile_threads('compile')},
+    'torchscript': {'quantize': None, 'autocast': None, 'compile': 'torchscript',
+                    'num_threads': _profile_threads('torchscript')},
+}
+
+INFERENCE_PROFILE = os.environ.get('INFERENCE_PROFILE', 'fp32')
+BLIP_INFERENCE_PROFILE = os.environ.get('BLIP_INFERENCE_PROFILE') or INFERENCE_PROFILE
+DETR_INFERENCE_PROFILE = os.environ.get('DETR_INFERENCE_PROFILE') or INFERENCE_PROFILE
+
+# Vision Backend: 'torch' (eager PyTorch with the profiles above) or 'onnx' (ONNX Runtime on CPU)
+VISION_BACKEND = os.environ.get('VISION_BACKEND', 'torch')
+ONNX_MODEL_DIR = os.environ.get('ONNX_MODEL_DIR') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models', 'onnx')  # Exported graphs, created on first use
+ONNX_NUM_THREADS = int(os.environ.get('ONNX_NUM_THREADS', '0'))  # 0 keeps the ONNX Runtime default
+ONNX_OPSET = int(os.environ.get('ONNX_OPSET', '17'))
+
+# Captioning Batch Config
+CAPTION_BATCH_WINDOW_MS = float(os.environ.get('CAPTION_BATCH_WINDOW_MS', '10'))  # How long to wait for more images
+CAPTION_MAX_BATCH_SIZE = int(os.environ.get('CAPTION_MAX_BATCH_SIZE', '8'))
+
+# Object Detection Config
+DETR_MODEL = "facebook/detr-resnet-50"
+DETECTION_THRESHOLD = 0.7
+DETECTION_BATCH_WINDOW_MS = float(os.environ.get('DETECTION_BATCH_WINDOW_MS', '10'))
+DETECTION_MAX_BATCH_SIZE = int(os.environ.get('DETECTION_MAX_BATCH_SIZE', '8'))
+
+# Image Quality Config (metrics are computed on the 'quality'-sized thumbnail)
+QUALITY_BLUR_THRESHOLD = float(os.environ.get('QUALITY_BLUR_THRESHOLD', '100'))  # Laplacian variance below this is blurry
+QUALITY_NOISE_THRESHOLD = float(os.environ.get('QUALITY_NOISE_THRESHOLD', '8'))  # Estimated noise sigma (0-255 scale)
+QUALITY_CLIP_FRACTION = float(os.environ.get('QUALITY_CLIP_FRACTION', '0.1'))  # Share of pixels at pure black/white
+QUALITY_MAX_ASPECT_RATIO = float(os.environ.get('QUALITY_MAX_ASPECT_RATIO', '4'))
+# When enabled, images with any of the gate issues are rejected before BLIP/Gemini run
+QUALITY_GATE_ENABLED = os.environ.get('QUALITY_GATE_ENABLED', '0') == '1'
+QUALITY_GATE_ISSUES = [code.strip() for code in os.environ.get(
+    'QUALITY_GATE_ISSUES', 'blurry,too_dark,too_bright,low_resolution'
+).split(',') if code.strip()]
+
+# Colour Palette Config
+PALETTE_MAX_SIDE = int(os.environ.get('PALETTE_MAX_SIDE', '128'))  # Longest edge of the analysis thumbnail
+PALETTE_REFINE_ITERATIONS = int(os.environ.get('PALETTE_REFINE_ITERATIONS', '4'))  # k-means passes after median cut
+
+# Chart Rendering Config
+CHART_CACHE_MAX_ENTRIES = int(os.environ.get('CHART_CACHE_MAX_ENTRIES', '128'))  # Rendered charts kept in memory
+CHART_DEFAULT_FORMAT = os.environ.get('CHART_DEFAULT_FORMAT', 'png')  # png, svg or json
+
+# Model Server Config (shared BLIP/DETR processes, see serve_models.py)
+MODEL_SERVER_ADDRESS = os.environ.get('MODEL_SERVER_ADDRESS', '')  # host:port or socket path; empty loads models in-process
+MODEL_SERVER_AUTHKEY = os.environ.get('MODEL_SERVER_AUTHKEY', '')  # Required shared secret; must not be SECRET_KEY's default
+MODEL_SERVER_WORKERS = int(os.environ.get('MODEL_SERVER_WORKERS', '1'))  # Model processes, each holding one copy of the models
+MODEL_SERVER_TIMEOUT = float(os.environ.get('MODEL_SERVER_TIMEOUT', '120'))  # Seconds to wait for a model call
+
+# Pipeline Config
+PIPELINE_MAX_WORKERS = int(os.environ.get('PIPELINE_MAX_WORKERS', '16'))  # Threads for concurrent pipeline steps
+
+# Async (ASGI) Serving Config
+ASYNC_CPU_WORKERS = int(os.environ.get('ASYNC_CPU_WORKERS', '8'))  # Bounded pool for BLIP/DETR/colour work
+ASYNC_IO_WORKERS = int(os.environ.get('ASYNC_IO_WORKERS', '64'))  # Concurrent Gemini calls in flight
+
+# Catalogue (bulk) Processing Config
+CATALOG_BATCH_SIZE = int(os.environ.get('CATALOG_BATCH_SIZE', '8'))  # Images per BLIP batch
+CATALOG_LLM_CONCURRENCY = int(os.environ.get('CATALOG_LLM_CONCURRENCY', '4'))  # Gemini calls in flight per catalogue
+CATALOG_FOLDER = os.environ.get('CATALOG_FOLDER') or os.path.join(UPLOAD_FOLDER, 'catalog')  # Batches submitted via the API
+CATALOG_ROOT = os.environ.get('CATALOG_ROOT') or None  # Directory API manifests may reference; unset disables manifests
+CATALOG_MAX_ENTRY_BYTES = int(os.environ.get('CATALOG_MAX_ENTRY_BYTES', str(MAX_CONTENT_LENGTH)))  # Largest ZIP entry read
+
+# Job Queue Config (background analysis jobs run by worker.py)
+JOB_FOLDER = os.environ.get('JOB_FOLDER') or os.path.join(UPLOAD_FOLDER, 'jobs')  # Queued image payloads
+JOB_DB_PATH = os.environ.get('JOB_DB_PATH') or os.path.join(JOB_FOLDER, 'jobs.sqlite3')
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))  # Worker processes started by worker.py
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', '600'))  # Jobs of crashed workers are retried after this
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '0.5'))  # Seconds
+JOB_RETENTION_SECONDS = float(os.environ.get('JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))  # Finished jobs kept this long
+
+# Result Cache Config
+RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', '1') == '1'
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', '256'))
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', '3600'))  # Seconds
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', '')  # Enables the SQLite disk tier when set
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# Prompt Cache Config (memoized Gemini text responses)
+PROMPT_CACHE_ENABLED = os.environ.get('PROMPT_CACHE_ENABLED', '1') == '1'
+PROMPT_CACHE_MAX_ENTRIES = int(os.environ.get('PROMPT_CACHE_MAX_ENTRIES', '1024'))
+PROMPT_CACHE_TTL = float(os.environ.get('PROMPT_CACHE_TTL', '86400'))  # Seconds
+
+# Gemini Transport Config (record/replay Gemini calls for reproducible performance tests)
+GEMINI_TRANSPORT = os.environ.get('GEMINI_TRANSPORT', 'live')  # live, record or replay
+GEMINI_RECORDING_PATH = os.environ.get('GEMINI_RECORDING_PATH') or os.path.join(UPLOAD_FOLDER, 'gemini_recordings.jsonl')
+GEMINI_REPLAY_LATENCY = os.environ.get('GEMINI_REPLAY_LATENCY', 'recorded')  # 'recorded', or fixed milliseconds per call
+
+# Metrics Config (Prometheus text format on /metrics)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+# Tracing Config (per-request stage timings)
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', '0') == '1'  # Adds a Server-Timing header to responses
+TRACE_RESPONSE_TIMINGS = os.environ.get('TRACE_RESPONSE_TIMINGS', '0') == '1'  # Also adds 'timings' to JSON bodies
+TRACE_EXPORT_PATH = os.environ.get('TRACE_EXPORT_PATH', '')  # Appends every trace to this JSON Lines file
+
+# Profiling Config (per-request profiles on demand, see app/utils/profiling.py)
+PROFILING_ADMIN_TOKEN = os.environ.get('PROFILING_ADMIN_TOKEN', '')  # Empty disables profiling and the admin routes
+PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(UPLOAD_FOLDER, 'profiles')
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', '50'))  # Older profiles are deleted
+
 # Medical Image Config
 MEDICAL_IMAGE_EXTENSIONS = {'dcm', 'tiff', 'png', 'jpg', 'jpeg'}
 MAX_MEDICAL_IMAGE_SIZE = 32 * 1024 * 1024  # 32MB max for medical images 
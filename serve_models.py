@@ -0,0 +1,51 @@
+"""
+Run the shared BLIP/DETR model server.
+
+Usage:
+    python serve_models.py [--address HOST:PORT] [--workers N] [--no-warmup]
+
+Web processes started with the same MODEL_SERVER_ADDRESS and
+MODEL_SERVER_AUTHKEY send their model calls here instead of loading the
+models themselves. MODEL_SERVER_AUTHKEY must be set to a random secret, and
+the address must be a Unix socket path or a loopback host:port.
+"""
+import argparse
+import logging
+import os
+import sys
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--address', default=os.environ.get('MODEL_SERVER_ADDRESS') or '127.0.0.1:6100',
+                        help='host:port or Unix socket path to listen on')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('MODEL_SERVER_WORKERS', '1')),
+                        help='Model processes (each holds one copy of the models)')
+    parser.add_argument('--no-warmup', action='store_true', help='Load models on first use instead of at start-up')
+    args = parser.parse_args()
+
+    # The server and its model processes run the models themselves, so they
+    # must not be configured as clients of the server (spawned children inherit this)
+    os.environ['MODEL_SERVER_ADDRESS'] = ''
+
+    from app.services.model_server import ModelServer, ModelServerError
+
+    try:
+        server = ModelServer(args.address, workers=args.workers, warm_up=() if args.no_warmup else ('blip', 'detr'))
+    except ModelServerError as e:
+        logger.error(f"Model server not started: {str(e)}")
+        sys.exit(1)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Model server stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Run background analysis workers.
+
+Usage:
+    python worker.py [--processes N] [--no-warmup]
+
+Each worker process loads its own BLIP/DETR models once and then serves
+jobs submitted through /api/jobs, so model capacity can be scaled
+independently of the web processes.
+"""
+import argparse
+import logging
+import multiprocessing
+import signal
+import time
+
+from config.config import JOB_WORKERS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _serve(worker_id, stop_event, warm_up):
+    # Ctrl+C is handled by the parent, which asks workers to finish their current job
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from app.services.job_service import run_worker
+
+    run_worker(worker_id, stop_event, warm_up)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=JOB_WORKERS, help='Number of worker processes')
+    parser.add_argument('--no-warmup', action='store_true', help='Load models on first use instead of at start-up')
+    args = parser.parse_args()
+
+    # Spawn rather than fork so every worker initialises torch cleanly
+    context = multiprocessing.get_context('spawn')
+    stop_event = context.Event()
+    warm_up = () if args.no_warmup else ('blip', 'detr')
+
+    def start(index):
+        process = context.Process(
+            target=_serve, args=(f'worker-{index}', stop_event, warm_up), name=f'worker-{index}'
+        )
+        process.start()
+        return process
+
+    processes = {index: start(index) for index in range(args.processes)}
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    logger.info(f"Started {args.processes} worker processes")
+
+    try:
+        while not stop_event.is_set():
+            for index, process in list(processes.items()):
+                if not process.is_alive():
+                    # Its job is retried by another worker once the lease expires
+                    logger.warning(f"worker-{index} exited with code {process.exitcode}, restarting")
+                    processes[index] = start(index)
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop_event.set()
+
+    logger.info("Stopping workers after their current jobs")
+    for process in processes.values():
+        process.join()
+
+
+if __name__ == '__main__':
+    main()